@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -126,6 +127,84 @@ MEDIA_ROOT = r'D:/BE/Final Project/Farmo/ServerMedia'
 # MEDIA_URL = '/media/'
 # MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache (feed sessions, ...). LocMemCache is per-process; point this at a
+# shared backend (Redis / Memcached) when running more than one worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'farmo-default',
+    }
+}
+
+# In-process token auth cache (backend/utils/auth_cache.py)
+AUTH_CACHE_TTL = 30            # seconds a resolved (token, user-id) pair is reused
+AUTH_CACHE_MAX_ENTRIES = 4096
+
+# Token / OTP expiry sweeper (backend.utils.expiry_sweeper). Run
+# `manage.py sweep_expired` from cron, or enable the in-process thread.
+EXPIRY_SWEEPER_ENABLED = False
+EXPIRY_SWEEP_INTERVAL = 300    # seconds between in-process sweeps
+EXPIRY_SWEEP_BATCH_SIZE = 1000
+TOKEN_RETENTION_DAYS = 30      # dead tokens are deleted this long after expiry
+OTP_RETENTION_DAYS = 7
+
+# Profile picture thumbnails for user lists (backend.utils.profile_thumbnails)
+PROFILE_THUMBNAIL_SIZES = (100,)               # px, longest side
+PROFILE_THUMBNAIL_FORMATS = ('jpeg', 'webp')
+PROFILE_THUMBNAIL_QUALITY = 70
+
+# Chunked upload sessions (backend.utils.upload_sessions): 'file' (shared disk),
+# 'cache' (Django cache, use Redis / Memcached across hosts) or 'db'.
+UPLOAD_SESSION_BACKEND = 'file'
+UPLOAD_SESSION_TTL = 6 * 60 * 60       # seconds after the last chunk
+UPLOAD_SESSION_GC_INTERVAL = 15 * 60   # min seconds between opportunistic clean-ups per worker
+
+# Signed media URLs (backend.utils.signed_media). 'django' streams from the
+# worker; 'nginx' (X-Accel-Redirect) / 'apache' (X-Sendfile) hand the bytes
+# to the front proxy.
+MEDIA_SIGNED_URL_TTL = 5 * 60          # seconds a minted URL stays valid
+MEDIA_SENDFILE_BACKEND = 'django'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected/'
+
+# Shared background media executor (backend.utils.media_executor), per web worker
+MEDIA_EXECUTOR_THREADS = 4             # thumbnails, clean-up
+MEDIA_EXECUTOR_PROCESSES = 2           # video encoders
+MEDIA_EXECUTOR_MAX_QUEUE = 64          # pending tasks per pool before new work is refused
+MEDIA_TASK_TIMEOUT = 5 * 60            # default seconds before a task is cancelled / reported
+MEDIA_DRAIN_TIMEOUT = 30               # seconds to let pending work finish on shutdown
+
+# Video transcoding queue (backend.utils.transcoder): the media executor's
+# 'process' pool, 'external' (run `manage.py run_transcode_jobs`) or 'inline'.
+TRANSCODE_EXECUTOR = 'process'
+TRANSCODE_MAX_PENDING = 8              # queued + running jobs before uploads get 503
+TRANSCODE_JOB_TIMEOUT = 30 * 60        # seconds before a job is considered abandoned
+TRANSCODE_RENDITIONS = (360, 480, 720)  # rendition ladder, by short side (never upscaled)
+TRANSCODE_SEGMENT_SECONDS = 4           # HLS segment length
+TRANSCODE_POSTER_AT = 1.0               # poster frame, seconds into the video
+
+# Product image encoding (backend.utils.image_encoder)
+PRODUCT_IMAGE_FORMAT = 'jpeg'           # 'jpeg' or 'webp'
+IMAGE_MAX_DIMENSION = 2048              # px on the long side, larger uploads are downscaled
+IMAGE_TARGET_KB = 800                   # size budget per stored product image
+PRODUCT_IMAGE_VARIANTS = {              # name: (max px, KB budget), served by image_size / variant
+    'small': (320, 30),
+    'medium': (720, 90),
+    'large': (1280, 250),
+}
+
+# Product search (backend.utils.product_search): 'auto' uses the full-text /
+# trigram indexes on PostgreSQL and the plain icontains tiers elsewhere;
+# 'basic' forces the plain tiers.
+PRODUCT_SEARCH_BACKEND = 'auto'
+PRODUCT_SEARCH_CONFIG = 'simple'        # text search config for Product.search_vector
+FARM_PRODUCT_TERMS_TTL = 5 * 60         # seconds a process keeps its FarmProducts term dictionary
+LOCATION_MATCH_CUTOFF = 0.85           # difflib ratio above which a misspelt location name is accepted
+FEED_RANKING_MODE = 'sql'               # 'sql' scores and limits the feed in the database, 'python' ranks on the in-process product snapshot
+                                        # ('python' needs a CACHES backend shared by all workers, not LocMemCache)
+FEED_TOP_K = 500                        # products ranked into one feed session
+PRODUCT_SNAPSHOT_TTL = 15 * 60          # seconds before a process rebuilds its product snapshot from scratch
+PRODUCT_SNAPSHOT_MAX_CHANGES = 1000     # change-log entries a stale snapshot replays before rebuilding instead
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -139,7 +139,8 @@ from backend.service_frontend.product import (
 )
 
 from backend.service_frontend.product_feed import (
-    get_product_feed
+    get_product_feed,
+    get_product_feed_page
 )
 
 
@@ -161,7 +162,13 @@ from backend.service_frontend.internal_service import (
 from backend.service_frontend.BigFileTransferHandler import (
     big_file_upload,
     big_file_download,
-    big_file_download_v2
+    big_file_download_v2,
+    big_file_stream,
+    transcode_job_status,
+    product_video_asset,
+    media_executor_metrics,
+    media_signed_url,
+    signed_media
 )
 
 
@@ -177,6 +184,12 @@ urlpatterns = [
     path('api/file/upload/', big_file_upload, name='big_file_upload'),
     path('api/file/download/', big_file_download, name='big_file_download'),
     path('api/file/download2/', big_file_download_v2, name='big_file_download_v2'),
+    path('api/file/stream/', big_file_stream, name='big_file_stream'),
+    path('api/file/transcode-job/<int:job_id>/', transcode_job_status, name='transcode_job_status'),
+    path('api/file/video/<str:product_id>/<int:seq>/<path:asset>', product_video_asset, name='product_video_asset'),
+    path('api/file/media-executor/metrics/', media_executor_metrics, name='media_executor_metrics'),
+    path('api/file/signed-url/', media_signed_url, name='media_signed_url'),
+    path('api/file/signed/<str:root>/<path:path>', signed_media, name='signed_media'),
 
     # Dashboard
     path('api/home/dashboardd/', dashboard_fullfillmentt, name='dashboard_fullfillmentt'),
@@ -280,6 +293,7 @@ urlpatterns = [
     path('api/product/category/', all_available_categories, name='all_available_categories'),
     path('api/product/category/products/', available_farm_product_on_category, name='available_farm_product_on_category'),
     path('api/product/feed/', get_product_feed, name='get_product_feed'),
+    path('api/product/feed/page/', get_product_feed_page, name='get_product_feed_page'),
     path('api/product/filter/', product_filter_admin, name='product_filter_admin'),
     path('api/product/users/details/', product_details_for_users, name='product_details_for_users'),
     path('api/product/mylist/', my_product_list, name='my_product_list'),
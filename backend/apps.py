@@ -14,6 +14,15 @@ class BackendConfig(AppConfig):
         from django.contrib.auth.management import create_permissions
         post_migrate.disconnect(create_permissions, dispatch_uid="django.contrib.auth.management.create_permissions")
         import backend.signals
+
+        from django.core import checks
+        from backend.utils.product_snapshot import check_snapshot_cache
+        checks.register(check_snapshot_cache)
+
+        from django.conf import settings
+        if getattr(settings, 'EXPIRY_SWEEPER_ENABLED', False):
+            from backend.utils.expiry_sweeper import start_expiry_sweeper
+            start_expiry_sweeper()
         
         
 
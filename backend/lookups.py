@@ -0,0 +1,50 @@
+"""
+Custom lookups.
+
+keywords__overlaps=[ids]  — the JSON list holds at least one of the given
+integer ids (Product.keywords stores FarmProducts ids). One predicate for
+the whole id list instead of an OR chain of keywords__contains=[id]:
+
+    PostgreSQL  farmo_keyword_ids(keywords) && ARRAY[...]::bigint[]
+                farmo_keyword_ids() is the IMMUTABLE function created by
+                migration 0096, which also GIN-indexes that expression
+    SQLite      EXISTS over json_each(keywords)
+
+Like keywords__contains=[id], only integer elements match; keywords stored
+as plain strings are ignored.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db import NotSupportedError
+from django.db.models import JSONField, Lookup
+
+
+KEYWORD_IDS_FUNCTION = 'farmo_keyword_ids'
+
+
+@JSONField.register_lookup
+class KeywordOverlap(Lookup):
+    lookup_name = 'overlaps'
+    prepare_rhs = False
+
+    def get_prep_lookup(self):
+        return sorted({int(v) for v in self.rhs})
+
+    def as_postgresql(self, compiler, connection):
+        if not self.rhs:
+            raise EmptyResultSet
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return f'{KEYWORD_IDS_FUNCTION}({lhs}) && %s::bigint[]', (*lhs_params, list(self.rhs))
+
+    def as_sqlite(self, compiler, connection):
+        if not self.rhs:
+            raise EmptyResultSet
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        placeholders = ', '.join(['%s'] * len(self.rhs))
+        return (
+            f"EXISTS (SELECT 1 FROM json_each({lhs}) AS kw "
+            f"WHERE kw.type = 'integer' AND kw.value IN ({placeholders}))",
+            (*lhs_params, *self.rhs),
+        )
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(f'keywords__overlaps is not supported on {connection.vendor}')
@@ -0,0 +1,92 @@
+import time
+import statistics
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.utils.image_encoder import encode_to_target, IMAGE_TARGET_KB, IMAGE_MAX_DIMENSION
+
+
+def synthetic_photo(width, height, seed=0):
+    """Gradient + shapes + sensor-like noise: compresses roughly like a phone photo"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2]).astype(np.float32)
+    for _ in range(40):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(10, max(11, min(width, height) // 4)))
+        cv2.circle(img, center, radius, [float(c) for c in rng.integers(0, 255, 3)], -1)
+    img = cv2.GaussianBlur(img, (0, 0), 1)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def legacy_binary_search(img, target_bytes):
+    """The previous FileManager._compress_image_to_target search, for comparison"""
+    _, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    encodes = 1
+    if len(buf) <= target_bytes:
+        return buf.tobytes(), encodes
+    low, high, best = 10, 95, buf
+    for _ in range(10):
+        mid = (low + high) // 2
+        _, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, mid])
+        encodes += 1
+        best = buf
+        if abs(len(buf) - target_bytes) < 0.1 * 1024 * 1024:
+            break
+        if len(buf) > target_bytes:
+            high = mid - 1
+        else:
+            low = mid + 1
+    return best.tobytes(), encodes
+
+
+class Command(BaseCommand):
+    help = "Time the target-size image encoder against the old binary search on synthetic photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1280x960,3024x4032,4000x3000',
+                            help='Comma separated WIDTHxHEIGHT list.')
+        parser.add_argument('--target-kb', type=int, default=IMAGE_TARGET_KB)
+        parser.add_argument('--max-dimension', type=int, default=IMAGE_MAX_DIMENSION)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--webp', action='store_true', help='Also benchmark WebP output.')
+        parser.add_argument('--no-legacy', action='store_true', help='Skip the old binary search.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [tuple(int(v) for v in s.lower().split('x')) for s in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must look like 1280x960,4000x3000')
+
+        target = options['target_kb'] * 1024
+        formats = ['jpeg', 'webp'] if options['webp'] else ['jpeg']
+
+        self.stdout.write(f"{'input':>11}  {'method':<10} {'ms':>8} {'bytes':>10} {'encodes':>7} {'quality':>7}  output")
+        for i, (width, height) in enumerate(sizes):
+            img = synthetic_photo(width, height, seed=i)
+            runs = []
+            if not options['no_legacy']:
+                runs.append(('legacy', lambda: legacy_binary_search(img, target)))
+            for fmt in formats:
+                runs.append((fmt, lambda fmt=fmt: encode_to_target(img, target, fmt, options['max_dimension'])))
+
+            for name, run in runs:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    result = run()
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                if isinstance(result, dict):
+                    data, encodes, quality = result['data'], result['encodes'], result['quality']
+                    output = f"{result['width']}x{result['height']}"
+                else:
+                    (data, encodes), quality, output = result, '-', f'{width}x{height}'
+                self.stdout.write(
+                    f"{width:>5}x{height:<5}  {name:<10} {statistics.median(timings):>8.1f} {len(data):>10} "
+                    f"{encodes:>7} {quality:>7}  {output}"
+                )
@@ -0,0 +1,44 @@
+import os
+
+import cv2
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.models import Product
+from backend.utils.image_variants import generate_image_variants
+from backend.utils.media_handler import PRODUCT_IMAGE_FORMAT
+
+
+class Command(BaseCommand):
+    help = "Build the small / medium / large variants of product images uploaded before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have variants.')
+
+    def handle(self, *args, **options):
+        images = built = 0
+        for product in Product.objects.exclude(media_url__isnull=True).only('p_id', 'media_url').iterator(chunk_size=500):
+            media = product.media_url if isinstance(product.media_url, list) else []
+            changed = False
+            for entry in media:
+                if entry.get('media_type') != 'img' or (entry.get('variants') and not options['force']):
+                    continue
+                images += 1
+                image_path = settings.MEDIA_ROOT + '/' + entry.get('media_url', '')
+                img = cv2.imread(image_path)
+                if img is None:
+                    self.stderr.write(f"Cannot read {entry.get('media_url')}")
+                    continue
+
+                variants = generate_image_variants(img, image_path, PRODUCT_IMAGE_FORMAT)
+                folder = os.path.dirname(entry['media_url'])
+                entry['variants'] = {
+                    name: f"{folder}/variants/{os.path.basename(path)}" for name, path in variants.items()
+                }
+                built += 1
+                changed = True
+
+            if changed:
+                Product.objects.filter(p_id=product.p_id).update(media_url=media)
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} of {images} product image(s)."))
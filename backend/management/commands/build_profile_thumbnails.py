@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from backend.models import UsersProfile
+from backend.utils.profile_thumbnails import generate_profile_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Build the pre-sized list thumbnails for every uploaded profile picture."
+
+    def handle(self, *args, **options):
+        pictures = written = 0
+        urls = UsersProfile.objects.exclude(profile_url__isnull=True).exclude(profile_url='').values_list('profile_url', flat=True)
+        for profile_url in urls.iterator(chunk_size=500):
+            pictures += 1
+            written += generate_profile_thumbnails(profile_url)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnail(s) for {pictures} profile picture(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from backend.utils.upload_sessions import gc_upload_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired chunked-upload sessions and abandoned temp_uploads directories."
+
+    def handle(self, *args, **options):
+        removed = gc_upload_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} abandoned upload(s)."))
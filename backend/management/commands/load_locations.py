@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from backend.utils.locations import sync_locations, backfill_profile_locations
+from backend.utils.product_snapshot import invalidate_product_snapshot
+
+
+class Command(BaseCommand):
+    help = "Load the province / district / municipality table and resolve the location of every profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-profiles', action='store_true', help='Only load the Location table.')
+
+    def handle(self, *args, **options):
+        created = sync_locations()
+        self.stdout.write(f"Created {created} location(s).")
+        if options['skip_profiles']:
+            return
+        resolved = backfill_profile_locations()
+        invalidate_product_snapshot()   # bulk_update sends no signals
+        self.stdout.write(self.style.SUCCESS(f"Resolved the municipality of {resolved} profile(s)."))
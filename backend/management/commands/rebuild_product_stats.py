@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from backend.utils.product_stats import rebuild_product_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the ProductStats rollup (ratings, delivered orders, sales) from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product', action='append', dest='products', metavar='P_ID',
+            help='Only rebuild the given product (can be repeated).',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_product_stats(
+            product_ids=options['products'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} product(s)."))
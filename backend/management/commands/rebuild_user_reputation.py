@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from backend.utils.user_reputation import rebuild_user_reputation
+
+
+class Command(BaseCommand):
+    help = "Recompute the UserReputation rollup (averages, per-role counts, histogram) from Rating."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='users', metavar='USER_ID',
+            help='Only rebuild the given user (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_user_reputation(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt reputation for {written} user(s)."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend.models import TranscodeJob
+from backend.utils.transcoder import run_transcode_job, fail_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued video transcoding jobs (worker for TRANSCODE_EXECUTOR = 'external')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between queue polls.')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        while True:
+            close_old_connections()
+            fail_stale_jobs()
+            job_id = (
+                TranscodeJob.objects.filter(status='QUEUED')
+                .order_by('created_at').values_list('pk', flat=True).first()
+            )
+            if job_id is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            result = run_transcode_job(job_id)
+            done += result == 'DONE'
+            failed += result == 'FAILED'
+
+        self.stdout.write(self.style.SUCCESS(f"Transcoded {done} video(s), {failed} failed."))
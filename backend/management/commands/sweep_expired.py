@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from backend.utils.expiry_sweeper import sweep, EXPIRY_SWEEP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Expire overdue tokens and OTPs in batches and delete dead rows past their retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=EXPIRY_SWEEP_BATCH_SIZE,
+            help='Rows per UPDATE / DELETE batch.',
+        )
+        parser.add_argument(
+            '--no-purge', action='store_true',
+            help='Only expire rows, do not delete old ones.',
+        )
+        parser.add_argument(
+            '--archive', metavar='PATH',
+            help='Append purged rows to this file as JSON lines before deleting them.',
+        )
+
+    def handle(self, *args, **options):
+        purge = not options['no_purge']
+        if options['archive'] and purge:
+            with open(options['archive'], 'a', encoding='utf-8') as archive:
+                counts = sweep(options['batch_size'], purge=True, archive=archive)
+        else:
+            counts = sweep(options['batch_size'], purge=purge)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {counts['tokens_expired']} token(s) and {counts['otps_expired']} OTP(s); "
+            f"purged {counts['tokens_purged']} token(s) and {counts['otps_purged']} OTP(s)."
+        ))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_product_stats(apps, schema_editor):
+    Product = apps.get_model('backend', 'Product')
+    ProductRating = apps.get_model('backend', 'ProductRating')
+    OrderRequest = apps.get_model('backend', 'OrderRequest')
+    ProductStats = apps.get_model('backend', 'ProductStats')
+
+    ratings = {
+        r['p_id']: r
+        for r in ProductRating.objects.values('p_id').annotate(total=Sum('score'), count=Count('ProductRating_id'))
+    }
+    orders = {
+        o['product']: o
+        for o in OrderRequest.objects.exclude(product__isnull=True).values('product').annotate(
+            delivered=Count('order_id', filter=Q(order_status='DELIVERED')),
+            sales=Sum('total_cost'),
+        )
+    }
+
+    rows = []
+    for p_id in Product.objects.values_list('p_id', flat=True).iterator():
+        rating = ratings.get(p_id, {})
+        order = orders.get(p_id, {})
+        count = rating.get('count') or 0
+        total = rating.get('total') or 0
+        rows.append(ProductStats(
+            product_id=p_id,
+            rating_count=count,
+            rating_sum=total,
+            avg_score=round(total / count, 2) if count else 0,
+            delivered_count=order.get('delivered') or 0,
+            total_sales=order.get('sales') or 0,
+        ))
+    ProductStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0087_remove_orderrequest_valid_order_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('product', models.OneToOneField(db_column='p_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='backend.product')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('avg_score', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('delivered_count', models.PositiveIntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['avg_score'], name='backend_pro_avg_sco_b7d10c_idx'), models.Index(fields=['delivered_count'], name='backend_pro_deliver_ff06f2_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_product_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_user_reputation(apps, schema_editor):
+    Rating = apps.get_model('backend', 'Rating')
+    UserReputation = apps.get_model('backend', 'UserReputation')
+
+    rows = {}
+    for user_id, rated_for, score in Rating.objects.values_list('rated_to_id', 'rated_for', 'score').iterator():
+        row = rows.setdefault(user_id, {'rating': [0, Decimal(0)], 'farmer': [0, Decimal(0)], 'consumer': [0, Decimal(0)], 'stars': [0] * 5})
+        score = Decimal(score)
+        for key in ('rating', rated_for.lower()):
+            if key in row:
+                row[key][0] += 1
+                row[key][1] += score
+        row['stars'][min(5, max(1, int(score))) - 1] += 1
+
+    def avg(pair):
+        return round(pair[1] / pair[0], 2) if pair[0] else 0
+
+    UserReputation.objects.bulk_create([
+        UserReputation(
+            user_id=user_id,
+            rating_count=row['rating'][0], rating_sum=row['rating'][1], avg_score=avg(row['rating']),
+            farmer_count=row['farmer'][0], farmer_sum=row['farmer'][1], farmer_avg=avg(row['farmer']),
+            consumer_count=row['consumer'][0], consumer_sum=row['consumer'][1], consumer_avg=avg(row['consumer']),
+            stars_1=row['stars'][0], stars_2=row['stars'][1], stars_3=row['stars'][2],
+            stars_4=row['stars'][3], stars_5=row['stars'][4],
+        )
+        for user_id, row in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0088_productstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReputation',
+            fields=[
+                ('user', models.OneToOneField(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reputation', serialize=False, to='backend.users')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('avg_score', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('farmer_count', models.PositiveIntegerField(default=0)),
+                ('farmer_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('farmer_avg', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('consumer_count', models.PositiveIntegerField(default=0)),
+                ('consumer_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('consumer_avg', models.DecimalField(decimal_places=2, default=0, max_digits=4)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['avg_score'], name='backend_use_avg_sco_74991c_idx'), models.Index(fields=['farmer_avg'], name='backend_use_farmer__7ca774_idx'), models.Index(fields=['consumer_avg'], name='backend_use_consume_278bd0_idx'), models.Index(fields=['farmer_count', 'farmer_avg'], name='backend_use_farmer__97d60b_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_user_reputation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_token_digest(apps, schema_editor):
+    Tokens = apps.get_model('backend', 'Tokens')
+
+    batch = []
+    for token in Tokens.objects.only('pk', 'token').iterator(chunk_size=2000):
+        token.token_digest = hashlib.sha256(str(token.token).encode('utf-8')).hexdigest()
+        batch.append(token)
+        if len(batch) >= 1000:
+            Tokens.objects.bulk_update(batch, ['token_digest'])
+            batch = []
+    if batch:
+        Tokens.objects.bulk_update(batch, ['token_digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0089_userreputation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokens',
+            name='token_digest',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_token_digest, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tokens',
+            name='token_digest',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='tokens',
+            name='token',
+            field=models.TextField(),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0090_tokens_token_digest'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='tokens',
+            name='valid_token_status',
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['otp_status', 'expires_at'], name='backend_otp_otp_sta_5d0f8f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokens',
+            index=models.Index(fields=['token_status', 'expires_at'], name='backend_tok_token_s_c87be0_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tokens',
+            constraint=models.CheckConstraint(condition=models.Q(('token_status__in', ['ACTIVE', 'INACTIVE', 'SUSPENDED', 'EXPIRED'])), name='valid_token_status'),
+        ),
+    ]
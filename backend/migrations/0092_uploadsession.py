@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0091_token_otp_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('upload_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('user_id', models.CharField(max_length=50)),
+                ('total_chunks', models.PositiveIntegerField(default=1)),
+                ('received', models.BinaryField(default=bytes)),
+                ('meta', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
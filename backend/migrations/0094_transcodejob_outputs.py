@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0093_transcodejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcodejob',
+            name='outputs',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
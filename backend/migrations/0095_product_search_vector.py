@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:52
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+# (index name, model, indexed expression, opclass) — PostgreSQL only
+SEARCH_INDEXES = [
+    ('product_search_vector_gin', 'Product', 'search_vector', ''),
+    ('product_pid_trgm', 'Product', 'UPPER(p_id)', 'gin_trgm_ops'),
+    ('product_name_trgm', 'Product', 'UPPER(name)', 'gin_trgm_ops'),
+    ('farmproducts_primary_trgm', 'FarmProducts', 'UPPER(primary_name)', 'gin_trgm_ops'),
+    ('farmproducts_secondary_trgm', 'FarmProducts', 'UPPER(secondary_name)', 'gin_trgm_ops'),
+]
+
+
+# Frozen copy of backend.utils.product_search.refresh_search_vectors as of
+# this migration, so later changes to it cannot alter the backfill.
+SEARCH_CONFIG = 'simple'
+
+
+def _keyword_text(keywords, names_by_id):
+    if not isinstance(keywords, list):
+        return ''
+    parts = []
+    for kw in keywords:
+        names = names_by_id.get(kw) if isinstance(kw, int) else None
+        if names:
+            parts.extend(n for n in names if n)
+        elif isinstance(kw, str):
+            parts.append(kw)
+    return ' '.join(parts)
+
+
+def _refresh_search_vectors(products, Product, FarmProducts):
+    if not products:
+        return
+    ids = {kw for p in products if isinstance(p.keywords, list) for kw in p.keywords if isinstance(kw, int)}
+    names_by_id = {
+        fp_id: (primary, secondary)
+        for fp_id, primary, secondary in FarmProducts.objects
+        .filter(id__in=ids)
+        .values_list('id', 'primary_name', 'secondary_name')
+    } if ids else {}
+
+    for p in products:
+        Product.objects.filter(pk=p.pk).update(search_vector=(
+            SearchVector(Value(p.name or ''), weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Value(p.description or ''), weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Value(_keyword_text(p.keywords, names_by_id)), weight='C', config=SEARCH_CONFIG)
+        ))
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, model, expression, opclass in SEARCH_INDEXES:
+        table = schema_editor.quote_name(apps.get_model('backend', model)._meta.db_table)
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({expression}) {opclass})')
+
+    Product = apps.get_model('backend', 'Product')
+    FarmProducts = apps.get_model('backend', 'FarmProducts')
+    batch = []
+    for product in Product.objects.only('pk', 'name', 'description', 'keywords').iterator(chunk_size=2000):
+        batch.append(product)
+        if len(batch) >= 1000:
+            _refresh_search_vectors(batch, Product, FarmProducts)
+            batch = []
+    _refresh_search_vectors(batch, Product, FarmProducts)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0094_transcodejob_outputs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
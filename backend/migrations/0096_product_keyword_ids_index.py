@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from backend.lookups import KEYWORD_IDS_FUNCTION
+
+
+# Integer elements of a keywords JSON list; IMMUTABLE so it can be indexed.
+CREATE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {KEYWORD_IDS_FUNCTION}(kw jsonb) RETURNS bigint[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(array_agg(e::bigint), '{{}}')
+    FROM jsonb_array_elements(CASE WHEN jsonb_typeof(kw) = 'array' THEN kw ELSE '[]'::jsonb END) AS e
+    WHERE jsonb_typeof(e) = 'number'
+$$
+"""
+
+
+def create_keyword_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('backend', 'Product')._meta.db_table)
+    schema_editor.execute(CREATE_FUNCTION)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS product_keyword_ids_gin ON {table} USING gin ({KEYWORD_IDS_FUNCTION}(keywords))'
+    )
+
+
+def drop_keyword_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS product_keyword_ids_gin')
+    schema_editor.execute(f'DROP FUNCTION IF EXISTS {KEYWORD_IDS_FUNCTION}(jsonb)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0095_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_keyword_index, drop_keyword_index),
+    ]
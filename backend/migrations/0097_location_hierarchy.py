@@ -0,0 +1,188 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+import re
+import json
+import difflib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of backend.utils.locations (sync_locations,
+# backfill_profile_locations and the resolution they use) as of this
+# migration, so later changes to it cannot alter the data migration.
+
+LOCATIONS_JSON = settings.BASE_DIR / 'backend' / 'static' / 'json' / 'provinces_with_districts_and_municipalities.json'
+MATCH_CUTOFF = 0.85
+
+NOISE_WORDS = {
+    'province', 'pradesh', 'no', 'district', 'jilla', 'municipality', 'municipal', 'rural',
+    'metropolitan', 'sub', 'submetropolitan', 'city', 'gaunpalika', 'nagarpalika',
+    'mahanagarpalika', 'upamahanagarpalika', 'rm', 'mun',
+}
+PROVINCE_ALIASES = {
+    'koshi': '1', 'kosi': '1', 'one': '1',
+    '2': 'madhesh', '3': 'bagmati', '4': 'gandaki', '5': 'lumbini', '6': 'karnali', '7': 'sudurpashchim',
+}
+
+
+def location_key(name):
+    words = re.split(r'[^0-9a-zऀ-ॿ]+', str(name or '').lower())
+    return ''.join(w for w in words if w and w not in NOISE_WORDS)
+
+
+def ward_number(ward):
+    match = re.search(r'\d+', str(ward or ''))
+    return int(match.group()) if match and int(match.group()) < 1000 else None
+
+
+def sync_locations(Location):
+    existing = {
+        (level, parent_id, key): pk
+        for pk, level, parent_id, key in Location.objects.values_list('pk', 'level', 'parent_id', 'key')
+    }
+
+    def ensure(level, name, parent_id, kind=None):
+        ident = (level, parent_id, location_key(name))
+        if ident not in existing:
+            existing[ident] = Location.objects.create(
+                level=level, name=name, key=ident[2], kind=kind, parent_id=parent_id,
+            ).pk
+        return existing[ident]
+
+    with open(LOCATIONS_JSON, encoding='utf-8') as f:
+        data = json.load(f)
+    for province, districts in data.items():
+        province_id = ensure('province', province, None)
+        for district, kinds in districts.items():
+            district_id = ensure('district', district, province_id)
+            for kind, municipalities in kinds.items():
+                for municipality in municipalities:
+                    ensure('municipal', municipality, district_id, kind)
+
+
+def _match(key, table):
+    if not key:
+        return None
+    if key in table:
+        return table[key]
+    close = difflib.get_close_matches(key, table.keys(), n=1, cutoff=MATCH_CUTOFF)
+    return table[close[0]] if close else None
+
+
+def _resolver(rows):
+    provinces, districts, municipals, parent_of = {}, {}, {}, {}
+    for pk, level, key, parent_id, name in rows:
+        parent_of[pk] = parent_id
+        if level == 'province':
+            provinces[key] = pk
+        elif level == 'district':
+            districts[key] = (pk, parent_id)
+    for pk, level, key, parent_id, name in rows:
+        if level == 'municipal':
+            names = municipals.setdefault(parent_id, {})
+            names[key] = pk
+            for part in re.split(r'[()]', name):
+                names.setdefault(location_key(part), pk)
+            names.pop('', None)
+
+    def resolve(province, district, municipal):
+        province_key = location_key(province)
+        province_id = _match(PROVINCE_ALIASES.get(province_key, province_key), provinces)
+
+        district_id = None
+        found = _match(location_key(district), districts)
+        if found:
+            district_id, province_id = found
+
+        municipal_id = None
+        municipal_key = location_key(municipal)
+        if district_id:
+            municipal_id = _match(municipal_key, municipals.get(district_id, {}))
+        elif municipal_key:
+            hits = [
+                names[municipal_key] for d_id, names in municipals.items()
+                if municipal_key in names and (province_id is None or parent_of.get(d_id) == province_id)
+            ]
+            if len(hits) == 1:
+                municipal_id = hits[0]
+                district_id = parent_of[municipal_id]
+                province_id = parent_of[district_id]
+        return province_id, district_id, municipal_id
+
+    return resolve
+
+
+def backfill_profile_locations(UsersProfile, Location, batch_size=1000):
+    resolve = _resolver(list(Location.objects.values_list('pk', 'level', 'key', 'parent_id', 'name')))
+    fields = ['province_loc', 'district_loc', 'municipal_loc', 'ward_no']
+    batch = []
+    for profile in UsersProfile.objects.only('pk', 'province', 'district', 'municipal', 'ward').iterator(chunk_size=batch_size):
+        profile.province_loc_id, profile.district_loc_id, profile.municipal_loc_id = resolve(
+            profile.province, profile.district, profile.municipal,
+        )
+        profile.ward_no = ward_number(profile.ward)
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            UsersProfile.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        UsersProfile.objects.bulk_update(batch, fields)
+
+
+def load_locations_and_backfill(apps, schema_editor):
+    Location = apps.get_model('backend', 'Location')
+    UsersProfile = apps.get_model('backend', 'UsersProfile')
+    sync_locations(Location)
+    backfill_profile_locations(UsersProfile, Location)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0096_product_keyword_ids_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersprofile',
+            name='ward_no',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('province', 'Province'), ('district', 'District'), ('municipal', 'Municipality')], max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(db_index=True, max_length=100)),
+                ('kind', models.CharField(blank=True, max_length=20, null=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='backend.location')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usersprofile',
+            name='district_loc',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='backend.location'),
+        ),
+        migrations.AddField(
+            model_name='usersprofile',
+            name='municipal_loc',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='backend.location'),
+        ),
+        migrations.AddField(
+            model_name='usersprofile',
+            name='province_loc',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='backend.location'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['level', 'key'], name='backend_loc_level_5d38e0_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('level', 'parent', 'key'), name='unique_location_per_parent'),
+        ),
+        migrations.RunPython(load_locations_and_backfill, migrations.RunPython.noop),
+    ]
@@ -3,9 +3,38 @@ from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+import hashlib
 import secrets
 import random, string
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.search import SearchVectorField
+import backend.lookups  # registers JSONField __overlaps
+
+
+class Location(models.Model):
+    """Province / district / municipality of Nepal, loaded from provinces_with_districts_and_municipalities.json"""
+    LEVEL_CHOICES = [
+        ('province', 'Province'),
+        ('district', 'District'),
+        ('municipal', 'Municipality'),
+    ]
+
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, db_index=True)       # normalized name used for matching
+    kind = models.CharField(max_length=20, blank=True, null=True)   # Ma.Na.Pa. / Upa.Ma. / Na.Pa. / Ga.Pa.
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+
+    def __str__(self):
+        return f"{self.name} ({self.level})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["level", "key"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["level", "parent", "key"], name="unique_location_per_parent"),
+        ]
 
 
 class UsersProfile(models.Model):
@@ -22,6 +51,11 @@ class UsersProfile(models.Model):
     municipal = models.CharField(max_length=50, blank=True, null=True)
     ward = models.CharField(max_length=50, blank=True, null=True)
     tole = models.CharField(max_length=100, blank=True, null=True)
+    # Resolved from the text fields above on save (backend.utils.locations)
+    province_loc = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    district_loc = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    municipal_loc = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    ward_no = models.PositiveSmallIntegerField(blank=True, null=True)
     dob = models.DateField(blank=True, null=True)
     sex = models.CharField(max_length=20, blank=True, null=True)
     phone02 = models.CharField(max_length=15, blank=True, null=True)
@@ -210,7 +244,9 @@ class Product(models.Model):
     delivery_option = models.CharField(max_length=100, default='Not-Available')
     product_status = models.CharField(max_length=100, default='Available')
     media_url = models.JSONField(blank=True, null=True)
-    keywords = models.JSONField(blank=True, null=True)
+    keywords = models.JSONField(blank=True, null=True)          # FarmProducts ids; keywords__overlaps is GIN-indexed on PostgreSQL
+    # name + description + keyword names; maintained on PostgreSQL (backend.utils.product_search)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
 
     @classmethod
@@ -279,6 +315,34 @@ class ProductRating(models.Model):
         return f"ProductRating {self.ProductRating_id}: {self.score}"
 
 
+class ProductStats(models.Model):
+    """Denormalized per-product rating / order statistics, kept in sync by signals"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stats', db_column='p_id')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    avg_score = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def recompute_average(self):
+        """Refresh avg_score from rating_sum / rating_count"""
+        if self.rating_count > 0:
+            self.avg_score = round(self.rating_sum / self.rating_count, 2)
+        else:
+            self.rating_sum = 0
+            self.avg_score = 0
+
+    def __str__(self):
+        return f"Stats {self.product_id}: {self.avg_score} ({self.rating_count}), sold {self.delivered_count}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["avg_score"]),
+            models.Index(fields=["delivered_count"]),
+        ]
+
+
 class Rating(models.Model):
     """Rating model for farmer reviews by consumers"""
     rated_to = models.ForeignKey(Users, on_delete=models.PROTECT, related_name='rated_to')
@@ -308,6 +372,86 @@ class Rating(models.Model):
         ]
 
 
+class UserReputation(models.Model):
+    """Denormalized per-user rating rollup (overall, per role and score histogram), kept in sync by signals"""
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, primary_key=True, related_name='reputation', db_column='user_id')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    avg_score = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    farmer_count = models.PositiveIntegerField(default=0)
+    farmer_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    farmer_avg = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    consumer_count = models.PositiveIntegerField(default=0)
+    consumer_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    consumer_avg = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    ROLE_FIELDS = {'Farmer': 'farmer', 'Consumer': 'consumer'}
+
+    @staticmethod
+    def star_bucket(score):
+        """Histogram bucket (1-5) of a rating score"""
+        return min(5, max(1, int(score)))
+
+    def add_score(self, score, rated_for, sign=1):
+        """Add (sign=1) or remove (sign=-1) one rating from the rollup"""
+        self.rating_count = max(0, self.rating_count + sign)
+        self.rating_sum += sign * score
+
+        role = self.ROLE_FIELDS.get(rated_for)
+        if role:
+            count_field, sum_field = f'{role}_count', f'{role}_sum'
+            setattr(self, count_field, max(0, getattr(self, count_field) + sign))
+            setattr(self, sum_field, getattr(self, sum_field) + sign * score)
+
+        star_field = f'stars_{self.star_bucket(score)}'
+        setattr(self, star_field, max(0, getattr(self, star_field) + sign))
+        self.recompute_averages()
+
+    def recompute_averages(self):
+        """Refresh the stored averages from the sums / counts"""
+        for prefix in ('rating', 'farmer', 'consumer'):
+            count = getattr(self, f'{prefix}_count')
+            avg_field = 'avg_score' if prefix == 'rating' else f'{prefix}_avg'
+            if count > 0:
+                setattr(self, avg_field, round(getattr(self, f'{prefix}_sum') / count, 2))
+            else:
+                setattr(self, f'{prefix}_sum', 0)
+                setattr(self, avg_field, 0)
+
+    def average_for(self, rated_for=None):
+        """Average score (None when there are no ratings), optionally for one role"""
+        role = self.ROLE_FIELDS.get(rated_for)
+        if role is None:
+            return self.avg_score if self.rating_count else None
+        return getattr(self, f'{role}_avg') if getattr(self, f'{role}_count') else None
+
+    def count_for(self, rated_for=None):
+        """Number of ratings, optionally for one role"""
+        role = self.ROLE_FIELDS.get(rated_for)
+        return self.rating_count if role is None else getattr(self, f'{role}_count')
+
+    @property
+    def histogram(self):
+        return {str(i): getattr(self, f'stars_{i}') for i in range(1, 6)}
+
+    def __str__(self):
+        return f"Reputation {self.user_id}: {self.avg_score} ({self.rating_count})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["avg_score"]),
+            models.Index(fields=["farmer_avg"]),
+            models.Index(fields=["consumer_avg"]),
+            models.Index(fields=["farmer_count", "farmer_avg"]),
+        ]
+
+
 class Verification(models.Model):
     """Verification model for user identity verification"""
     V_id = models.AutoField( primary_key=True)
@@ -427,7 +571,8 @@ class Transaction(models.Model):
 class Tokens(models.Model):
     """Tokens model for JWT token management"""
     user_id = models.ForeignKey(Users, on_delete=models.PROTECT, db_index=True)
-    token = models.TextField(db_index=True)
+    token = models.TextField()
+    token_digest = models.CharField(max_length=64, unique=True, editable=False)  # sha256(token), lookup key
     device_info = models.CharField(max_length=255, blank=True, null=True)
     issued_at = models.DateTimeField(default=timezone.now)
     expires_at = models.DateTimeField()
@@ -435,6 +580,11 @@ class Tokens(models.Model):
     token_status = models.CharField(max_length=20, default='ACTIVE')
 
 
+    @staticmethod
+    def hash_token(token):
+        """Fixed-width SHA-256 hex digest used to look a token up"""
+        return hashlib.sha256(str(token).encode('utf-8')).hexdigest()
+
     @classmethod
     def create_token(cls, user, days=1):
         """Generate a random token and set expiry days ahead"""
@@ -444,6 +594,7 @@ class Tokens(models.Model):
         return cls.objects.create(
             user_id=user,
             token=token,
+            token_digest=cls.hash_token(token),
             refresh_token=refresh_token,
             issued_at=timezone.now(),
             expires_at=timezone.now() + timezone.timedelta(days=days),
@@ -467,16 +618,14 @@ class Tokens(models.Model):
 
     @classmethod
     def deactivate_all_user_tokens(cls, user):
-        """Deactivate all tokens for a user (logout all devices)"""
-        cls.objects.filter(user_id=user, token_status='ACTIVE').update(token_status='INACTIVE')
+        """Deactivate all tokens for a user (logout all devices), swept EXPIRED ones included"""
+        from backend.utils.auth_cache import invalidate_user
+        cls.objects.filter(user_id=user, token_status__in=('ACTIVE', 'EXPIRED')).update(token_status='INACTIVE')
+        invalidate_user(user.user_id if isinstance(user, Users) else user)
 
     def is_expired(self):
-        """Check if the token has expired"""
-        if timezone.now() > self.expires_at:
-            self.deactivate()
-            return True
-        else:
-            return False
+        """Check if the token has expired (pure read, the sweeper flips the status)"""
+        return self.token_status == 'EXPIRED' or timezone.now() > self.expires_at
     
     def is_active(self):
         """Check if the token is still active"""
@@ -490,10 +639,13 @@ class Tokens(models.Model):
     class Meta:
         constraints = [
             models.CheckConstraint(
-                condition=models.Q(token_status__in=['ACTIVE', 'INACTIVE', 'SUSPENDED']),
+                condition=models.Q(token_status__in=['ACTIVE', 'INACTIVE', 'SUSPENDED', 'EXPIRED']),
                 name='valid_token_status'
             )
         ]
+        indexes = [
+            models.Index(fields=['token_status', 'expires_at']),
+        ]
 
 
 class UserActivity(models.Model):
@@ -578,18 +730,11 @@ class OTP(models.Model):
 
 
     def effective_status_OTP(self):
-        """Check if the OTP is still active"""
-        if self.otp_status == 'ACTIVE' and not self.is_expired():
-            return 'ACTIVE'
-        elif self.is_expired and self.otp_status == 'ACTIVE':
-            self.otp_status = 'EXPIRED'
-            self.save(update_fields=['otp_status'])
-            return 'EXPIRED'
-        elif self.otp_status == 'USED':
-            return 'USED'
-        elif self.otp_status == 'EXPIRED':
+        """Current status of the OTP (pure read, the sweeper persists EXPIRED)"""
+        if self.otp_status == 'ACTIVE' and self.is_expired():
             return 'EXPIRED'
-        
+        return self.otp_status
+
     
     @classmethod
     def create_otp(cls, user, otp, otp_type, created_at,expires_in=5, description = None):
@@ -612,6 +757,9 @@ class OTP(models.Model):
                 name='valid_otp_status'
             )
         ]
+        indexes = [
+            models.Index(fields=['otp_status', 'expires_at']),
+        ]
 
 
 class FarmProducts(models.Model):
@@ -688,4 +836,53 @@ class ProductScore(models.Model):
 
     def __str__(self):
         return f"{self.user_id} - {self.farmProduct}"
-    
\ No newline at end of file
+    
+
+class UploadSession(models.Model):
+    """Chunked upload session shared by every worker (UPLOAD_SESSION_BACKEND = 'db')"""
+    upload_id = models.CharField(max_length=32, primary_key=True)
+    user_id = models.CharField(max_length=50)              # user-id header of the uploader
+    total_chunks = models.PositiveIntegerField(default=1)
+    received = models.BinaryField(default=bytes)            # bitmap, bit i = chunk i stored
+    meta = models.JSONField(default=dict)                   # subject, file_name, file_size, ...
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Upload {self.upload_id} by {self.user_id}"
+
+
+class TranscodeJob(models.Model):
+    """Background video conversion job (backend.utils.transcoder)"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    user_id = models.CharField(max_length=50)
+    product_id = models.CharField(max_length=100, blank=True, null=True)
+    src_path = models.TextField()                           # file read by the encoder
+    dest_path = models.TextField()                          # converted output
+    raw_path = models.TextField(blank=True, null=True)      # served until the output is ready, then deleted
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
+    error = models.TextField(blank=True, null=True)
+    outputs = models.JSONField(blank=True, null=True)       # rendition ladder + poster, see transcoder.convert_video
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Transcode {self.pk} ({self.status} {self.progress}%)"
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(status__in=['QUEUED', 'RUNNING', 'DONE', 'FAILED']),
+                name='valid_transcode_status'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
@@ -3,7 +3,7 @@ from .models import Connections
 from django.utils import timezone
 from rest_framework.permissions import BasePermission
 from django.db.models import Q
-from .models import Tokens, Users
+from .utils.auth_cache import resolve_auth, get_request_user
 
 
 # WORK on POST Method only 
@@ -39,24 +39,14 @@ class HasValidTokenForUser(BasePermission):
         token_value = request.headers.get("token")
         user_id = request.headers.get("user-id")
 
-        # if not token_value or not user_id:
-        #     print("0inactive")
-        #     return False
-
-        try:
-            user = Users.objects.get(user_id=user_id, profile_status="ACTIVATED")
-        except Users.DoesNotExist:
-            return False
-
-        try:
-            token_obj = Tokens.objects.get(token=token_value, user_id=user)
-        except Tokens.DoesNotExist:
+        # One joined query (or an LRU hit) for user + profile + token status.
+        # The result is attached to the request so the role permissions
+        # below don't fetch the same user again.
+        auth_context = resolve_auth(token_value, user_id)
+        if auth_context is None:
             return False
 
-        # Check token status and expiry
-        if not token_obj.is_active():
-            return False
-  
+        request.auth_context = auth_context
         return True
 
 
@@ -71,7 +61,10 @@ class IsFarmer(BasePermission):
         if not user_id:
             return False
         
-        user_type = Users.objects.get(user_id=user_id, profile_status="ACTIVATED").profile_id.user_type
+        user = get_request_user(request)
+        if user is None:
+            return False
+        user_type = user.profile_id.user_type
 
         if user_type == "Farmer" or user_type == "VerifiedFarmer":
             return True
@@ -89,7 +82,10 @@ class IsConsumer(BasePermission):
         if not user_id:
             return False
 
-        user_type = Users.objects.get(user_id=user_id, profile_status="ACTIVATED").profile_id.user_type
+        user = get_request_user(request)
+        if user is None:
+            return False
+        user_type = user.profile_id.user_type
         if user_type == "Consumer" or user_type == "VerifiedConsumer":
             return True
 
@@ -106,8 +102,8 @@ class IsAdmin(BasePermission):
         if not user_id:
             return False
 
-        user = Users.objects.get(user_id=user_id, profile_status="ACTIVATED")
-        if user.is_admin:
+        user = get_request_user(request)
+        if user is not None and user.is_admin:
             return True
 
         return False
@@ -124,8 +120,8 @@ class IsSuperAdmin(BasePermission):
             return False
 
         #user_type = Users.objects.get(user_id=user_id).profile_id.user_type
-        user_type = Users.objects.get(user_id=user_id, profile_status="ACTIVATED").get_usertype_from_userModel()
-        if user_type == "SuperAdmin":
+        user = get_request_user(request)
+        if user is not None and user.get_usertype_from_userModel() == "SuperAdmin":
             return True
 
         return False
@@ -143,7 +139,9 @@ class IsVerifiedConsumer(BasePermission):
         if not user_id:
             return False
 
-        user = Users.objects.select_related('profile_id').get(user_id=user_id, profile_status="ACTIVATED")
+        user = get_request_user(request)
+        if user is None:
+            return False
         user_type = user.profile_id.user_type
         if user_type == "VerifiedConsumer":
             return True
@@ -161,7 +159,9 @@ class IsVerifiedFarmer(BasePermission):
         if not user_id:
             return False
 
-        user = Users.objects.select_related('profile_id').get(user_id=user_id, profile_status="ACTIVATED")
+        user = get_request_user(request)
+        if user is None:
+            return False
         user_type = user.profile_id.user_type
         if user_type == "VerifiedFarmer":
             return True
@@ -179,7 +179,9 @@ class IsFarmerOrConsumer(BasePermission):
         if not user_id:
             return False
 
-        user = Users.objects.select_related('profile_id').get(user_id=user_id, profile_status="ACTIVATED")
+        user = get_request_user(request)
+        if user is None:
+            return False
         user_type = user.profile_id.user_type
         if user_type in ["Consumer","VerifiedFarmer", "VerifiedConsumer", "Farmer"]:
             return True
@@ -63,7 +63,7 @@ class ProductSerializer(serializers.ModelSerializer):
     """Serializer for Product model with nested media"""
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_vector',)
 
 
 class ProductRatingSerializer(serializers.ModelSerializer):
@@ -1,6 +1,7 @@
 import os
 import uuid
 import shutil
+import hashlib
 import base64
 import mimetypes
 
@@ -11,10 +12,20 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from django.conf import settings
-from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from backend.models import Users, Product, Verification
+from backend.models import Users, Product, Verification, TranscodeJob
 from backend.utils.media_handler import FileManager
+from backend.utils.signed_media import sign_media_url, verify_media_signature, serve_media
+from backend.utils.transcoder import attach_renditions
+from backend.utils.media_executor import get_media_executor, submit_media_task, MediaQueueFull, MediaExecutorClosed
+from backend.utils.image_variants import media_entry_url, normalize_image_size
+from backend.utils.upload_sessions import (
+    get_session_store, session_dir, is_valid_upload_id, maybe_gc_upload_sessions,
+)
+from backend.utils.profile_thumbnails import (
+    DEFAULT_PROFILE_PICTURE_DIR, GUEST_PROFILE_PICTURE, default_profile_picture_path,
+    generate_profile_thumbnails, delete_profile_thumbnails,
+)
 
 
 ##########################################################################################
@@ -22,21 +33,22 @@ from backend.utils.media_handler import FileManager
 ##########################################################################################
 
 ##########################################################################################
-#                        Chunked Upload State (in-memory, per-process)
+#                        Chunked Upload State
 #
-# For production, replace this dict with a Redis cache:
-#   from django.core.cache import cache
-#   cache.set(session_key, meta, timeout=3600)
-#   meta = cache.get(session_key)
+# Sessions live in a store shared by every worker (file / cache / db, chosen by
+# UPLOAD_SESSION_BACKEND) — see backend.utils.upload_sessions.
 ##########################################################################################
 
-_upload_sessions = {}   # { upload_id: { meta... } }
-
 VIDEO_EXTS = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
 IMAGE_EXTS = ['.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff', '.gif']
 
 VIDEO_SINGLE_LIMIT = 25 * 1024 * 1024      # 25 MB
 VIDEO_MAX_SIZE     = 200 * 1024 * 1024     # 200 MB
+IMAGE_MAX_SIZE     = 50 * 1024 * 1024      # 50 MB raw, compressed after upload
+FILE_MAX_SIZE      = 10 * 1024 * 1024      # 10 MB, any other file (e.g. PDFs)
+MIN_CHUNK_SIZE     = 1 * 1024 * 1024       # 1 MB, bounds total_chunks of a chunked upload
+
+PART_FILE_NAME     = 'upload.part'         # preallocated target of in-place chunk writes
 
 ##########################################################################################
 #                             Big File Upload — Chunked
@@ -46,6 +58,10 @@ VIDEO_MAX_SIZE     = 200 * 1024 * 1024     # 200 MB
 #   2. POST /upload/  { action: 'chunk',  ... }  →  returns chunk ack
 #   3. POST /upload/  { action: 'finish', ... }  →  assembles file, returns file info
 #   4. POST /upload/  { action: 'abort',  ... }  →  cleans up temp chunks
+#   5. POST /upload/  { action: 'status', ... }  →  received-chunk bitmap, to resume
+#
+#  Chunks may be sent in parallel and in any order. 'checksum' on a chunk and
+#  'file_checksum' on init (SHA-256 hex) are verified on receipt / on finish.
 ##########################################################################################
 
 @api_view(['POST'])
@@ -66,6 +82,8 @@ def big_file_upload(request):
         return _upload_finish(request, userid)
     if action == 'abort':
         return _upload_abort(request, userid)
+    if action == 'status':
+        return _upload_status(request, userid)
 
     return Response({'error': 'Invalid action'}, status=400)
 
@@ -75,17 +93,26 @@ def big_file_upload(request):
 # ─────────────────────────────────────────────────────────────
 def _upload_init(request, userid):
     file_name  = request.data.get('file_name')
-    file_size  = int(request.data.get('file_size', 0))
     subject    = request.data.get('subject')
+    if not file_name:
+        return Response({'error': 'file_name is required'}, status=400)
     ext        = os.path.splitext(file_name)[1].lower()
 
+    try:
+        file_size = int(request.data.get('file_size', 0))
+    except (TypeError, ValueError):
+        return Response({'error': 'file_size must be an integer'}, status=400)
+
     # Profile picture: only images allowed
     if subject == 'PROFILE_PICTURE' and ext not in IMAGE_EXTS:
         return Response({'error': 'Profile picture must be an image file.'}, status=400)
 
-    # Video size cap
-    if ext in VIDEO_EXTS and file_size > VIDEO_MAX_SIZE:
-        return Response({'error': 'Video exceeds 200MB limit'}, status=400)
+    # Size cap by file type, checked before anything is reserved on disk
+    max_size = _max_upload_size(ext)
+    if file_size <= 0:
+        return Response({'error': 'file_size is required'}, status=400)
+    if file_size > max_size:
+        return Response({'error': f'File exceeds {max_size // (1024 * 1024)}MB limit'}, status=400)
 
     # Determine chunking mode
     is_image       = ext in IMAGE_EXTS
@@ -95,33 +122,93 @@ def _upload_init(request, userid):
         total_chunks = 1
         mode = 'full'
     else:
-        total_chunks = int(request.data.get('total_chunks', 1))
+        try:
+            total_chunks = int(request.data.get('total_chunks', 1))
+        except (TypeError, ValueError):
+            return Response({'error': 'total_chunks must be an integer'}, status=400)
+        # Every chunk but the last carries at least MIN_CHUNK_SIZE bytes
+        max_chunks = -(-file_size // MIN_CHUNK_SIZE)
+        if not 1 <= total_chunks <= max_chunks:
+            return Response({'error': f'total_chunks must be between 1 and {max_chunks}'}, status=400)
         mode = 'chunked'
 
+    # With a known chunk size every chunk is written straight to its offset in
+    # one preallocated file (no assembly pass). Without one, chunks are kept as
+    # separate files and concatenated on finish, as before. A single-chunk
+    # upload also writes in place, but into an empty file: its size is only
+    # known once the chunk arrives.
+    try:
+        chunk_size = request.data.get('chunk_size')
+        chunk_size = int(chunk_size) if chunk_size else None
+    except (TypeError, ValueError):
+        return Response({'error': 'chunk_size must be an integer'}, status=400)
+    if total_chunks == 1:
+        chunk_size = None
+        in_place   = True
+    elif chunk_size:
+        if chunk_size <= 0 or not (total_chunks - 1) * chunk_size < file_size <= total_chunks * chunk_size:
+            return Response({'error': 'chunk_size does not match file_size and total_chunks'}, status=400)
+        in_place = True
+    else:
+        in_place = False
+
+    # Abandoned uploads of any worker are cleaned up from time to time,
+    # off the request thread; skipped while the media workers are saturated
+    try:
+        submit_media_task(maybe_gc_upload_sessions, name='upload-gc')
+    except (MediaQueueFull, MediaExecutorClosed):
+        pass
+
     upload_id  = uuid.uuid4().hex
-    chunks_dir = os.path.join(settings.MEDIA_ROOT, 'temp_uploads', upload_id)
+    chunks_dir = session_dir(upload_id)
     os.makedirs(chunks_dir, exist_ok=True)
+    if in_place:
+        _preallocate(os.path.join(chunks_dir, PART_FILE_NAME), file_size if total_chunks > 1 else 0)
 
-    _upload_sessions[upload_id] = {
+    get_session_store().create(upload_id, {
         'userid'      : userid,
         'subject'     : subject,
         'file_name'   : file_name,
         'file_size'   : file_size,
         'total_chunks': total_chunks,
-        'received'    : set(),
+        'chunk_size'  : chunk_size,
+        'in_place'    : in_place,
         'chunks_dir'  : chunks_dir,
         'product_id'  : request.data.get('product_id'),
         'file_purpose': request.data.get('file_purpose'),
         'sequence'    : request.data.get('sequence'),
-    }
+        'file_checksum': _normalize_checksum(request.data.get('file_checksum')),
+    })
 
     return Response({
         'upload_id'   : upload_id,
         'total_chunks': total_chunks,
+        'chunk_size'  : chunk_size,
         'mode'        : mode,
     })
 
 
+def _max_upload_size(ext):
+    """Largest file_size an upload of this extension may declare"""
+    if ext in VIDEO_EXTS:
+        return VIDEO_MAX_SIZE
+    if ext in IMAGE_EXTS:
+        return IMAGE_MAX_SIZE
+    return FILE_MAX_SIZE
+
+
+def _preallocate(path, size):
+    """Reserve the full file up front so chunks can be written at their offsets"""
+    size = min(size, VIDEO_MAX_SIZE)   # never reserve more than any upload may hold
+    with open(path, 'wb') as f:
+        if size <= 0:
+            return
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except (AttributeError, OSError):
+            f.truncate(size)   # sparse file where fallocate is unavailable
+
+
 # ─────────────────────────────────────────────────────────────
 # CHUNK
 # ─────────────────────────────────────────────────────────────
@@ -130,18 +217,113 @@ def _upload_chunk(request, userid):
     chunk_index = int(request.data.get('chunk_index', 0))
     file        = request.FILES.get('file')
 
-    session = _upload_sessions.get(upload_id)
+    store   = get_session_store()
+    session = store.get(upload_id) if is_valid_upload_id(upload_id) else None
     if not session or session['userid'] != userid:
         return Response({'error': 'Invalid session'}, status=403)
 
+    if not 0 <= chunk_index < session['total_chunks']:
+        return Response({'error': 'chunk_index out of range'}, status=400)
+
+    if not file:
+        return Response({'error': 'file is required'}, status=400)
+
+    checksum = _normalize_checksum(request.data.get('checksum'))
+
+    if session.get('in_place'):
+        error, digest = _write_chunk_in_place(session, chunk_index, file)
+        if error:
+            return Response({'error': error}, status=400)
+    else:
+        digest = _write_chunk_file(session, chunk_index, file, keep=lambda d: not checksum or d == checksum)
+
+    # A corrupted chunk is not marked received; the client simply re-sends it
+    if checksum and digest != checksum:
+        return Response({'error': 'Chunk checksum mismatch', 'chunk': chunk_index}, status=400)
+
+    store.mark_received(upload_id, chunk_index)
+    return Response({'success': True, 'chunk': chunk_index, 'checksum_verified': bool(checksum)})
+
+
+def _normalize_checksum(value):
+    """Accept 'sha256:<hex>' or bare hex; None when not given"""
+    if not value:
+        return None
+    value = str(value).strip().lower()
+    return value.split(':', 1)[1] if value.startswith('sha256:') else value
+
+
+def _write_chunk_in_place(session, chunk_index, file):
+    """
+    Write one chunk at its byte offset in the preallocated part file. Each
+    request uses its own file handle on a disjoint range, so chunks may
+    arrive in any order and in parallel. Returns (error message or None,
+    SHA-256 of the chunk).
+    """
+    part_path = os.path.join(session['chunks_dir'], PART_FILE_NAME)
+    chunk_size = session.get('chunk_size')
+
+    if chunk_size:
+        offset   = chunk_index * chunk_size
+        expected = min(chunk_size, session['file_size'] - offset)
+        if file.size != expected:
+            return f'Chunk {chunk_index} must be {expected} bytes, got {file.size}', None
+    else:
+        offset = 0   # single-chunk upload: the chunk is the whole file
+
+    digest = hashlib.sha256()
+    with open(part_path, 'r+b') as f:
+        f.seek(offset)
+        for data in file.chunks():
+            digest.update(data)
+            f.write(data)
+        if not chunk_size:
+            f.truncate()   # file_size from the client is only a hint here
+    return None, digest.hexdigest()
+
+
+def _write_chunk_file(session, chunk_index, file, keep):
+    """
+    Legacy mode: store the chunk as its own file. It is written under a
+    unique temp name and renamed into place, so a retry racing the original
+    POST never leaves a half-written chunk behind. Returns the SHA-256.
+    """
     chunk_path = os.path.join(session['chunks_dir'], f'chunk_{chunk_index:05d}')
+    tmp_path   = f'{chunk_path}.{uuid.uuid4().hex}.tmp'
 
-    with open(chunk_path, 'wb') as f:
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as f:
         for data in file.chunks():
+            digest.update(data)
             f.write(data)
 
-    session['received'].add(chunk_index)
-    return Response({'success': True, 'chunk': chunk_index})
+    if keep(digest.hexdigest()):
+        os.replace(tmp_path, chunk_path)
+    else:
+        os.remove(tmp_path)
+    return digest.hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────
+# STATUS (resume)
+# ─────────────────────────────────────────────────────────────
+def _upload_status(request, userid):
+    upload_id = request.data.get('upload_id')
+    session   = get_session_store().get(upload_id) if is_valid_upload_id(upload_id) else None
+
+    if not session or session['userid'] != userid:
+        return Response({'error': 'Session expired or not found'}, status=404)
+
+    received = session['received']
+    return Response({
+        'upload_id'      : upload_id,
+        'total_chunks'   : session['total_chunks'],
+        'chunk_size'     : session.get('chunk_size'),
+        'received_bitmap': received.encode(),   # base64, bit i (LSB first) = chunk i
+        'received_count' : len(received),
+        'missing'        : received.missing(),
+        'complete'       : received.is_complete(),
+    })
 
 
 # ─────────────────────────────────────────────────────────────
@@ -150,30 +332,50 @@ def _upload_chunk(request, userid):
 def _upload_finish(request, userid):
     try:
         upload_id = request.data.get('upload_id')
-        session   = _upload_sessions.get(upload_id)
+        session   = get_session_store().get(upload_id) if is_valid_upload_id(upload_id) else None
 
-        if not session:
+        if not session or session['userid'] != userid:
             return Response({'error': 'Session expired or not found'}, status=400)
 
         total_chunks = session['total_chunks']
         received     = session['received']
 
         # 1. Verify all chunks received
-        if len(received) < total_chunks:
-            missing = list(set(range(total_chunks)) - received)
-            return Response({'error': 'Incomplete upload', 'missing': missing}, status=400)
+        if not received.is_complete():
+            return Response({'error': 'Incomplete upload', 'missing': received.missing()}, status=400)
+
+        # Only one request may finish an upload (clients retry finish on timeouts)
+        try:
+            os.close(os.open(os.path.join(session['chunks_dir'], 'finishing'), os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return Response({'error': 'Upload is already being finished'}, status=409)
 
-        # 2. Assemble file from chunks
+        # 2. Assemble file from chunks (in-place uploads only need a rename)
         ext            = os.path.splitext(session['file_name'])[1].lower()
         assembled_path = os.path.join(session['chunks_dir'], f'final_build{ext}')
-
-        with open(assembled_path, 'wb') as outfile:
-            for i in range(total_chunks):
-                chunk_path = os.path.join(session['chunks_dir'], f'chunk_{i:05d}')
-                with open(chunk_path, 'rb') as infile:
-                    shutil.copyfileobj(infile, outfile)
-            outfile.flush()
-            os.fsync(outfile.fileno())  # Force write to disk (prevents 'moov' loss on videos)
+        digest         = hashlib.sha256()
+
+        if session.get('in_place'):
+            os.replace(os.path.join(session['chunks_dir'], PART_FILE_NAME), assembled_path)
+            with open(assembled_path, 'rb+') as outfile:
+                if session.get('file_checksum'):
+                    for data in iter(lambda: outfile.read(1024 * 1024), b''):
+                        digest.update(data)
+                os.fsync(outfile.fileno())  # Force write to disk (prevents 'moov' loss on videos)
+        else:
+            with open(assembled_path, 'wb') as outfile:
+                for i in range(total_chunks):
+                    chunk_path = os.path.join(session['chunks_dir'], f'chunk_{i:05d}')
+                    with open(chunk_path, 'rb') as infile:
+                        for data in iter(lambda: infile.read(1024 * 1024), b''):
+                            digest.update(data)
+                            outfile.write(data)
+                outfile.flush()
+                os.fsync(outfile.fileno())  # Force write to disk (prevents 'moov' loss on videos)
+
+        if session.get('file_checksum') and digest.hexdigest() != session['file_checksum']:
+            _cleanup_session(upload_id)
+            return Response({'error': 'File checksum mismatch, upload discarded'}, status=400)
 
         # 3. Save to DB — profile picture is handled directly (see _save_profile_picture_direct),
         #    product media goes through FileManager as before.
@@ -183,11 +385,14 @@ def _upload_finish(request, userid):
         _cleanup_session(upload_id)
 
         if not result.get('success'):
-            return Response({'error': result.get('error')}, status=400)
+            return Response({'error': result.get('error')}, status=result.get('status_code', 400))
 
         return Response(result)
 
     except Exception as e:
+        # The part file may already be renamed / half-consumed: start over
+        if is_valid_upload_id(request.data.get('upload_id')):
+            _cleanup_session(request.data.get('upload_id'))
         return Response({'error': f'Assembly failed: {str(e)}'}, status=500)
 
 
@@ -295,6 +500,14 @@ def _save_profile_picture_direct(userid, session, assembled_path):
                     os.remove(old_path)
                 except OSError:
                     pass  # Non-fatal — carry on
+            delete_profile_thumbnails(profile.profile_url)
+
+        # Build the list thumbnails once, in the background, instead of on every
+        # list request (a list request builds them itself if this was skipped)
+        try:
+            submit_media_task(generate_profile_thumbnails, relative_url, name='profile-thumbnails')
+        except (MediaQueueFull, MediaExecutorClosed):
+            pass
 
         profile.profile_url = relative_url
         profile.save()
@@ -329,26 +542,21 @@ def _save_product_media(userid, session, assembled_path):
     if session.get('file_purpose') in ('img', 'vid'):
         media_type = session['file_purpose']
 
-    # Wrap assembled file for FileManager
-    with open(assembled_path, 'rb') as f:
-        django_file = InMemoryUploadedFile(
-            f,
-            None,
-            session['file_name'],
-            mimetypes.guess_type(session['file_name'])[0],
-            os.path.getsize(assembled_path),
-            None,
-        )
-
+    # Hand the assembled file to FileManager by path: it is moved into place,
+    # not copied (see FileManager._save_video / _save_product_image)
+    django_file = _AssembledFile(assembled_path, session['file_name'])
+    try:
         result = fm.save_product_file(
             file=django_file,
             product_id=product_id,
             file_type=media_type,
             sequence=session.get('sequence'),
         )
+    finally:
+        django_file.close()
 
     if not result.get('success'):
-        return {'success': False, 'error': result.get('error')}
+        return {'success': False, 'error': result.get('error'), 'status_code': result.get('status_code', 400)}
 
     # Resolve sequence
     current_media = product.media_url
@@ -366,6 +574,8 @@ def _save_product_media(userid, session, assembled_path):
         'media_url' : result['file_url'],
         'media_type': media_type,
     }
+    if result.get('variants'):
+        new_entry['variants'] = result['variants']
 
     # Deduplicate by serial_no (handles retries) then append + sort
     current_media = [m for m in current_media if m.get('serial_no') != sequence]
@@ -375,11 +585,19 @@ def _save_product_media(userid, session, assembled_path):
     product.media_url = current_media
     product.save()
 
+    # The conversion may already have finished (inline executor, idle worker)
+    # before the entry existed: attach its renditions now
+    if result.get('job_id'):
+        job = TranscodeJob.objects.filter(pk=result['job_id'], status='DONE').first()
+        if job is not None:
+            attach_renditions(job)
+
     return {
         'success'   : True,
         'file_url'  : result['file_url'],
         'serial_no' : sequence,
         'media_type': media_type,
+        'job_id'    : result.get('job_id'),   # poll /api/file/transcode-job/<job_id>/
     }
 
 
@@ -388,7 +606,7 @@ def _save_product_media(userid, session, assembled_path):
 # ─────────────────────────────────────────────────────────────
 def _upload_abort(request, userid):
     upload_id = request.data.get('upload_id')
-    session   = _upload_sessions.get(upload_id)
+    session   = get_session_store().get(upload_id) if is_valid_upload_id(upload_id) else None
 
     if session and session['userid'] == userid:
         _cleanup_session(upload_id)
@@ -401,37 +619,86 @@ def _upload_abort(request, userid):
 # CLEANUP
 # ─────────────────────────────────────────────────────────────
 def _cleanup_session(upload_id):
-    session = _upload_sessions.pop(upload_id, None)
-    if session:
-        shutil.rmtree(session['chunks_dir'], ignore_errors=True)
+    get_session_store().delete(upload_id)
+    shutil.rmtree(session_dir(upload_id), ignore_errors=True)
 
 
 # ─────────────────────────────────────────────────────────────
 # FILE WRAPPER
 # ─────────────────────────────────────────────────────────────
 class _AssembledFile:
+    """
+    Uploaded-file stand-in for a file already on disk. Like Django's
+    TemporaryUploadedFile it exposes temporary_file_path(), which tells
+    FileManager it may move the file instead of copying it.
+    """
     def __init__(self, path, name):
         self.path = path
         self.name = name
         self.size = os.path.getsize(path)
-        self._fh  = open(path, 'rb')
+        self._fh  = None
+
+    def temporary_file_path(self):
+        return self.path
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.path, 'rb')
+        return self._fh
 
     def chunks(self, size=64 * 1024):
-        self._fh.seek(0)
+        fh = self._open()
+        fh.seek(0)
         while True:
-            data = self._fh.read(size)
+            data = fh.read(size)
             if not data:
                 break
             yield data
 
     def read(self, size=-1):
-        return self._fh.read(size)
+        return self._open().read(size)
 
     def seek(self, pos):
-        self._fh.seek(pos)
+        self._open().seek(pos)
 
     def close(self):
-        self._fh.close()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+# ─────────────────────────────────────────────────────────────
+# TRANSCODE JOB STATUS
+# ─────────────────────────────────────────────────────────────
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def transcode_job_status(request, job_id):
+    userid = request.headers.get('user-id')
+
+    job = TranscodeJob.objects.filter(pk=job_id, user_id=userid).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=404)
+
+    return Response({
+        'job_id'     : job.pk,
+        'product_id' : job.product_id,
+        'status'     : job.status,
+        'progress'   : job.progress,
+        'error'      : job.error,
+        'outputs'    : job.outputs,
+        'created_at' : job.created_at,
+        'started_at' : job.started_at,
+        'finished_at': job.finished_at,
+    })
+
+
+# ─────────────────────────────────────────────────────────────
+# MEDIA EXECUTOR METRICS (this worker process)
+# ─────────────────────────────────────────────────────────────
+@api_view(['GET'])
+@permission_classes([AllowAny, IsAdmin])
+def media_executor_metrics(request):
+    return Response(get_media_executor().metrics())
 
 
 ##########################################################################################
@@ -454,7 +721,7 @@ def big_file_download(request):
     if subject == 'PROFILE_PICTURE':
         result, status= profile_pic_download(userid=userid)
     elif subject == 'PRODUCT_MEDIA':
-        result, status= product_media_download(product_id=product_id, seq=seq)
+        result, status= product_media_download(product_id=product_id, seq=seq, variant=request.data.get('variant'))
     elif subject == 'USER_ID_VERIFICATION_MEDIA':
         result, status= user_id_verification_download(userid=userid, seq=seq)
     else:
@@ -479,7 +746,7 @@ def big_file_download_v2(request):
     if subject == 'PROFILE_PICTURE':
         result, status= profile_pic_download(userid=userid)
     elif subject == 'PRODUCT_MEDIA':
-        result, status= product_media_download(userid=userid, product_id=product_id, seq=seq)
+        result, status= product_media_download(userid=userid, product_id=product_id, seq=seq, variant=request.data.get('variant'))
     elif subject == 'USER_ID_VERIFICATION_MEDIA':
         result, status= user_id_verification_download(userid=userid, seq=seq)
     else:
@@ -487,71 +754,181 @@ def big_file_download_v2(request):
 
     return Response(result, status=status)
 
-##########################################################################################
-#                             Big File DOWNLOAD End
-##########################################################################################
+# ─────────────────────────────────────────────────────────────
+# STREAMING DOWNLOAD (raw bytes, Range / ETag / 304)
+#
+#   GET /api/file/stream/?subject=PRODUCT_MEDIA&product_id=...&seq=2
+#   Same subjects as big_file_download; the file is sent as raw bytes so a
+#   video player can seek and a client can revalidate with If-None-Match.
+# ─────────────────────────────────────────────────────────────
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+def big_file_stream(request):
+    userid  = request.headers.get('user-id')
+    subject = request.query_params.get('subject')
+    seq     = request.query_params.get('seq', 1)
+
+    if subject == 'PROFILE_PICTURE':
+        file_path, meta, http_status = _resolve_profile_pic(request.query_params.get('user_id') or userid)
+    elif subject == 'PRODUCT_MEDIA':
+        file_path, meta, http_status = _resolve_product_media(
+            request.query_params.get('product_id'), seq, request.query_params.get('variant'),
+        )
+    elif subject == 'USER_ID_VERIFICATION_MEDIA':
+        owner, denied = _authorize_id_verification(request, request.query_params.get('user_id'))
+        if denied:
+            return denied
+        file_path, meta, http_status = _resolve_user_id_verification(owner, seq)
+    else:
+        return Response({'error': 'Invalid or missing subject'}, status=400)
+
+    if file_path is None:
+        return Response(meta, status=http_status)
+
+    try:
+        response = serve_media(request._request, file_path)
+    except FileNotFoundError:
+        return Response({'error': 'File not found'}, status=404)
+
+    response.headers['X-Media-Type'] = str(meta.get('media_type'))
+    response.headers['X-Media-Total'] = str(meta.get('total'))
+    response.headers['X-Media-Seq'] = str(meta.get('seq'))
+    return response
 
 
 # ─────────────────────────────────────────────────────────────
-# PROFILE PICTURE DOWNLOAD  ← untouched from original
+# PRODUCT VIDEO RENDITIONS (HLS)
+#   GET api/file/video/<product_id>/<serial_no>/master.m3u8 is the stream a
+#   player opens; the playlists reference their variants and segments by
+#   relative path, which resolve back to this view.
 # ─────────────────────────────────────────────────────────────
-def profile_pic_download(userid):
-    """Download and base64-encode a user's profile picture."""
+_VIDEO_ASSET_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.mp4' : 'video/mp4',
+    '.jpg' : 'image/jpeg',
+}
+
+
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+def product_video_asset(request, product_id, seq, asset):
+    content_type = _VIDEO_ASSET_TYPES.get(os.path.splitext(asset)[1].lower())
+    if content_type is None:
+        return Response({'error': 'Invalid asset'}, status=400)
+
+    product = Product.objects.only('media_url').filter(p_id=product_id).first()
+    media = product.media_url if product and isinstance(product.media_url, list) else []
+    entry = next((m for m in media if m.get('serial_no') == seq and m.get('playlist_url')), None)
+    if entry is None:
+        return Response({'error': 'No renditions for this media'}, status=404)
+
+    root = os.path.realpath(settings.MEDIA_ROOT + '/' + os.path.dirname(entry['playlist_url']))
+    file_path = os.path.realpath(os.path.join(root, asset))
+    if not file_path.startswith(root + os.sep):
+        return Response({'error': 'Invalid asset'}, status=400)
 
     try:
-        user    = Users.objects.get(user_id=userid, profile_status='ACTIVATED')
-        profile = user.profile_id
-    except Users.DoesNotExist:
-        return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 1, 'seq': 1}, status.HTTP_404_NOT_FOUND
+        return serve_media(request._request, file_path, content_type=content_type)
+    except FileNotFoundError:
+        return Response({'error': 'File not found'}, status=404)
 
-    if profile.profile_url:
-        profile_url = settings.MEDIA_ROOT + '/' + profile.profile_url
+
+# ─────────────────────────────────────────────────────────────
+# SIGNED MEDIA URLS
+#   POST api/file/signed-url/  (same body as big_file_download) mints a
+#   short-lived HMAC URL for the resolved file; GET on that URL is answered
+#   by the front proxy (X-Accel-Redirect / X-Sendfile) or, locally, streamed.
+#   See backend.utils.signed_media.
+# ─────────────────────────────────────────────────────────────
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def media_signed_url(request):
+    userid  = request.headers.get('user-id')
+    subject = request.data.get('subject')
+    seq     = request.data.get('seq', 1)
+
+    if subject == 'PROFILE_PICTURE':
+        file_path, meta, http_status = _resolve_profile_pic(request.data.get('user_id') or userid)
+    elif subject == 'PRODUCT_MEDIA':
+        file_path, meta, http_status = _resolve_product_media(
+            request.data.get('product_id'), seq, request.data.get('variant'),
+        )
+    elif subject == 'USER_ID_VERIFICATION_MEDIA':
+        owner, denied = _authorize_id_verification(request, request.data.get('user_id'))
+        if denied:
+            return denied
+        file_path, meta, http_status = _resolve_user_id_verification(owner, seq)
     else:
-        user_type = profile.user_type.lower()
-        default_map = {
-            'verifiedfarmer'  : 'pp-farmer.png',
-            'farmer'          : 'pp-farmer.png',
-            'verifiedconsumer': 'pp-consumer.png',
-            'consumer'        : 'pp-consumer.png',
-            'admin'           : 'pp-admin.png',
-            'superadmin'      : 'pp-superadmin.png',
-        }
-        filename    = default_map.get(user_type, 'pp-guest.png')
-        profile_url = f'backend/static/DefaultProfilePicture/{filename}'
+        return Response({'error': 'Invalid or missing subject'}, status=400)
+
+    if file_path is None:
+        return Response(meta, status=http_status)
+
+    try:
+        url, expires = sign_media_url(file_path)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    return Response({
+        'url'       : url,
+        'expires_at': expires,
+        'mime_type' : mimetypes.guess_type(file_path)[0],
+        **meta,
+    })
+
+
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+def signed_media(request, root, path):
+    file_path = verify_media_signature(
+        root, path, request.query_params.get('exp'), request.query_params.get('sig'),
+    )
+    if file_path is None:
+        return Response({'error': 'Invalid or expired link'}, status=403)
 
     try:
-        with open(profile_url, 'rb') as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-        mime_type, _ = mimetypes.guess_type(profile_url)
+        return serve_media(request._request, file_path)
     except FileNotFoundError:
-        fallback = 'backend/static/DefaultProfilePicture/pp-guest.png'
-        with open(fallback, 'rb') as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-        mime_type = 'image/png'
+        return Response({'error': 'File not found'}, status=404)
 
-    return {
-        'file'      : encoded_image,
-        'mime_type' : mime_type,
-        'media_type': 'img',
-        'total'     : 1,
-        'seq'       : 1,
-    }, status.HTTP_200_OK
+##########################################################################################
+#                             Big File DOWNLOAD End
+##########################################################################################
 
 
+##########################################################################################
+#                             Media Path Resolution
+#
+#  Shared by the JSON (base64) downloads above and the streaming download below.
+#  Each resolver returns (file_path, meta, http_status); file_path is None when
+#  nothing can be served and meta is then the JSON error body.
+##########################################################################################
 
+def _resolve_profile_pic(userid):
+    try:
+        user    = Users.objects.select_related('profile_id').get(user_id=userid, profile_status='ACTIVATED')
+        profile = user.profile_id
+    except Users.DoesNotExist:
+        return None, {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 1, 'seq': 1}, status.HTTP_404_NOT_FOUND
 
-# ─────────────────────────────────────────────────────────────
-# PRODUCT MEDIA DOWNLOAD  ← untouched from original
-# ─────────────────────────────────────────────────────────────
-def product_media_download(product_id, seq=1):
-    """Download and base64-encode a product media file by sequence number."""
+    if profile.profile_url:
+        profile_url = settings.MEDIA_ROOT + '/' + profile.profile_url
+    else:
+        profile_url = default_profile_picture_path(profile.user_type)
+
+    if not os.path.isfile(profile_url):
+        profile_url = f'{DEFAULT_PROFILE_PICTURE_DIR}/{GUEST_PROFILE_PICTURE}'
+
+    return profile_url, {'media_type': 'img', 'total': 1, 'seq': 1}, status.HTTP_200_OK
 
+
+def _resolve_product_media(product_id, seq=1, variant=None):
     try:
-        product = Product.objects.get(p_id=product_id)
+        product = Product.objects.only('media_url').get(p_id=product_id)
         media_list = product.media_url or []
 
         if not media_list:
-            return {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
+            return None, {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
         # Find media by serial_no
         target_media = None
@@ -561,43 +938,51 @@ def product_media_download(product_id, seq=1):
                 break
 
         if not target_media:
-            return {'file': None, 'mime_type': None, 'media_type': None, 'total': len(media_list), 'seq': 0}, status.HTTP_404_NOT_FOUND
+            return None, {'file': None, 'mime_type': None, 'media_type': None, 'total': len(media_list), 'seq': 0}, status.HTTP_404_NOT_FOUND
 
         file_path = settings.MEDIA_ROOT + '/' + target_media.get('media_url', '')
 
-        try:
-            with open(file_path, 'rb') as image_file:
-                encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-            mime_type, _ = mimetypes.guess_type(file_path)
-        except FileNotFoundError:
-            return {'file': None, 'mime_type': None, 'media_type': None, 'total': len(media_list), 'seq': 0}, status.HTTP_404_NOT_FOUND
-
-        return {
-            'file': encoded_image,
-            'mime_type': mime_type,
+        # small / medium / large image variant instead of the full image
+        if variant and target_media.get('media_type') == 'img':
+            variant_file = settings.MEDIA_ROOT + '/' + media_entry_url(target_media, normalize_image_size(variant))
+            if os.path.isfile(variant_file):
+                file_path = variant_file
+
+        if not os.path.isfile(file_path):
+            return None, {'file': None, 'mime_type': None, 'media_type': None, 'total': len(media_list), 'seq': 0}, status.HTTP_404_NOT_FOUND
+
+        return file_path, {
             'media_type': target_media.get('media_type'),
             'total': len(media_list),
             'seq': target_media.get('serial_no'),
         }, status.HTTP_200_OK
 
     except Product.DoesNotExist:
-        return {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
+        return None, {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
     except Exception as e:
-        return {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_400_BAD_REQUEST
+        return None, {'file': None, 'mime_type': None, 'media_type': None, 'total': 0, 'seq': 0}, status.HTTP_400_BAD_REQUEST
 
 
+def _authorize_id_verification(request, owner_id=None):
+    """
+    ID documents are only served with a valid token, to their owner or to an
+    admin. Returns (user_id whose documents to serve, None) or (None, error
+    Response).
+    """
+    if not HasValidTokenForUser().has_permission(request, None):
+        return None, Response({'error': 'A valid token is required'}, status=401)
 
+    userid   = request.headers.get('user-id')
+    owner_id = owner_id or userid
+    if owner_id != userid and not IsAdmin().has_permission(request, None):
+        return None, Response({'error': 'Not allowed to access this user\'s documents'}, status=403)
+    return owner_id, None
 
-# ─────────────────────────────────────────────────────────────
-# ID VERIFICATION DOWNLOAD  ← untouched from original
-# ─────────────────────────────────────────────────────────────
-def user_id_verification_download(userid, seq=1):
-    """Download and base64-encode a user's ID verification image (front or back)."""
 
+def _resolve_user_id_verification(userid, seq=1):
     try:
-        user = Users.objects.get(user_id=userid)
-        verification = Verification.objects.filter(user_id=user).latest('submission_date')
+        verification = Verification.objects.filter(user_id__user_id=userid).latest('submission_date')
 
         seq = int(seq)
         if seq == 1:
@@ -610,32 +995,61 @@ def user_id_verification_download(userid, seq=1):
             relative_path = verification.id_front  # fallback
 
         if not relative_path:
-            return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': seq}, status.HTTP_404_NOT_FOUND
+            return None, {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': seq}, status.HTTP_404_NOT_FOUND
 
         file_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        if not os.path.isfile(file_path):
+            return None, {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
-        with open(file_path, 'rb') as f:
-            encoded_file = base64.b64encode(f.read()).decode('utf-8')
+        return file_path, {'media_type': 'img', 'total': 3, 'seq': seq}, status.HTTP_200_OK
 
-        mime_type, _ = mimetypes.guess_type(file_path)
+    except Verification.DoesNotExist:
+        return None, {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
-        return {
-            'file': encoded_file,
-            'mime_type': mime_type,
-            'media_type': 'img',
-            'total': 3,
-            'seq': seq,
-        }, status.HTTP_200_OK
+    except Exception as e:
+        print(f"[user_id_verification_download] Unexpected error: {e}")
+        return None, {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_400_BAD_REQUEST
 
-    except Users.DoesNotExist:
-        return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
-    except Verification.DoesNotExist:
-        return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
+def _encode_media(file_path, meta):
+    """JSON variant: base64 body plus the resolver's metadata"""
+    with open(file_path, 'rb') as f:
+        encoded = base64.b64encode(f.read()).decode('utf-8')
+    mime_type, _ = mimetypes.guess_type(file_path)
+    return {'file': encoded, 'mime_type': mime_type, **meta}
 
-    except FileNotFoundError:
-        return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_404_NOT_FOUND
 
-    except Exception as e:
-        print(f"[user_id_verification_download] Unexpected error: {e}")
-        return {'file': None, 'mime_type': None, 'media_type': 'img', 'total': 0, 'seq': 0}, status.HTTP_400_BAD_REQUEST
\ No newline at end of file
+# ─────────────────────────────────────────────────────────────
+# PROFILE PICTURE DOWNLOAD
+# ─────────────────────────────────────────────────────────────
+def profile_pic_download(userid):
+    """Download and base64-encode a user's profile picture."""
+    file_path, meta, http_status = _resolve_profile_pic(userid)
+    if file_path is None:
+        return meta, http_status
+    return _encode_media(file_path, meta), http_status
+
+
+# ─────────────────────────────────────────────────────────────
+# PRODUCT MEDIA DOWNLOAD
+# ─────────────────────────────────────────────────────────────
+def product_media_download(product_id, seq=1, userid=None, variant=None):
+    """
+    Download and base64-encode a product media file by sequence number;
+    variant ('small' / 'medium' / 'large') picks a smaller copy of an image.
+    """
+    file_path, meta, http_status = _resolve_product_media(product_id, seq, variant)
+    if file_path is None:
+        return meta, http_status
+    return _encode_media(file_path, meta), http_status
+
+
+# ─────────────────────────────────────────────────────────────
+# ID VERIFICATION DOWNLOAD
+# ─────────────────────────────────────────────────────────────
+def user_id_verification_download(userid, seq=1):
+    """Download and base64-encode a user's ID verification image (front or back)."""
+    file_path, meta, http_status = _resolve_user_id_verification(userid, seq)
+    if file_path is None:
+        return meta, http_status
+    return _encode_media(file_path, meta), http_status
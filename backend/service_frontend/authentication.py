@@ -144,13 +144,15 @@ def login_with_token(request):
         #print('1')
         # Find token entry in database
         token_entry = Tokens.objects.get(
-            token=token,
+            token_digest=Tokens.hash_token(token),
             user_id__user_id=user_id,
             refresh_token=refresh_token,
             device_info=device_info
         )
 
-        if token_entry.token_status != 'ACTIVE':
+        # EXPIRED is set by the expiry sweeper; such a token can still be
+        # exchanged below through its refresh_token.
+        if token_entry.token_status not in ('ACTIVE', 'EXPIRED'):
             return Response({
             'error': 'Token is expired.'
             }, status=status.HTTP_401_UNAUTHORIZED)
@@ -167,7 +169,7 @@ def login_with_token(request):
         # Check if token is expired (after 40 days)
         current_time = timezone.now()
         #print('3')
-        if current_time > token_entry.expires_at:
+        if token_entry.token_status == 'EXPIRED' or current_time > token_entry.expires_at:
             # Token expired but present - generate new tokens using refresh_token
             new_token_obj = check_generate_save_new_token(user, device_info) 
             new_token = new_token_obj.token
@@ -250,7 +252,7 @@ def logout(request):
     user_id = request.headers.get("user-id")
 
     try:
-        token_obj = Tokens.objects.get(token=token, user_id=user_id)
+        token_obj = Tokens.objects.get(token_digest=Tokens.hash_token(token), user_id=user_id)
         user_obj = token_obj.user_id  # ✅ actual Users object, not raw string
 
         token_obj.deactivate()
@@ -3,6 +3,7 @@ This file is for updating farm product from json to database
 '''
 import json
 from backend.models import FarmProducts
+from backend.utils.farm_product_terms import invalidate_farm_product_terms
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -38,6 +39,7 @@ def update_farm_products(request):
             unique_fields=['id'],
             update_fields=['primary_name', 'secondary_name', 'category']
         )
+        invalidate_farm_product_terms()
         return Response({'message': f'Successfully updated {len(new_products)} products'}, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -2,9 +2,12 @@ from backend.permissions import HasValidTokenForUser, IsFarmer, IsAdmin
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from backend.models import Users, Product, FarmProducts, UserActivity, ProductRating, OrderRequest
+from backend.models import Users, Product, FarmProducts, UserActivity
 from backend.serializers import ProductSerializer
 from backend.utils.media_handler import FileManager
+from backend.utils.product_stats import get_product_stats
+from backend.utils.image_variants import media_entry_url, normalize_image_size
+from backend.utils.farm_product_terms import get_farm_product_terms, invalidate_farm_product_terms
 from django.db.models import Q  
 from django.utils import timezone
 from datetime import timedelta
@@ -129,6 +132,7 @@ def handle_product_creation(user_id, data):
                         secondary_name=clean_kw,
                         category=product_type
                     )
+                    invalidate_farm_product_terms()
                     
 
 
@@ -423,35 +427,28 @@ def all_available_categories(request):
 def available_farm_product_on_category(request):
     category = request.data.get('category')
     keyword = request.data.get('keyword', '').strip()
+    match = 'prefix' if request.data.get('match') == 'prefix' else 'contains'
 
-    try:
-        # Base queryset
-        if not category or category.lower() == "all":
-            farm_products = FarmProducts.objects.all().order_by('id')
-        else:
-            farm_products = FarmProducts.objects.filter(
-                category__icontains=category
-            ).order_by('id')
-
-        # Apply keyword filter if provided
-        if keyword:
-            farm_products = farm_products.filter(
-                primary_name__icontains=keyword
-            ) | farm_products.filter(
-                secondary_name__icontains=keyword
-            )
-
-        data = [
-            {
-                "id": p.id,
-                "english_name": p.primary_name,
-                "nepali_name": p.secondary_name,
-            }
-            for p in farm_products
-        ]
-
-    except FarmProducts.DoesNotExist:
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+    # Answered from the in-process FarmProducts dictionary
+    terms = get_farm_product_terms()
+    if not category or category.lower() == "all":
+        fp_ids = terms.in_category()
+    else:
+        fp_ids = terms.in_category(category)
+
+    # Apply keyword filter if provided
+    if keyword:
+        keyword_ids = set(terms.lookup(keyword, match))
+        fp_ids = [i for i in fp_ids if i in keyword_ids]
+
+    data = [
+        {
+            "id": fp_id,
+            "english_name": terms.names[fp_id][0],
+            "nepali_name": terms.names[fp_id][1],
+        }
+        for fp_id in fp_ids
+    ]
 
     return Response(
         {"category": category, "farm_products": data},
@@ -474,7 +471,6 @@ from backend.models import Users, Product, Connections, ProductScore, FarmProduc
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.db.models import Avg
 
 ##########################################################################################
 #                            Product Management End
@@ -501,7 +497,7 @@ def product_home_admin(request):
 @permission_classes([AllowAny])
 def product_filter_admin(request):
     from django.core.paginator import Paginator
-    from django.db.models import Q, Avg, Sum
+    from django.db.models import Q
 
     search_term    = request.data.get('search_term')
     district       = request.data.get('district')
@@ -538,15 +534,21 @@ def product_filter_admin(request):
             query &= Q(product_status='Not-Available') if status_lower == 'not-available' else Q(product_status=product_status)
 
     # ── Query ─────────────────────────────────────────────────────────────────
-    products  = Product.objects.filter(query).order_by('-registered_at')
+    products  = (
+        Product.objects
+        .filter(query)
+        .select_related('stats', 'user_id__profile_id')
+        .order_by('-registered_at')
+    )
     paginator = Paginator(products, 10)
     page_obj  = paginator.get_page(page_number)
 
     # ── Serialize ─────────────────────────────────────────────────────────────
     data = []
     for product in page_obj:
-        rating = ProductRating.objects.filter(p_id=product).aggregate(Avg('score'))['score__avg']
-        sales  = OrderRequest.objects.filter(product=product).aggregate(total=Sum('total_cost'))['total'] or 0
+        stats  = get_product_stats(product)
+        rating = stats.avg_score if stats.rating_count else None
+        sales  = stats.total_sales
 
         data.append({
             "p_id":           product.p_id,
@@ -579,14 +581,13 @@ def product_filter_admin(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def product_details_for_users(request):
-    from django.db.models import Avg, Count
     from backend.utils.score_tracker import track_product_view
     
     p_id = request.data.get('p_id')
     user_id = request.headers.get('user-id')
     
     try:
-        product = Product.objects.select_related('user_id__profile_id').get(p_id=p_id)
+        product = Product.objects.select_related('user_id__profile_id', 'stats').get(p_id=p_id)
         farmer = product.user_id
         
         # Track view if user is not the owner
@@ -597,12 +598,11 @@ def product_details_for_users(request):
             except Users.DoesNotExist:
                 pass
         
-        # Get rating stats
-        rating_count = ProductRating.objects.filter(p_id=product).count()
-        avg_rating = ProductRating.objects.filter(p_id=product).aggregate(Avg('score'))['score__avg']
-        
-        # Get sold count
-        sold_count = OrderRequest.objects.filter(product=product, order_status='DELIVERED').count()
+        # Get rating stats / sold count (ProductStats rollup)
+        stats = get_product_stats(product)
+        rating_count = stats.rating_count
+        avg_rating = stats.avg_score if rating_count else None
+        sold_count = stats.delivered_count
         
         # Format sold count
         if sold_count >= 1000000:
@@ -614,6 +614,7 @@ def product_details_for_users(request):
         
         # Get media count
         media_list = product.media_url or []
+        image_size = normalize_image_size(request.data.get('image_size'), default='large')
         
         data = {
             "p_id": product.p_id,
@@ -638,6 +639,15 @@ def product_details_for_users(request):
             "farmer_name": farmer.get_full_name_from_userModel(),
             "farmer_location": f"{farmer.profile_id.municipal}-{product.user_id.profile_id.ward}, {product.user_id.profile_id.district}",
             "no_of_media": len(media_list),
+            "media": [
+                {
+                    "serial_no": m.get('serial_no'),
+                    "media_type": m.get('media_type'),
+                    "url": media_entry_url(m, image_size),
+                    "playlist_url": m.get('playlist_url'),
+                }
+                for m in media_list if isinstance(m, dict)
+            ],
             "delivery_option": product.delivery_option
         }
     
@@ -657,7 +667,6 @@ def product_details_for_users(request):
 def my_product_list(request):
     from django.core.paginator import Paginator
     from datetime import datetime
-    from django.db.models import Avg
     
     user_id = request.headers.get('user-id')
     filter_status = request.data.get('filter', 'all')
@@ -666,6 +675,7 @@ def my_product_list(request):
     date_from = request.data.get('date_from', None)
     date_to = request.data.get('date_to', None)
     sort_by = request.data.get('sort_by', 'newest')
+    image_size = normalize_image_size(request.data.get('image_size'))
     # print(filter_status)
     if str(filter_status).lower() not in ['all', 'available', 'sold', 'expired', 'deleted', 'not-available', 'not available']:
         return Response({'error': 'Invalid filter'}, status=status.HTTP_400_BAD_REQUEST)
@@ -690,7 +700,7 @@ def my_product_list(request):
             date_to_obj = datetime.strptime(date_to, '%d-%m-%Y')
             query &= Q(registered_at__date__range=(date_from_obj.date(), date_to_obj.date()))
         
-        products = Product.objects.filter(query)
+        products = Product.objects.filter(query).select_related('stats')
         
         if sort_by == 'oldest':
             products = products.order_by('registered_at')
@@ -708,8 +718,10 @@ def my_product_list(request):
         
         data = []
         for p in page_obj:
-            rating = ProductRating.objects.filter(p_id=p).aggregate(Avg('score'))['score__avg']
-            sold_count = OrderRequest.objects.filter(product=p, order_status='DELIVERED').count()
+            stats = get_product_stats(p)
+            rating = stats.avg_score if stats.rating_count else None
+            sold_count = stats.delivered_count
+            media = p.media_url if isinstance(p.media_url, list) else []
             
             data.append({
                 "p_id": p.p_id,
@@ -720,7 +732,8 @@ def my_product_list(request):
                 "product_status": p.product_status,
                 "registered_at": p.registered_at.strftime('%d-%m-%Y'),
                 "rating": round(rating, 1) if rating else 0,
-                "sold_count": sold_count
+                "sold_count": sold_count,
+                "image_url": media_entry_url(media[0], image_size) if media else ""
             })
         
         return Response({
@@ -1,19 +1,37 @@
 from collections import defaultdict
 from datetime import timedelta
 
-from django.db.models import Avg, Count, Q
+from functools import reduce
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import (
+    Q, BooleanField, ExpressionWrapper, Case, When, Value, F, FloatField, IntegerField, OuterRef, Subquery,
+)
+from django.db.models.functions import Cast, Coalesce, Least
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from backend.permissions import HasValidTokenForUser, IsFarmer, IsAdmin
 from rest_framework import status
-from backend.models import Users, Product, FarmProducts, Connections, ProductRating, OrderRequest, ProductScore, Rating
+from backend.models import Users, Product, FarmProducts, Connections, ProductScore, ProductStats, UserReputation
+from backend.utils.product_stats import get_product_stats
+from backend.utils.auth_cache import get_request_user
 from backend.serializers import ProductSerializer
 from backend.utils.media_handler import FileManager
+from backend.utils.image_variants import media_entry_url, normalize_image_size
+from backend.utils.product_search import use_postgres_search, fulltext_q, similar_farm_products
+from backend.utils.farm_product_terms import get_farm_product_terms
+from backend.utils.locations import location_tier, same_location_q, annotate_location_tier
+from backend.utils.product_snapshot import product_snapshot, NO_EXPIRY
 from django.utils.dateparse import parse_date
+import hashlib
 import json
+import numpy as np
 import secrets
+import time
 
 
 # ─────────────────────────────────────────────
@@ -30,6 +48,11 @@ EXPIRY_WIDE_DAYS      = 90   # ≤ 90 days  → district radius (legacy)
 
 VALID_FILTERS = {"all", "connectiononly", "nearme"}
 
+FEED_SESSION_TTL      = 600  # seconds a ranked feed session is reused before re-ranking
+FEED_RANKING_MODE     = getattr(settings, "FEED_RANKING_MODE", "sql")   # "sql" | "python"
+FEED_TOP_K            = getattr(settings, "FEED_TOP_K", 500)            # products ranked into one feed session
+FEED_CURSOR_SALT      = "backend.product_feed.cursor"
+
 # Composite score weights
 W_LOCATION_TIER    = 100   # per tier level (×0–4)
 W_CONNECTION_BONUS = 200   # bonus for connected farmers
@@ -57,6 +80,7 @@ def _active_products_qs(exclude_user_id: str | None = None):
         )
         .filter(Q(expiry_Date__isnull=True) | Q(expiry_Date__gt=today))
         .select_related("user_id__profile_id")
+        .defer("search_vector")
     )
     if exclude_user_id:
         qs = qs.exclude(user_id__user_id=exclude_user_id)
@@ -69,24 +93,22 @@ def _active_products_qs(exclude_user_id: str | None = None):
 
 def _batch_fetch_stats(product_ids: list) -> tuple[dict, dict]:
     """
-    Single-pass batch fetch of average ratings and DELIVERED order counts.
+    Batch fetch of average ratings and DELIVERED order counts from the
+    ProductStats rollup (one indexed primary-key lookup, no aggregation).
     Returns (ratings_map, sold_map) keyed by p_id.
     """
-    ratings = (
-        ProductRating.objects
-        .filter(p_id__in=product_ids)
-        .values("p_id")
-        .annotate(avg_rating=Avg("score"))
-    )
-    ratings_map = {r["p_id"]: float(r["avg_rating"] or 0) for r in ratings}
-
-    sold = (
-        OrderRequest.objects
-        .filter(product__in=product_ids, order_status="DELIVERED")
-        .values("product")
-        .annotate(count=Count("order_id"))
+    ratings_map: dict = {}
+    sold_map: dict    = {}
+    rows = (
+        ProductStats.objects
+        .filter(product_id__in=product_ids)
+        .values_list("product_id", "avg_score", "rating_count", "delivered_count")
     )
-    sold_map = {s["product"]: s["count"] for s in sold}
+    for p_id, avg_score, rating_count, delivered_count in rows:
+        if rating_count:
+            ratings_map[p_id] = float(avg_score)
+        if delivered_count:
+            sold_map[p_id] = delivered_count
 
     return ratings_map, sold_map
 
@@ -136,20 +158,10 @@ def _location_tier(farmer_profile, user_profile) -> int:
         2 = same district
         1 = same province
         0 = nationwide
+    Compares the resolved Location ids (text for unresolved profiles), the
+    same rule annotate_location_tier() evaluates in SQL.
     """
-    if (
-        farmer_profile.ward
-        and farmer_profile.ward == user_profile.ward
-        and farmer_profile.municipal == user_profile.municipal
-    ):
-        return 4
-    if farmer_profile.municipal == user_profile.municipal:
-        return 3
-    if farmer_profile.district == user_profile.district:
-        return 2
-    if farmer_profile.province == user_profile.province:
-        return 1
-    return 0
+    return location_tier(farmer_profile, user_profile)
 
 
 def _compute_score(
@@ -200,274 +212,284 @@ def _compute_score(
     return s
 
 
+# ─────────────────────────────────────────────
+# SQL SCORING  (FEED_RANKING_MODE = "sql")
+# ─────────────────────────────────────────────
+
+def _score_expression(
+    user_profile,
+    category_scores: dict, product_scores: dict,
+    connection_farmer_ids: set,
+):
+    """
+    _compute_score as a queryset expression over the annotations added by
+    _annotate_feed_score (feed_tier, feed_rating, feed_sold).
+    A keyword listed twice in Product.keywords counts once here.
+    """
+    terms = [F("feed_tier") * W_LOCATION_TIER]
+
+    for fp_id, score in sorted(product_scores.items()):
+        if score:
+            terms.append(Case(
+                When(keywords__overlaps=[fp_id], then=Value(score * W_KEYWORD_SCORE)),
+                default=Value(0), output_field=IntegerField(),
+            ))
+
+    category_whens = [
+        When(product_type=category, then=Value(score * W_CATEGORY_SCORE))
+        for category, score in sorted(category_scores.items()) if score
+    ]
+    if category_whens:
+        terms.append(Case(*category_whens, default=Value(0), output_field=IntegerField()))
+
+    terms.append(Coalesce(F("feed_rating"), Value(0.0)) * W_RATING)
+    terms.append(Least(Coalesce(F("feed_sold"), Value(0)), Value(100)) * W_SOLD)
+
+    if connection_farmer_ids:
+        terms.append(Case(
+            When(user_id__in=sorted(connection_farmer_ids), then=Value(W_CONNECTION_BONUS)),
+            default=Value(0), output_field=IntegerField(),
+        ))
+
+    return Cast(reduce(lambda a, b: a + b, terms), FloatField())
+
+
+def _annotate_feed_score(qs, user_profile, category_scores=None, product_scores=None, connection_farmer_ids=None):
+    """
+    qs annotated with feed_tier, feed_rating / feed_sold (ProductStats
+    subqueries; NULL when there are no ratings / deliveries) and, when the
+    score inputs are given, feed_score.
+    """
+    stats = ProductStats.objects.filter(product=OuterRef("pk"))
+    qs = annotate_location_tier(qs, user_profile, "user_id__profile_id__", name="feed_tier").annotate(
+        feed_rating=Subquery(
+            stats.filter(rating_count__gt=0).annotate(rating=Cast("avg_score", FloatField())).values("rating")[:1]
+        ),
+        feed_sold=Subquery(stats.filter(delivered_count__gt=0).values("delivered_count")[:1]),
+    )
+    if category_scores is None:
+        return qs
+    return qs.annotate(feed_score=_score_expression(
+        user_profile, category_scores, product_scores, connection_farmer_ids or set(),
+    ))
+
+
+def _rank_in_db(
+    qs,
+    user_profile,
+    category_scores: dict,
+    product_scores: dict,
+    connection_farmer_ids: set | None = None,
+    limit: int = FEED_TOP_K,
+) -> tuple[list, dict, dict]:
+    """
+    _rank_ids evaluated by the database: the expiry gate is a WHERE
+    clause, the composite score an ORDER BY, and only the top `limit` rows
+    (plus up to `limit` local near-expiry rows) are loaded.
+    Same output shape: (ranked_products, ratings_map, sold_map).
+    """
+    near_expiry = Q(expiry_Date__isnull=False, expiry_Date__lte=timezone.now().date() + timedelta(days=EXPIRY_NEAR_DAYS))
+
+    regular = list(
+        _annotate_feed_score(qs.exclude(near_expiry), user_profile, category_scores, product_scores, connection_farmer_ids)
+        .order_by("-feed_score", "p_id")[:limit]
+    )
+    # Local (district or closer) near-expiry products, most urgent first
+    near_expiry_local = list(
+        _annotate_feed_score(qs.filter(near_expiry), user_profile)
+        .filter(feed_tier__gte=2)
+        .order_by("expiry_Date", "p_id")[:limit]
+    )
+
+    ratings_map: dict = {}
+    sold_map: dict    = {}
+    for p in regular + near_expiry_local:
+        if p.feed_rating is not None:
+            ratings_map[p.p_id] = p.feed_rating
+        if p.feed_sold:
+            sold_map[p.p_id] = p.feed_sold
+
+    ranked = regular[:1] + near_expiry_local + regular[1:]
+    return ranked, ratings_map, sold_map
+
+
+def _rank_queryset(
+    qs,
+    user_profile,
+    category_scores: dict,
+    product_scores: dict,
+    connection_farmer_ids: set | None = None,
+) -> tuple[list, dict, dict]:
+    """
+    Rank a candidate queryset with the configured FEED_RANKING_MODE.
+    "python" ranks the candidate p_ids on the product snapshot and loads
+    only the FEED_TOP_K winners.
+    """
+    if FEED_RANKING_MODE != "python":
+        return _rank_in_db(qs, user_profile, category_scores, product_scores, connection_farmer_ids, limit=FEED_TOP_K)
+
+    ranked_ids, ratings_map, sold_map = _rank_ids(
+        list(qs.values_list("p_id", flat=True)), user_profile,
+        category_scores, product_scores, connection_farmer_ids, limit=FEED_TOP_K,
+    )
+    products = qs.in_bulk(ranked_ids)
+    return [products[p_id] for p_id in ranked_ids if p_id in products], ratings_map, sold_map
+
+
 # ─────────────────────────────────────────────
 # FILTER / RANK  (shared pipeline)
 # ─────────────────────────────────────────────
 
-def _filter_and_rank(
-    products: list,
+def _top_k(scores, limit: int | None = None):
+    """
+    Positions of the `limit` highest scores, ordered by score descending and
+    then position (the order of a stable sort). argpartition finds the
+    cut-off score, so only the rows at or above it are sorted.
+    """
+    if limit is None or limit >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if limit <= 0:
+        return np.empty(0, dtype=np.int64)
+    cutoff = scores[np.argpartition(-scores, limit - 1)[limit - 1]]
+    candidates = np.flatnonzero(scores >= cutoff)
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+
+
+def _expiry_gate(snapshot, rows, tiers):
+    """(near_expiry, near_expiry_local) masks: expiring within EXPIRY_NEAR_DAYS, and from district or closer"""
+    expiry = snapshot.expiry[rows]
+    near = (expiry != NO_EXPIRY) & (expiry - timezone.now().date().toordinal() <= EXPIRY_NEAR_DAYS)
+    return near, near & (tiers >= 2)
+
+
+def _snapshot_scores(
+    snapshot, rows, tiers,
+    category_scores: dict, product_scores: dict,
+    connection_farmer_ids: set,
+):
+    """_compute_score for every row at once, summed in the same order"""
+    s = tiers * float(W_LOCATION_TIER)
+    s = s + snapshot.keyword_weights(rows, {k: v * W_KEYWORD_SCORE for k, v in product_scores.items() if v})
+    s = s + snapshot.category_weights(rows, {c: v * W_CATEGORY_SCORE for c, v in category_scores.items() if v})
+    s = s + snapshot.rating[rows] * W_RATING
+    s = s + np.minimum(snapshot.sold[rows], 100) * W_SOLD
+    s = s + snapshot.connection_mask(rows, connection_farmer_ids) * W_CONNECTION_BONUS
+    return s
+
+
+def _rank_ids(
+    p_ids: list,
     user_profile,
     category_scores: dict,
     product_scores: dict,
     connection_farmer_ids: set | None = None,
+    limit: int | None = None,
 ) -> tuple[list, dict, dict]:
     """
-    Shared ranking pipeline used by all three feed filters.
-    NOT used by search — search has its own expiry gate that
-    preserves match_count order.
+    Shared ranking pipeline used by all three feed filters, evaluated on
+    the product snapshot. NOT used by search — search has its own expiry
+    gate that preserves match_count order.
 
     Steps
     -----
     1. Hard-exclude products expiring within EXPIRY_NEAR_DAYS (7d) from
        non-local (outside district) farmers.
-    2. Score every surviving product with _compute_score.
+    2. Score every surviving product (vectorised _compute_score, see
+       _snapshot_scores).
     3. Collect local near-expiry products (≤7d, district-or-closer) —
        they jump to slot [1] after the top-scored item.
     4. Final order:
            [highest_score] + [near_expiry_local…] + [rest by score…]
 
-    Returns (ranked_products, ratings_map, sold_map).
+    Returns (ranked_ids, ratings_map, sold_map); with `limit`, at most
+    `limit` scored products plus `limit` local near-expiry ones.
     """
-    today        = timezone.now().date()
-    product_ids  = [p.p_id for p in products]
-    ratings_map, sold_map = _batch_fetch_stats(product_ids)
-
-    if connection_farmer_ids is None:
-        connection_farmer_ids = set()
+    if not p_ids:
+        return [], {}, {}
 
-    regular: list[tuple]  = []
-    near_expiry_local: list = []
+    with product_snapshot(ensure=p_ids) as snapshot:
+        p_ids = [p_id for p_id in p_ids if p_id in snapshot.row_of]
+        rows  = snapshot.rows(p_ids)
+        tiers = snapshot.tiers(rows, user_profile)
+        near, near_local = _expiry_gate(snapshot, rows, tiers)
 
-    for product in products:
-        farmer_profile = product.user_id.profile_id
-        tier      = _location_tier(farmer_profile, user_profile)
-        is_local  = tier >= 2  # district or closer
-
-        # ── Hard expiry gate ─────────────────────
-        if product.expiry_Date:
-            days_left = (product.expiry_Date - today).days
-            if days_left <= EXPIRY_NEAR_DAYS:
-                if not is_local:
-                    continue                          # far + near-expiry → drop
-                near_expiry_local.append(product)    # local near-expiry → top slot
-                continue
-
-        # ── Composite score ──────────────────────
-        in_connection = product.user_id.user_id in connection_farmer_ids
-        s = _compute_score(
-            product, user_profile,
-            category_scores, product_scores,
-            ratings_map, sold_map,
-            connection_bonus=in_connection,
+        regular = np.flatnonzero(~near)
+        scores  = _snapshot_scores(
+            snapshot, rows[regular], tiers[regular],
+            category_scores, product_scores, connection_farmer_ids or set(),
         )
-        regular.append((product, s))
-
-    # Primary sort: score descending
-    regular.sort(key=lambda x: x[1], reverse=True)
-    ranked = [p for p, _ in regular]
+        ranked = regular[_top_k(scores, limit)]
+        urgent = np.flatnonzero(near_local)[:limit]
 
-    # Urgent local near-expiry products → slot [1]
-    if near_expiry_local and ranked:
-        ranked = ranked[:1] + near_expiry_local + ranked[1:]
-    elif near_expiry_local:
-        ranked = near_expiry_local
+        order = np.concatenate([ranked[:1], urgent, ranked[1:]]) if len(ranked) else urgent
+        ranked_ids = [p_ids[i] for i in order.tolist()]
+        ratings_map, sold_map = snapshot.stats_maps(ranked_ids)
 
-    return ranked, ratings_map, sold_map
+    return ranked_ids, ratings_map, sold_map
 
 
 # ─────────────────────────────────────────────
 # SEARCH
 # ─────────────────────────────────────────────
 
-def _rank_search_results(
-    products: list,
-    user_profile,
-    category_scores: dict,
-    product_scores: dict,
-    connection_farmer_ids: set,
-    ratings_map: dict,
-    sold_map: dict,
-) -> list:
-    """
-    Rank a list of products by composite score (used inside each search tier).
-    """
-    scored = []
-    for p in products:
-        s = _compute_score(
-            p, user_profile,
-            category_scores, product_scores,
-            ratings_map, sold_map,
-            connection_bonus=(p.user_id.user_id in connection_farmer_ids),
-        )
-        scored.append((p, s))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [p for p, _ in scored]
-
-
 def _resolve_farmproduct_categories(search_term: str) -> tuple[list, list, list]:
     """
     Given a search term, return:
         matched_fp_ids      – IDs of FarmProducts whose name matches
         related_categories  – category slugs of those FarmProducts
         all_fp_ids          – all FarmProduct IDs in those categories
+
+    Answered from the in-process FarmProducts dictionary (no SQL). On
+    PostgreSQL a term that names no FarmProduct falls back to trigram
+    similarity, so a misspelt "tomatoe" still resolves to "vegetable".
     """
-    matching_fps = FarmProducts.objects.filter(
-        Q(primary_name__icontains=search_term)   |
-        Q(secondary_name__icontains=search_term) |
-        Q(category__icontains=search_term)
-    )
-    matched_fp_ids     = list(matching_fps.values_list("id", flat=True))
-    related_categories = list(matching_fps.values_list("category", flat=True).distinct())
+    terms = get_farm_product_terms()
+    resolved = terms.resolve(search_term)
+    if resolved[0] or not use_postgres_search():
+        return resolved
 
-    all_fp_ids = list(
-        FarmProducts.objects
-        .filter(
-            Q(id__in=matched_fp_ids) |
-            Q(category__in=related_categories)
-        )
-        .values_list("id", flat=True)
-    )
-    return matched_fp_ids, related_categories, all_fp_ids
+    similar_ids = similar_farm_products(FarmProducts.objects.all(), search_term).values_list("id", flat=True)
+    return terms.fan_out(similar_ids)
 
 
-def _search_single_term(
-    search_term: str,
-    user_profile,
-    base_qs,
-    user,
-    category_scores: dict,
-    product_scores: dict,
-    connection_farmer_ids: set,
-) -> list:
+def _keywords_any_q(fp_ids) -> Q:
+    """Product.keywords contains at least one of fp_ids (one indexed predicate, see backend.lookups)"""
+    return Q(keywords__overlaps=fp_ids)
+
+
+# (tier, tie-break group) of a product for one search term — see _term_tier
+_TIER_PID, _TIER_NAME, _TIER_TYPE, _TIER_KEYWORD, _TIER_FULLTEXT = range(5)
+
+
+def _term_flags(index: int, search_term: str, related_categories: list, all_fp_ids: list) -> dict:
     """
-    Single-term tiered search.
+    {annotation name: condition} of every tier a product can reach for one
+    term, in tier order:
 
-    ═══ PHASE 1 — Direct match (tiers 0–3) ════════════════════════════════════
         Tier 0  exact p_id              e.g. "farmer-P-R2fPk9eu6FW45Q"
         Tier 1  product.name            icontains
         Tier 2  product.product_type    resolved via FarmProduct category slug
         Tier 3  product.keywords        FarmProduct ID in keywords JSON list
                                         AND product_type in resolved categories
-
-        Each tier is ranked by composite score independently.
-        A product only appears in its highest matching tier (no duplicates).
-
-    ═══ PHASE 2 — Category expansion fallback ══════════════════════════════════
-        If Tiers 1–3 return nothing:
-            • Look up the searched term in FarmProducts (name + category slug)
-            • Find the parent category  (e.g. "rice" → "grain")
-            • Fetch ALL products in that category from the DB
-            • sibling keyword branch also filtered by product_type  ← bug fix
-              (old code didn't do this → oil/unrelated products appeared)
-    """
-    seen: set = set()
-
-    # ── Resolve FarmProduct metadata once ────────────────────────────────────
-    matched_fp_ids, related_categories, all_fp_ids = _resolve_farmproduct_categories(search_term)
-
-    # ── Tier 0: p_id match ──────────────────────────────────────────────────
-    tier0: list = []
-    pid_matches = list(base_qs.filter(p_id__icontains=search_term).exclude(p_id__in=seen))
-    if pid_matches:
-        exact  = [p for p in pid_matches if p.p_id.lower() == search_term.lower()]
-        others = [p for p in pid_matches if p.p_id.lower() != search_term.lower()]
-        tier0  = exact + others
-        seen.update(p.p_id for p in tier0)
-
-    # ── Tier 1: product name ─────────────────────────────────────────────────
-    tier1_raw = list(
-        base_qs
-        .filter(name__icontains=search_term)
-        .exclude(p_id__in=seen)
-    )
-    seen.update(p.p_id for p in tier1_raw)
-
-    # ── Tier 2: product_type via FarmProduct category resolution ─────────────
-    tier2_raw: list = []
+        Tier 4  full text (PostgreSQL)  search_vector (name, description,
+                                        keyword names) OR trigram-similar name
+    """
+    flags = {
+        f"t{index}_pid":  Q(p_id__icontains=search_term),
+        f"t{index}_name": Q(name__icontains=search_term),
+    }
     if related_categories:
-        tier2_raw = list(
-            base_qs
-            .filter(product_type__in=related_categories)
-            .exclude(p_id__in=seen)
-            .distinct()
-        )
-        seen.update(p.p_id for p in tier2_raw)
-
-    # ── Tier 3: keywords (FarmProduct ID in JSON list) ───────────────────────
-    tier3_raw: list = []
+        flags[f"t{index}_type"] = Q(product_type__in=related_categories)
     if all_fp_ids:
-        kw_q = Q()
-        for fp_id in all_fp_ids:
-            kw_q |= Q(keywords__contains=[fp_id])
-
-        tier3_qs = base_qs.filter(kw_q).exclude(p_id__in=seen)
-
+        kw_q = _keywords_any_q(all_fp_ids)
         if related_categories:
-            tier3_qs = tier3_qs.filter(product_type__in=related_categories)
-
-        tier3_raw = list(tier3_qs.distinct())
-        seen.update(p.p_id for p in tier3_raw)
-
-    # ── Batch stats for ranking (one pass for all tiers) ─────────────────────
-    direct_products = tier0 + tier1_raw + tier2_raw + tier3_raw
-    if direct_products:
-        ratings_map, sold_map = _batch_fetch_stats([p.p_id for p in direct_products])
-    else:
-        ratings_map, sold_map = {}, {}
-
-    def _rank(lst):
-        return _rank_search_results(
-            lst, user_profile,
-            category_scores, product_scores,
-            connection_farmer_ids,
-            ratings_map, sold_map,
-        )
-
-    tier1_ranked = _rank(tier1_raw)
-    tier2_ranked = _rank(tier2_raw)
-    tier3_ranked = _rank(tier3_raw)
-
-    direct_results = tier0 + tier1_ranked + tier2_ranked + tier3_ranked
-
-    # ── Phase 2: category-expansion fallback ─────────────────────────────────
-    # Triggered when tiers 1–3 all returned nothing (tier 0 stands alone).
-    category_results: list = []
-    if not (tier1_raw or tier2_raw or tier3_raw) and related_categories:
-        fallback_qs = (
-            base_qs
-            .filter(product_type__in=related_categories)
-            .exclude(p_id__in=seen)
-        )
-
-        if all_fp_ids:
-            sib_q = Q()
-            for fp_id in all_fp_ids:
-                sib_q |= Q(keywords__contains=[fp_id])
-
-            # FIX: enforce product_type so off-category products never appear
-            sibling_qs = (
-                base_qs
-                .filter(sib_q)
-                .filter(product_type__in=related_categories)
-                .exclude(p_id__in=seen)
-            )
-            fallback_qs = (fallback_qs | sibling_qs).distinct()
-
-        fallback_products = list(fallback_qs.distinct())
-        seen.update(p.p_id for p in fallback_products)
-
-        if fallback_products:
-            fb_ratings, fb_sold = _batch_fetch_stats(
-                [p.p_id for p in fallback_products]
-            )
-            category_results = _rank_search_results(
-                fallback_products, user_profile,
-                category_scores, product_scores,
-                connection_farmer_ids,
-                fb_ratings, fb_sold,
-            )
-
-    return direct_results + category_results
+            kw_q &= Q(product_type__in=related_categories)
+        flags[f"t{index}_kw"] = kw_q
+    if use_postgres_search():
+        fulltext = fulltext_q(search_term)
+        if fulltext is not None:
+            flags[f"t{index}_ft"] = fulltext
+    return flags
 
 
 def _search_products(
@@ -480,28 +502,18 @@ def _search_products(
     connection_farmer_ids: set,
 ) -> list:
     """
-    Multi-word aware search entry point.
+    Multi-word aware search entry point — single-pass executor.
 
     Algorithm
     ─────────
-    1. Split query by whitespace → individual words.
-       "basmati rice" → ["basmati", "rice"]
-
-    2. Run _search_single_term for EACH word independently.
-       "rice" alone resolves FarmProducts → category "grain" → all grain products.
-       "basmati" alone resolves name match or its own category.
-
-    3. Run _search_single_term for the FULL PHRASE (bonus pass).
-       Products that match the full phrase get +len(words) extra match points,
-       floating them above partial matches.
-
-    4. Deduplicate across all results.
-       match_count tracks how many individual words each product matched.
-       Products matching MORE words rank first.
-
-    5. Within same match_count, insertion order (= tier order) is preserved.
-
-    Single-word queries bypass splitting (no overhead).
+    1. Split query by whitespace → individual words; each word is a term,
+       and so is the full phrase when there is more than one word.
+    2. Per term, a product lands in its highest matching tier (see
+       _term_flags). Tier 0 puts the exact p_id first; every other tier is
+       ranked by composite score.
+    3. Each word match counts 1, a full-phrase match counts len(words).
+       Products matching MORE words rank first; within the same
+       match_count the first (= highest tier) encounter decides the order.
 
     Example
     ───────
@@ -513,45 +525,90 @@ def _search_products(
 
     "Basmati Rice" product → 4 pts  ← floats to top
     "Brown Rice"   product → 1 pt
-    "Wheat Grain"  product → 1 pt   ← also from grain category
+
+    Every term is resolved against the in-process FarmProducts dictionary
+    up front, ONE query fetches each candidate product once with a boolean
+    column per (term, tier) computed in SQL, and ONE _batch_fetch_stats call
+    scores all candidates.
     """
     words = [w.strip() for w in search_term.split() if w.strip()]
     if not words:
         return []
 
-    # Single-word fast path
-    if len(words) == 1:
-        return _search_single_term(
-            words[0], user_profile, base_qs, user,
-            category_scores, product_scores, connection_farmer_ids,
-        )
+    # Per-word passes, then the full phrase (multi-word only)
+    terms = list(dict.fromkeys(words + ([search_term] if len(words) > 1 else [])))
+    term_index = {term: i for i, term in enumerate(terms)}
 
-    # ── Multi-word path ───────────────────────────────────────────────────────
-    match_count: dict[str, int]    = defaultdict(int)
-    product_map: dict[str, object] = {}   # p_id → Product (first/highest-tier encounter)
+    flags: dict = {}
+    term_flag_names: list = []
+    for i, term in enumerate(terms):
+        _, related_categories, all_fp_ids = _resolve_farmproduct_categories(term)
+        term_flags = _term_flags(i, term, related_categories, all_fp_ids)
+        flags.update(term_flags)
+        term_flag_names.append(list(term_flags))
 
-    # Pass 1: search each word independently
-    for word in words:
-        word_results = _search_single_term(
-            word, user_profile, base_qs, user,
-            category_scores, product_scores, connection_farmer_ids,
-        )
-        for p in word_results:
-            if p.p_id not in product_map:
-                product_map[p.p_id] = p    # first encounter = highest tier position
-            match_count[p.p_id] += 1
+    any_match = Q()
+    for condition in dict.fromkeys(flags.values()):   # terms often resolve to the same category
+        any_match |= condition
 
-    # Pass 2: full-phrase bonus
-    phrase_results = _search_single_term(
-        search_term, user_profile, base_qs, user,
-        category_scores, product_scores, connection_farmer_ids,
+    candidates = list(
+        base_qs
+        .filter(any_match)
+        .annotate(**{
+            name: ExpressionWrapper(condition, output_field=BooleanField())
+            for name, condition in flags.items()
+        })
+        .order_by("p_id")
     )
-    for p in phrase_results:
-        if p.p_id not in product_map:
-            product_map[p.p_id] = p
-        match_count[p.p_id] += len(words)   # phrase match = as if all words matched again
+    if not candidates:
+        return []
+
+    ratings_map, sold_map = _batch_fetch_stats([p.p_id for p in candidates])
+    scores = {
+        p.p_id: _compute_score(
+            p, user_profile,
+            category_scores, product_scores,
+            ratings_map, sold_map,
+            connection_bonus=(p.user_id.user_id in connection_farmer_ids),
+        )
+        for p in candidates
+    }
+
+    # ── Per-term result order: (tier, tie-break, fetch position) ─────────────
+    def _term_order(i: int) -> list:
+        term = terms[i]
+        keyed = []
+        for pos, p in enumerate(candidates):
+            for name in term_flag_names[i]:
+                if getattr(p, name):
+                    tier = name.rsplit("_", 1)[1]
+                    if tier == "pid":
+                        # Tier 0: exact p_id first, no score ranking
+                        keyed.append(((_TIER_PID, p.p_id.lower() != term.lower(), pos), p))
+                    else:
+                        rank = {"name": _TIER_NAME, "type": _TIER_TYPE, "kw": _TIER_KEYWORD, "ft": _TIER_FULLTEXT}[tier]
+                        keyed.append(((rank, -scores[p.p_id], pos), p))
+                    break
+        keyed.sort(key=lambda item: item[0])
+        return [p for _, p in keyed]
+
+    if len(words) == 1:
+        return _term_order(0)
+
+    # ── Merge: first encounter fixes position, match_count decides order ─────
+    match_count: dict[str, int]    = defaultdict(int)
+    product_map: dict[str, object] = {}
+    order_cache: dict[int, list]   = {}
+
+    for term, weight in [(w, 1) for w in words] + [(search_term, len(words))]:
+        i = term_index[term]
+        if i not in order_cache:
+            order_cache[i] = _term_order(i)
+        for p in order_cache[i]:
+            if p.p_id not in product_map:
+                product_map[p.p_id] = p
+            match_count[p.p_id] += weight
 
-    # Sort by match_count descending; ties preserve insertion order (tier order)
     sorted_pids = sorted(
         product_map.keys(),
         key=lambda pid: match_count[pid],
@@ -569,42 +626,53 @@ def _apply_search_expiry_gate(
     Applies only the expiry gate on search results WITHOUT re-ranking by score.
     This preserves the match_count order from _search_products.
 
-    Rules (same as _filter_and_rank):
+    Rules (same as _rank_ids):
         - Product expiring in ≤ 7 days AND farmer is non-local  → dropped
         - Product expiring in ≤ 7 days AND farmer is local      → slot [1]
         - All other products                                     → kept in order
 
+    With FEED_RANKING_MODE = "python" the gate reads the product snapshot;
+    otherwise the rows the search loaded, with stats from ProductStats.
+
     Returns (ranked, ratings_map, sold_map).
     """
-    today = timezone.now().date()
+    if not search_results:
+        return [], {}, {}
+    if FEED_RANKING_MODE != "python":
+        return _search_expiry_gate_in_db(search_results, user_profile)
 
-    product_ids = [p.p_id for p in search_results]
-    ratings_map, sold_map = _batch_fetch_stats(product_ids) if product_ids else ({}, {})
+    with product_snapshot(ensure=[p.p_id for p in search_results]) as snapshot:
+        search_results = [p for p in search_results if p.p_id in snapshot.row_of]
+        rows  = snapshot.rows([p.p_id for p in search_results])
+        tiers = snapshot.tiers(rows, user_profile)
+        near, near_local = _expiry_gate(snapshot, rows, tiers)
 
-    ranked: list           = []
+        kept   = np.flatnonzero(~near)          # match_count order — preserved
+        urgent = np.flatnonzero(near_local)     # local urgent → slot [1]
+        order  = np.concatenate([kept[:1], urgent, kept[1:]]) if len(kept) else urgent
+
+        ranked = [search_results[i] for i in order.tolist()]
+        ratings_map, sold_map = snapshot.stats_maps([p.p_id for p in ranked])
+
+    return ranked, ratings_map, sold_map
+
+
+def _search_expiry_gate_in_db(search_results: list, user_profile) -> tuple[list, dict, dict]:
+    """_apply_search_expiry_gate on the loaded rows (no product snapshot)"""
+    today = timezone.now().date()
+
+    ranked: list            = []
     near_expiry_local: list = []
 
     for product in search_results:   # order is match_count order — preserve it
-        farmer_profile = product.user_id.profile_id
-        tier     = _location_tier(farmer_profile, user_profile)
-        is_local = tier >= 2
-
-        if product.expiry_Date:
-            days_left = (product.expiry_Date - today).days
-            if days_left <= EXPIRY_NEAR_DAYS:
-                if not is_local:
-                    continue                           # far + near-expiry → drop
+        if product.expiry_Date and (product.expiry_Date - today).days <= EXPIRY_NEAR_DAYS:
+            if _location_tier(product.user_id.profile_id, user_profile) >= 2:
                 near_expiry_local.append(product)     # local urgent → slot [1]
-                continue
-
-        ranked.append(product)   # preserved match_count order
-
-    # Inject urgent local products at slot [1]
-    if near_expiry_local and ranked:
-        ranked = ranked[:1] + near_expiry_local + ranked[1:]
-    elif near_expiry_local:
-        ranked = near_expiry_local
+            continue                                  # far + near-expiry → drop
+        ranked.append(product)
 
+    ranked = ranked[:1] + near_expiry_local + ranked[1:]
+    ratings_map, sold_map = _batch_fetch_stats([p.p_id for p in ranked]) if ranked else ({}, {})
     return ranked, ratings_map, sold_map
 
 
@@ -617,13 +685,11 @@ def _get_top_rated_farmer_products(base_qs, user_profile, exclude_ids: set, limi
     Returns up to `limit` products from the highest-rated farmers.
     Used to inject quality signals at the top of the feed.
     """
-    top_farmer_ids = (
-        Rating.objects
-        .filter(rated_for="Farmer")
-        .values("rated_to")
-        .annotate(avg=Avg("score"))
-        .order_by("-avg")
-        .values_list("rated_to", flat=True)[:20]
+    top_farmer_ids = list(
+        UserReputation.objects
+        .filter(farmer_count__gt=0)
+        .order_by("-farmer_avg")
+        .values_list("user_id", flat=True)[:20]
     )
 
     if not top_farmer_ids:
@@ -638,7 +704,11 @@ def _get_top_rated_farmer_products(base_qs, user_profile, exclude_ids: set, limi
     return products
 
 
-def _get_expiry_recommendations(base_qs, user_profile, exclude_ids: set) -> list:
+def _get_expiry_recommendations(
+    base_qs, user_profile, exclude_ids: set,
+    category_scores: dict, product_scores: dict,
+    connection_farmer_ids: set, limit: int,
+) -> tuple[list, dict, dict]:
     """
     Expiry-aware local recommendations injected at the end of the feed.
 
@@ -647,52 +717,40 @@ def _get_expiry_recommendations(base_qs, user_profile, exclude_ids: set) -> list
     ≤ 15 days left  →  same municipal
     ≤ 20 days left  →  same district
     > 20 days left  →  same province
+
+    The three buckets are disjoint, so they are fetched as one query, scored
+    and ordered by the database and limited to `limit` rows.
+    Returns (products, ratings_map, sold_map).
     """
+    if limit <= 0:
+        return [], {}, {}
+
     today = timezone.now().date()
 
     d15 = today + timedelta(days=EXPIRY_MUNICIPAL_DAYS)
     d20 = today + timedelta(days=EXPIRY_DISTRICT_DAYS)
-
-    # Bucket 1 — municipal, expiring within 15 days
-    municipal = list(
-        base_qs
-        .filter(
-            user_id__profile_id__municipal=user_profile.municipal,
-            expiry_Date__gt=today,
-            expiry_Date__lte=d15,
-        )
-        .exclude(p_id__in=exclude_ids)
-        .order_by("expiry_Date")
-    )
-
-    seen = exclude_ids | {p.p_id for p in municipal}
-
-    # Bucket 2 — district, expiring 15–20 days
-    district = list(
-        base_qs
-        .filter(
-            user_id__profile_id__district=user_profile.district,
-            expiry_Date__gt=d15,
-            expiry_Date__lte=d20,
-        )
-        .exclude(p_id__in=seen)
-        .order_by("expiry_Date")
+    prefix = "user_id__profile_id__"
+
+    buckets = (
+        # Bucket 1 — municipal, expiring within 15 days
+        (same_location_q(user_profile, "municipal", prefix) & Q(expiry_Date__gt=today, expiry_Date__lte=d15))
+        # Bucket 2 — district, expiring 15–20 days
+        | (same_location_q(user_profile, "district", prefix) & Q(expiry_Date__gt=d15, expiry_Date__lte=d20))
+        # Bucket 3 — province, expiring > 20 days
+        | (same_location_q(user_profile, "province", prefix) & Q(expiry_Date__gt=d20))
     )
 
-    seen |= {p.p_id for p in district}
-
-    # Bucket 3 — province, expiring > 20 days
-    province = list(
-        base_qs
-        .filter(
-            user_id__profile_id__province=user_profile.province,
-            expiry_Date__gt=d20,
+    recs = list(
+        _annotate_feed_score(
+            base_qs.filter(buckets).exclude(p_id__in=exclude_ids), user_profile,
+            category_scores, product_scores, connection_farmer_ids,
         )
-        .exclude(p_id__in=seen)
-        .order_by("expiry_Date")
+        .order_by("-feed_score", "expiry_Date", "p_id")[:limit]
     )
 
-    return municipal + district + province
+    ratings_map = {p.p_id: p.feed_rating for p in recs if p.feed_rating is not None}
+    sold_map    = {p.p_id: p.feed_sold for p in recs if p.feed_sold}
+    return recs, ratings_map, sold_map
 
 
 def _feed_all(
@@ -705,18 +763,17 @@ def _feed_all(
 
     Build order
     ───────────
-    1. Score-filtered main feed (all active products scored + expiry gate)
+    1. Score-filtered main feed (top FEED_TOP_K by score + expiry gate)
     2. Top-rated farmer spotlight (up to 5, injected after slot [0])
-    3. Expiry-aware location recommendations (appended at end)
+    3. Expiry-aware location recommendations (appended at end, up to
+       FEED_TOP_K products in all)
     """
     if connection_farmer_ids is None:
         connection_farmer_ids = set(_get_connection_farmer_ids(user))
 
-    all_products = list(base_qs.all())
-
     # Step 1: main ranked feed
-    ranked, ratings_map, sold_map = _filter_and_rank(
-        all_products, user_profile,
+    ranked, ratings_map, sold_map = _rank_queryset(
+        base_qs, user_profile,
         category_scores, product_scores,
         connection_farmer_ids=connection_farmer_ids,
     )
@@ -732,30 +789,17 @@ def _feed_all(
     elif top_rated:
         ranked = top_rated
 
-    # Step 3: expiry-aware local recommendations
-    exclude_so_far = main_ids | top_rated_ids
-    expiry_recs = _get_expiry_recommendations(base_qs, user_profile, exclude_so_far)
-
-    if expiry_recs:
-        rec_ids = [p.p_id for p in expiry_recs]
-        rec_ratings, rec_sold = _batch_fetch_stats(rec_ids)
-        scored_recs = []
-        for p in expiry_recs:
-            s = _compute_score(
-                p, user_profile, category_scores, product_scores,
-                rec_ratings, rec_sold,
-                connection_bonus=(p.user_id.user_id in connection_farmer_ids),
-            )
-            scored_recs.append((p, s))
-        scored_recs.sort(key=lambda x: x[1], reverse=True)
-        expiry_recs = [p for p, _ in scored_recs]
-
-        ratings_map.update(rec_ratings)
-        sold_map.update(rec_sold)
-
-    ranked = ranked + expiry_recs
+    # Step 3: expiry-aware local recommendations, the session stays ≤ FEED_TOP_K
+    ranked = ranked[:FEED_TOP_K]
+    expiry_recs, rec_ratings, rec_sold = _get_expiry_recommendations(
+        base_qs, user_profile, main_ids | top_rated_ids,
+        category_scores, product_scores, connection_farmer_ids,
+        limit=FEED_TOP_K - len(ranked),
+    )
+    ratings_map.update(rec_ratings)
+    sold_map.update(rec_sold)
 
-    return ranked, ratings_map, sold_map
+    return ranked + expiry_recs, ratings_map, sold_map
 
 
 def _feed_connection_only(
@@ -769,8 +813,7 @@ def _feed_connection_only(
     if not farmer_ids:
         return [], {}, {}
 
-    products = list(base_qs.filter(user_id__in=farmer_ids))
-    return _filter_and_rank(products, user_profile, category_scores, product_scores)
+    return _rank_queryset(base_qs.filter(user_id__in=farmer_ids), user_profile, category_scores, product_scores)
 
 
 def _feed_near_me(
@@ -780,13 +823,8 @@ def _feed_near_me(
     """
     Province/district/municipal products ranked by composite score.
     """
-    qs = base_qs.filter(
-        Q(user_id__profile_id__municipal=user_profile.municipal)
-        | Q(user_id__profile_id__district=user_profile.district)
-        | Q(user_id__profile_id__province=user_profile.province)
-    )
-    products = list(qs)
-    return _filter_and_rank(products, user_profile, category_scores, product_scores)
+    qs = annotate_location_tier(base_qs, user_profile, "user_id__profile_id__").filter(location_tier__gte=1)
+    return _rank_queryset(qs, user_profile, category_scores, product_scores)
 
 
 # ─────────────────────────────────────────────
@@ -797,10 +835,13 @@ def _serialize_product(
     product: Product,
     ratings_map: dict | None = None,
     sold_map: dict | None = None,
+    image_size: str = "small",
 ) -> dict:
     """
     Convert a Product ORM object to the API response dict.
     Pure serialiser — NO DB hits when ratings_map and sold_map are supplied.
+    image_url is the image_size variant of the card image (small / medium /
+    large / original), so cards don't download the full-size photo.
     """
     today = timezone.now().date()
 
@@ -818,20 +859,13 @@ def _serialize_product(
         media = list(media.values())
     image = media[0] if media else ""
 
-    if ratings_map is not None:
-        avg_rating = ratings_map.get(product.p_id, 0.0)
-    else:
-        avg_rating = (
-            ProductRating.objects.filter(p_id=product)
-            .aggregate(avg_rating=Avg("score"))["avg_rating"]
-        ) or 0.0
+    if ratings_map is None or sold_map is None:
+        stats = get_product_stats(product)
+        ratings_map = {product.p_id: float(stats.avg_score)} if stats.rating_count else {}
+        sold_map    = {product.p_id: stats.delivered_count}
 
-    if sold_map is not None:
-        sold_count = sold_map.get(product.p_id, 0)
-    else:
-        sold_count = OrderRequest.objects.filter(
-            product=product, order_status="DELIVERED"
-        ).count()
+    avg_rating = ratings_map.get(product.p_id, 0.0)
+    sold_count = sold_map.get(product.p_id, 0)
 
     return {
         "id":            product.p_id,
@@ -846,11 +880,153 @@ def _serialize_product(
         "stock":         str(product.quantity_available),
         "stockUnit":     product.product_unit.lower(),
         "image":         image,
+        "image_url":     media_entry_url(image, image_size),
         "rating":        str(round(avg_rating, 1)),
         "sold_count":    sold_count,
     }
 
 
+# ─────────────────────────────────────────────
+# FEED SESSIONS  (rank once, page many times)
+# ─────────────────────────────────────────────
+
+def _feed_session_key(user_id: str, feed_filter: str, search_term: str) -> str:
+    """Cache key for one (user, filter, search_term) feed session."""
+    term_hash = hashlib.sha1(search_term.lower().encode("utf-8")).hexdigest()[:16]
+    return f"feed_session:{user_id}:{feed_filter}:{term_hash}"
+
+
+def _save_feed_session(key: str, ranked_ids: list) -> dict:
+    """
+    Store the ranked p_id list for a feed session.
+
+    Session layout:
+        ids        – ranked p_ids (full feed order)
+        expires_at – unix time; the TTL is NOT extended by paging, so a session
+                     is re-ranked at least every FEED_SESSION_TTL seconds
+    """
+    session = {
+        "ids":        ranked_ids,
+        "expires_at": time.time() + FEED_SESSION_TTL,
+    }
+    cache.set(key, session, FEED_SESSION_TTL)
+    return session
+
+
+def _update_feed_session(key: str, session: dict) -> None:
+    """Store a changed session without extending its lifetime."""
+    remaining = int(session["expires_at"] - time.time())
+    if remaining <= 0:
+        return
+    cache.set(key, session, remaining)
+
+
+def _load_session_products(key: str, session: dict, user_id: str, start: int, count: int) -> list:
+    """
+    Fetch up to `count` products of a feed session from index `start`, in
+    ranked order, through the same base queryset the ranking used. Ids that
+    no longer qualify (sold out, deactivated, expired) are dropped from
+    session["ids"] (and the cached session) and the window is refilled
+    from the ids after it, so the indexes already served stay valid. Paging
+    through a session otherwise never writes to the cache.
+    """
+    ids     = session["ids"]
+    base_qs = _active_products_qs(exclude_user_id=user_id)
+    found   = []
+    stale   = set()
+    pos     = start
+    while len(found) < count and pos < len(ids):
+        window = ids[pos:pos + count - len(found)]
+        by_id  = {p.p_id: p for p in base_qs.filter(p_id__in=window)}
+        for pid in window:
+            if pid in by_id:
+                found.append(by_id[pid])
+            else:
+                stale.add(pid)
+        pos += len(window)
+
+    if stale:
+        session["ids"] = [pid for pid in ids if pid not in stale]
+        _update_feed_session(key, session)
+    return found
+
+
+def _encode_feed_cursor(user_id: str, feed_filter: str, search_term: str, offset: int) -> str:
+    """Opaque, signed continuation cursor for the page-mode feed."""
+    return signing.dumps(
+        {"u": user_id, "f": feed_filter, "q": search_term, "o": offset},
+        salt=FEED_CURSOR_SALT,
+        compress=True,
+    )
+
+
+def _decode_feed_cursor(cursor: str, user_id: str) -> dict | None:
+    """
+    Returns {"f": filter, "q": search_term, "o": offset} or None when the
+    cursor is tampered with, older than FEED_SESSION_TTL or was issued to
+    another user.
+    """
+    try:
+        data = signing.loads(cursor, salt=FEED_CURSOR_SALT, max_age=FEED_SESSION_TTL)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get("u") != user_id:
+        return None
+    if data.get("f") not in VALID_FILTERS or not isinstance(data.get("o"), int) or data["o"] < 0:
+        return None
+    return data
+
+
+def _build_ranked_feed(
+    user: Users, user_id: str, feed_filter: str, search_term: str,
+) -> tuple[list, dict, dict]:
+    """
+    Full ranking pass for one feed session.
+    Returns (ranked_products, ratings_map, sold_map).
+    """
+    user_profile = user.profile_id
+
+    # ── Base queryset: active products, excluding own ──────────────────────────
+    base_qs = _active_products_qs(exclude_user_id=user_id)
+
+    # ── User interest scores ───────────────────────────────────────────────────
+    category_scores, product_scores = _get_track_stats(user)
+
+    # ── Connection farmer IDs ──────────────────────────────────────────────────
+    connection_farmer_ids = set(_get_connection_farmer_ids(user))
+
+    if search_term:
+        # Step 1: multi-word search → sorted by match_count (most relevant first)
+        search_results = _search_products(
+            search_term, user_profile, base_qs,
+            user, category_scores, product_scores,
+            connection_farmer_ids,
+        )
+
+        # Step 2: apply expiry gate only — do NOT re-rank by score.
+        # Re-ranking by score would destroy the match_count ordering.
+        # Near-expiry local products still get injected at slot [1].
+        return _apply_search_expiry_gate(
+            search_results,
+            user_profile,
+            connection_farmer_ids,
+        )
+
+    if feed_filter == "connectiononly":
+        return _feed_connection_only(
+            user, user_profile, base_qs, category_scores, product_scores
+        )
+    if feed_filter == "nearme":
+        return _feed_near_me(
+            user_profile, base_qs, category_scores, product_scores
+        )
+    # "all"
+    return _feed_all(
+        user, user_profile, base_qs, category_scores, product_scores,
+        connection_farmer_ids=connection_farmer_ids,
+    )
+
+
 # ─────────────────────────────────────────────
 # MAIN VIEW
 # ─────────────────────────────────────────────
@@ -870,6 +1046,16 @@ def get_product_feed(request):
         serial_no   : int  – default 1  (1-10 per page)
         filter      : str  – "all" | "connectiononly" | "nearme"  default "all"
         search_term : str  – optional; multi-word aware search
+        refresh     : bool – optional; force a re-rank of the feed session
+        image_size  : str  – "small" | "medium" | "large" | "original"  default "small"
+
+    Feed sessions:
+        - The feed is ranked once per (user, filter, search_term) and the
+          ordered p_id list is cached for FEED_SESSION_TTL seconds.
+        - page/serial_no calls inside a session are O(1) lookups.
+        - page 1 / serial_no 1 or refresh=true starts a new session.
+        - With FEED_RANKING_MODE = "sql" the database scores the candidates
+          and a session holds the top FEED_TOP_K products.
 
     Search behaviour:
         - Splits multi-word queries ("basmati rice" → ["basmati", "rice"])
@@ -903,12 +1089,11 @@ def get_product_feed(request):
     if not user_id:
         return Response({"error": "user-id header is required."}, status=400)
 
-    try:
-        user = Users.objects.select_related("profile_id").get(user_id=user_id)
-    except Users.DoesNotExist:
-        return Response({"error": "User not found."}, status=404)
-
-    if user.profile_status != "ACTIVATED":
+    # Already loaded (with profile) by IsFarmerOrConsumer
+    user = get_request_user(request)
+    if user is None:
+        if not Users.objects.filter(user_id=user_id).exists():
+            return Response({"error": "User not found."}, status=404)
         return Response({"error": "Account is not active."}, status=403)
     
 
@@ -919,6 +1104,9 @@ def get_product_feed(request):
     except (ValueError, TypeError):
         page, serial_no = 1, 1
 
+    if page < 1:
+        return Response({"error": "page must be 1 or greater"}, status=400)
+
     if serial_no < 1 or serial_no > PAGE_SIZE:
         return Response(
             {"error": f"serial_no must be between 1 and {PAGE_SIZE}"}, status=400
@@ -931,61 +1119,48 @@ def get_product_feed(request):
             status=400,
         )
 
-    search_term  = request.data.get("search_term", "").strip()
-    user_profile = user.profile_id
-
-    # ── Base queryset: active products, excluding own ──────────────────────────
-    base_qs = _active_products_qs(exclude_user_id=user_id)
-
-    # ── User interest scores ───────────────────────────────────────────────────
-    category_scores, product_scores = _get_track_stats(user)
+    search_term = request.data.get("search_term", "").strip()
+    refresh     = str(request.data.get("refresh", "")).lower() in ("1", "true", "yes")
+    image_size  = normalize_image_size(request.data.get("image_size"))
 
-    # ── Connection farmer IDs ──────────────────────────────────────────────────
-    connection_farmer_ids = set(_get_connection_farmer_ids(user))
+    absolute_index = (page - 1) * PAGE_SIZE + (serial_no - 1)
 
-    # ── Build & rank product list ──────────────────────────────────────────────
-    if search_term:
-        # Step 1: multi-word search → sorted by match_count (most relevant first)
-        search_results = _search_products(
-            search_term, user_profile, base_qs,
-            user, category_scores, product_scores,
-            connection_farmer_ids,
+    # ── Feed session lookup ────────────────────────────────────────────────────
+    # The first item of the feed (page 1 / serial 1) and an explicit refresh
+    # always re-rank; every other call is served from the cached p_id order.
+    session_key = _feed_session_key(user_id, feed_filter, search_term)
+    session     = None
+    if not refresh and absolute_index > 0:
+        session = cache.get(session_key)
+
+    product = None
+    if session is not None:
+        # Products that stopped qualifying since the ranking are skipped
+        found = _load_session_products(session_key, session, user_id, absolute_index, 1)
+        if not found:
+            return Response({"error": "No more products available."}, status=404)
+
+        product    = found[0]
+        ranked_ids = session["ids"]
+        ratings_map, sold_map = _batch_fetch_stats([product.p_id])
+
+    # ── Session miss → rank once & store ───────────────────────────────────────
+    if product is None:
+        ranked, ratings_map, sold_map = _build_ranked_feed(
+            user, user_id, feed_filter, search_term
         )
+        ranked_ids = [p.p_id for p in ranked]
+        _save_feed_session(session_key, ranked_ids)
 
-        # Step 2: apply expiry gate only — do NOT re-rank by score.
-        # Re-ranking by score would destroy the match_count ordering.
-        # Near-expiry local products still get injected at slot [1].
-        ranked, ratings_map, sold_map = _apply_search_expiry_gate(
-            search_results,
-            user_profile,
-            connection_farmer_ids,
-        )
+        if absolute_index >= len(ranked):
+            return Response({"error": "No more products available."}, status=404)
 
-    else:
-        if feed_filter == "connectiononly":
-            ranked, ratings_map, sold_map = _feed_connection_only(
-                user, user_profile, base_qs, category_scores, product_scores
-            )
-        elif feed_filter == "nearme":
-            ranked, ratings_map, sold_map = _feed_near_me(
-                user_profile, base_qs, category_scores, product_scores
-            )
-        else:  # "all"
-            ranked, ratings_map, sold_map = _feed_all(
-                user, user_profile, base_qs, category_scores, product_scores,
-                connection_farmer_ids=connection_farmer_ids,
-            )
+        product = ranked[absolute_index]
 
     # ── Paginate & return single product ──────────────────────────────────────
-    total_products = len(ranked)
+    total_products = len(ranked_ids)
     total_pages    = max(1, (total_products + PAGE_SIZE - 1) // PAGE_SIZE)
-    absolute_index = (page - 1) * PAGE_SIZE + (serial_no - 1)
-
-    if absolute_index >= total_products:
-        return Response({"error": "No more products available."}, status=404)
-
-    product  = ranked[absolute_index]
-    has_more = absolute_index < total_products - 1
+    has_more       = absolute_index < total_products - 1
 
     return Response(
         {
@@ -994,7 +1169,112 @@ def get_product_feed(request):
             "total_pages": total_pages,
             "has_more":    has_more,
             "filter":      feed_filter,
-            "product":     _serialize_product(product, ratings_map, sold_map),
+            "product":     _serialize_product(product, ratings_map, sold_map, image_size),
         },
         status=200,
-    )
\ No newline at end of file
+    )
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny, IsFarmerOrConsumer])
+def get_product_feed_page(request):
+    """
+    POST /api/product/feed/page/
+
+    Page-mode variant of get_product_feed: one call returns a whole page
+    (PAGE_SIZE products) instead of one product per call.
+
+    Headers:
+        user-id   (required)
+
+    Body (JSON):
+        cursor      : str  – optional; "next_cursor" from the previous response.
+                             When present, filter / search_term are taken from it.
+        filter      : str  – "all" | "connectiononly" | "nearme"  default "all"
+        search_term : str  – optional; multi-word aware search
+        refresh     : bool – optional; force a re-rank (ignored with a cursor)
+        image_size  : str  – "small" | "medium" | "large" | "original"  default "small"
+
+    Ranking and search behaviour are identical to get_product_feed and both
+    endpoints share the same feed session.
+
+    Response:
+    {
+        "page":        1,
+        "total_pages": 4,
+        "has_more":    true,
+        "next_cursor": "<opaque>" | null,
+        "filter":      "all",
+        "products":    [ { ...product fields... }, ... ]
+    }
+    """
+    # ── Auth / user lookup ─────────────────────────────────────────────────────
+    user_id = request.headers.get("user-id")
+    if not user_id:
+        return Response({"error": "user-id header is required."}, status=400)
+
+    # Already loaded (with profile) by IsFarmerOrConsumer
+    user = get_request_user(request)
+    if user is None:
+        if not Users.objects.filter(user_id=user_id).exists():
+            return Response({"error": "User not found."}, status=404)
+        return Response({"error": "Account is not active."}, status=403)
+
+    # ── Request params ─────────────────────────────────────────────────────────
+    cursor = request.data.get("cursor")
+    if cursor:
+        cursor_data = _decode_feed_cursor(str(cursor), user_id)
+        if cursor_data is None:
+            return Response({"error": "Invalid or expired cursor."}, status=400)
+        feed_filter = cursor_data["f"]
+        search_term = cursor_data["q"]
+        offset      = cursor_data["o"]
+        refresh     = False
+    else:
+        feed_filter = str(request.data.get("filter", "all")).lower().strip()
+        if feed_filter not in VALID_FILTERS:
+            return Response(
+                {"error": f"Invalid filter. Valid options: {', '.join(sorted(VALID_FILTERS))}."},
+                status=400,
+            )
+        search_term = request.data.get("search_term", "").strip()
+        offset      = 0
+        refresh     = True   # first page → fresh ranking, same as serial_no 1
+
+    image_size = normalize_image_size(request.data.get("image_size"))
+
+    # ── Feed session lookup ────────────────────────────────────────────────────
+    session_key = _feed_session_key(user_id, feed_filter, search_term)
+    session     = None if refresh else cache.get(session_key)
+
+    if session is None:
+        ranked, _, _ = _build_ranked_feed(user, user_id, feed_filter, search_term)
+        session = _save_feed_session(session_key, [p.p_id for p in ranked])
+
+    # ── Fetch the whole page at once, keep ranked order ────────────────────────
+    # Products that stopped qualifying since the ranking are skipped
+    products   = _load_session_products(session_key, session, user_id, offset, PAGE_SIZE)
+    page_ids   = [p.p_id for p in products]
+    ranked_ids = session["ids"]
+    next_index = offset + len(page_ids)
+    ratings_map, sold_map = _batch_fetch_stats(page_ids) if page_ids else ({}, {})
+
+    total_products = len(ranked_ids)
+    has_more       = next_index < total_products
+
+    return Response(
+        {
+            "page":        offset // PAGE_SIZE + 1,
+            "total_pages": max(1, (total_products + PAGE_SIZE - 1) // PAGE_SIZE),
+            "has_more":    has_more,
+            "next_cursor": (
+                _encode_feed_cursor(user_id, feed_filter, search_term, next_index)
+                if has_more else None
+            ),
+            "filter":      feed_filter,
+            "products": [
+                _serialize_product(p, ratings_map, sold_map, image_size) for p in products
+            ],
+        },
+        status=200,
+    )
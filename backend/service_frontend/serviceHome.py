@@ -3,8 +3,9 @@ from rest_framework.response import Response
 from rest_framework import status
 from backend.models import Users, Verification, Product, Connections, OrderRequest, Wallet, Transaction
 from backend.permissions import HasValidTokenForUser
+from backend.utils.user_reputation import get_user_reputation
 from rest_framework.permissions import AllowAny
-from django.db.models import Q, Sum, F, Avg
+from django.db.models import Q, Sum, F
 from django.utils import timezone
  
 @api_view(['POST'])
@@ -16,13 +17,13 @@ def dashboard_fullfillment(request):
     # print(request.headers)
     # ✅ consistent key
     try:
-        user = Users.objects.get(user_id=user_id)
+        user = Users.objects.select_related('profile_id', 'reputation').get(user_id=user_id)
     except Users.DoesNotExist:
         return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if user.profile_id.user_type not in ['Admin', 'SuperAdmin']:
         nearby_farmers_data = get_nearby_top_rated_farmers(user)
-    from backend.models import Rating
+    rating_avg = get_user_reputation(user).average_for()
     
     if user.is_admin:
         return Response({
@@ -38,7 +39,7 @@ def dashboard_fullfillment(request):
            # 'order_received':       str(get_farmer_orderRequests(user)),
             'wallet_balance':        str(get_wallet_balance(user)),
             'today_expense':         str(get_todays_expense(user)),
-            'rate' :  str(Rating.objects.filter(rated_to=user).aggregate(Avg('score'))['score__avg']),
+            'rate' :  str(rating_avg),
         }, status=status.HTTP_200_OK)
     
     elif user.profile_id.user_type in ['Consumer', 'VerifiedConsumer']:
@@ -47,7 +48,7 @@ def dashboard_fullfillment(request):
             'username': user.get_full_name_from_userModel(),
             'today_expense':  str(get_todays_expense(user)),
             'wallet_balance':  str(get_wallet_balance(user_id)),
-            'rate' :  Rating.objects.filter(rated_to=user).aggregate(Avg('score'))['score__avg']
+            'rate' :  rating_avg
            # 'recent_accepted_orders': get_recent_accepted_orders(user)
         }, status=status.HTTP_200_OK)
 
@@ -62,13 +63,13 @@ def dashboard_fullfillmentt(request):
     print(request.headers)
     # ✅ consistent key
     try:
-        user = Users.objects.get(user_id=user_id)
+        user = Users.objects.select_related('profile_id', 'reputation').get(user_id=user_id)
     except Users.DoesNotExist:
         return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if user.profile_id.user_type not in ['Admin', 'SuperAdmin']:
         nearby_farmers_data = get_nearby_top_rated_farmers(user)
-    from backend.models import Rating
+    rating_avg = get_user_reputation(user).average_for()
     
     if user.is_admin:
         return Response({
@@ -84,7 +85,7 @@ def dashboard_fullfillmentt(request):
            # 'order_received':       str(get_farmer_orderRequests(user)),
             'wallet_balance':        str(get_wallet_balance(user)),
             'todays_income':         str(get_todays_income(user)),
-            'rate' :  str(Rating.objects.filter(rated_to=user).aggregate(Avg('score'))['score__avg']),
+            'rate' :  str(rating_avg),
         }, status=status.HTTP_200_OK)
     
     elif user.profile_id.user_type in ['Consumer', 'VerifiedConsumer']:
@@ -138,8 +139,6 @@ def get_orderRequested_by_consumer(user):
 
 def get_nearby_top_rated_farmers(user_obj, limit=2):
     """Get top rated farmers in the same district as the user"""
-    from django.db.models import Avg
-
     district = user_obj.profile_id.district
 
     return (
@@ -147,8 +146,9 @@ def get_nearby_top_rated_farmers(user_obj, limit=2):
             profile_id__district__iexact=district,
             profile_id__user_type__in=['Farmer', 'VerifiedFarmer']
         )
-        .annotate(avg_rating=Avg('rated_to__score'))
-        .order_by('-avg_rating')[:limit]
+        .select_related('reputation')
+        .annotate(avg_rating=F('reputation__avg_score'))
+        .order_by(F('reputation__avg_score').desc(nulls_last=True))[:limit]
     )
     
 
@@ -2,7 +2,8 @@ from rest_framework.decorators import api_view, permission_classes
 from backend.permissions import HasValidTokenForUser, IsAdmin
 from rest_framework.response import Response
 from rest_framework import status
-from backend.models import  UsersProfile, Users, Rating, Wallet, Verification, Transaction
+from backend.models import  UsersProfile, Users, Wallet, Verification, Transaction, UserReputation
+from backend.utils.user_reputation import get_user_reputation
 from rest_framework.permissions import  AllowAny
 from django.db.models import *
 
@@ -20,7 +21,7 @@ def other_user_profile(request):
 
     
     try:
-        user = Users.objects.get(user_id=userid)
+        user = Users.objects.select_related('profile_id', 'reputation').get(user_id=userid)
         #profile = UsersProfile.objects.get(profile_id=user.profile_id)
         wallet = Wallet.objects.get(user_id=user)
         return Response({
@@ -35,7 +36,7 @@ def other_user_profile(request):
             'dob': user.profile_id.dob,
             'sex': user.profile_id.sex,
             'about': user.profile_id.about,
-            'rating': Rating.objects.filter(rated_to=userid).aggregate(Avg('score'))['score__avg'],
+            'rating': get_user_reputation(user).average_for(),
             'profile_picture': user.profile_id.profile_url,
             'facebook': user.profile_id.facebook,
             'whatsapp': user.profile_id.whatsapp,
@@ -120,12 +121,11 @@ def search_user(request):
         # ── Ratings: batch in one query to avoid N+1 ─────────────────────────
         user_ids = [u.user_id for u in page_obj.object_list]
         ratings  = (
-            Rating.objects
-            .filter(rated_to__in=user_ids)
-            .values('rated_to')
-            .annotate(avg_score=Avg('score'))
+            UserReputation.objects
+            .filter(user_id__in=user_ids, rating_count__gt=0)
+            .values_list('user_id', 'avg_score')
         )
-        rating_map = {r['rated_to']: round(r['avg_score'], 2) for r in ratings}
+        rating_map = {user_id: avg_score for user_id, avg_score in ratings}
 
         # ── Serialize ─────────────────────────────────────────────────────────
         user_list = [
@@ -471,13 +471,13 @@ def update_admin_profile(request):
 #                            Search Users by Location Start
 ##########################################################################################
 from backend.permissions import IsFarmerOrConsumer
+from backend.utils.profile_thumbnails import get_profile_thumbnail, get_profile_thumbnail_b64
+from backend.utils.locations import annotate_location_tier
 
 @api_view(['POST'])
 @permission_classes([AllowAny, IsFarmerOrConsumer])
 def search_users_from_app(request):
-    import os
     import base64
-    import cv2
     
     user_id = request.headers.get('user-id')
     search = request.data.get('search', '').strip()
@@ -522,31 +522,21 @@ def search_users_from_app(request):
             )
             users = Users.objects.filter(query).select_related('profile_id')[:10 * int(page)]
         else:
-            users = Users.objects.filter(query).select_related('profile_id')
-            
-            same_tole = []
-            same_ward = []
-            same_municipal = []
-            same_district = []
-            same_province = []
-            others = []
-            
-            for u in users:
-                p = u.profile_id
-                if p.tole == profile.tole and p.ward == profile.ward and p.municipal == profile.municipal:
-                    same_tole.append(u)
-                elif p.ward == profile.ward and p.municipal == profile.municipal:
-                    same_ward.append(u)
-                elif p.municipal == profile.municipal:
-                    same_municipal.append(u)
-                elif p.district == profile.district:
-                    same_district.append(u)
-                elif p.province == profile.province:
-                    same_province.append(u)
-                else:
-                    others.append(u)
-            
-            users = same_tole + same_ward + same_municipal + same_district + same_province + others
+            # Same tole > ward > municipal > district > province > others, ranked
+            # in SQL so only the requested page is loaded
+            users = annotate_location_tier(
+                Users.objects.filter(query).select_related('profile_id'), profile, 'profile_id__',
+            )
+            tole = (profile.tole or '').strip()
+            if tole:
+                users = users.annotate(tier=Case(
+                    When(location_tier=4, profile_id__tole__iexact=tole, then=Value(5)),
+                    default=F('location_tier'),
+                    output_field=IntegerField(),
+                ))
+            else:
+                users = users.annotate(tier=F('location_tier'))
+            users = users.order_by('-tier', 'user_id')
         
         from django.core.paginator import Paginator
         paginator = Paginator(users, 10)
@@ -554,8 +544,6 @@ def search_users_from_app(request):
         
         data = []
         for u in page_obj:
-            from django.conf import settings
-            
             profile_pic_data = {
                 'user_id': u.user_id,
                 'full_name': u.get_full_name_from_userModel(),
@@ -565,36 +553,12 @@ def search_users_from_app(request):
                 'file_type': 'img'
             }
             
-            if u.profile_id.profile_url:
-                file_path = os.path.join(settings.MEDIA_ROOT, u.profile_id.profile_url)
-            else:
-                user_type = u.profile_id.user_type.lower()
-                default_map = {
-                    'verifiedfarmer': 'pp-farmer.png',
-                    'farmer': 'pp-farmer.png',
-                    'verifiedconsumer': 'pp-consumer.png',
-                    'consumer': 'pp-consumer.png',
-                    'admin': 'pp-admin.png',
-                    'superadmin': 'pp-superadmin.png',
-                }
-                filename = default_map.get(user_type, 'pp-guest.png')
-                file_path = f'backend/static/DefaultProfilePicture/{filename}'
-            
-            try:
-                if os.path.exists(file_path):
-                    img = cv2.imread(file_path)
-                    if img is not None:
-                        h, w = img.shape[:2]
-                        scale = min(100 / w, 100 / h)
-                        new_w = int(w * scale)
-                        new_h = int(h * scale)
-                        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                        _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        profile_pic_data['file'] = base64.b64encode(buffer).decode('utf-8')
-                        profile_pic_data['size'] = round(len(buffer) / (1024 * 1024), 3)
-                        profile_pic_data['mime_type'] = 'image/jpeg'
-            except Exception:
-                pass
+            # Pre-built 100px thumbnail (see backend.utils.profile_thumbnails)
+            thumbnail = get_profile_thumbnail(u.profile_id, size=100)
+            if thumbnail:
+                profile_pic_data['file'] = base64.b64encode(thumbnail).decode('utf-8')
+                profile_pic_data['size'] = round(len(thumbnail) / (1024 * 1024), 3)
+                profile_pic_data['mime_type'] = 'image/jpeg'
             
             data.append(profile_pic_data)
         
@@ -621,9 +585,6 @@ from django.conf import settings
 @api_view(['POST'])
 @permission_classes([AllowAny, IsFarmerOrConsumer])
 def get_connection_list(request):
-    import os
-    import base64
-    import cv2
     from backend.models import Connections
     
     user_id = request.headers.get('user-id')
@@ -665,34 +626,7 @@ def get_connection_list(request):
             
             profile = other_user.profile_id
             
-            from django.conf import settings
-            if profile.profile_url:
-                file_path = os.path.join(settings.MEDIA_ROOT, profile.profile_url)
-            else:
-                user_type_lower = profile.user_type.lower()
-                default_map = {
-                    'verifiedfarmer': 'pp-farmer.png',
-                    'farmer': 'pp-farmer.png',
-                    'verifiedconsumer': 'pp-consumer.png',
-                    'consumer': 'pp-consumer.png',
-                }
-                filename = default_map.get(user_type_lower, 'pp-guest.png')
-                file_path = f'backend/static/DefaultProfilePicture/{filename}'
-            
-            profile_pic = None
-            try:
-                if os.path.exists(file_path):
-                    img = cv2.imread(file_path)
-                    if img is not None:
-                        h, w = img.shape[:2]
-                        scale = min(100 / w, 100 / h)
-                        new_w = int(w * scale)
-                        new_h = int(h * scale)
-                        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                        _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        profile_pic = base64.b64encode(buffer).decode('utf-8')
-            except Exception:
-                pass
+            profile_pic = get_profile_thumbnail_b64(profile, size=100)
             
             results.append({
                 'user_id': other_user.user_id,
@@ -722,9 +656,6 @@ def get_connection_list(request):
 @api_view(['POST'])
 @permission_classes([AllowAny, IsFarmerOrConsumer])
 def search_users_android(request):
-    import os
-    import base64
-    import cv2
     from backend.models import Connections
     
     user_id = request.headers.get('user-id')
@@ -766,25 +697,12 @@ def search_users_android(request):
                 Q(profile_id__province__icontains=address)
             )
         
-        users = Users.objects.filter(query).select_related('profile_id')
-        
-        same_ward = []
-        same_municipal = []
-        same_district = []
-        others = []
-        
-        for u in users:
-            p = u.profile_id
-            if p.ward == profile.ward and p.municipal == profile.municipal:
-                same_ward.append(u)
-            elif p.municipal == profile.municipal:
-                same_municipal.append(u)
-            elif p.district == profile.district:
-                same_district.append(u)
-            else:
-                others.append(u)
-        
-        sorted_users = same_ward + same_municipal + same_district + others
+        # Same ward > municipal > district > others (province counts as others)
+        sorted_users = annotate_location_tier(
+            Users.objects.filter(query).select_related('profile_id'), profile, 'profile_id__',
+        ).annotate(
+            bucket=Case(When(location_tier__gte=2, then=F('location_tier')), default=Value(0), output_field=IntegerField())
+        ).order_by('-bucket', 'user_id')
         
         if page is not None:
             from django.core.paginator import Paginator
@@ -796,52 +714,8 @@ def search_users_android(request):
         
         results = []
         for u in users_to_return:
-            # Determine file path
-            if u.profile_id.profile_url:
-                file_path = os.path.join(settings.MEDIA_ROOT, u.profile_id.profile_url)
-            else:
-                user_type = u.profile_id.user_type.lower()
-                default_map = {
-                    'verifiedfarmer': 'pp-farmer.png',
-                    'farmer': 'pp-farmer.png',
-                    'verifiedconsumer': 'pp-consumer.png',
-                    'consumer': 'pp-consumer.png',
-                }
-                filename = default_map.get(user_type, 'pp-guest.png')
-                file_path = f'backend/static/DefaultProfilePicture/{filename}'
-            
-            # Compress and encode profile picture
-            profile_pic = None
-            if os.path.exists(file_path):
-                try:
-                    img = cv2.imread(file_path)
-                    if img is not None:
-                        h, w = img.shape[:2]
-                        scale = min(100 / w, 100 / h)
-                        new_w = int(w * scale)
-                        new_h = int(h * scale)
-                        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                        _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        profile_pic = base64.b64encode(buffer).decode('utf-8')
-                except Exception as e:
-                    print(f"Error compressing image for {u.user_id}: {e}")
-            
-            # Fallback to guest profile if compression failed
-            if not profile_pic:
-                try:
-                    fallback_path = 'backend/static/DefaultProfilePicture/pp-guest.png'
-                    if os.path.exists(fallback_path):
-                        img = cv2.imread(fallback_path)
-                        if img is not None:
-                            h, w = img.shape[:2]
-                            scale = min(100 / w, 100 / h)
-                            new_w = int(w * scale)
-                            new_h = int(h * scale)
-                            resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                            _, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                            profile_pic = base64.b64encode(buffer).decode('utf-8')
-                except Exception:
-                    pass
+            # Pre-built 100px thumbnail, default / guest avatar as fallback
+            profile_pic = get_profile_thumbnail_b64(u.profile_id, size=100)
             
             results.append({
                 'user_id': u.user_id,
@@ -1,4 +1,5 @@
-from ..models import Users, ProductRating,  Rating
+from ..models import Users, ProductRating,  Rating, UserReputation
+from backend.utils.user_reputation import get_user_reputation
 from ..serializers import  RatingSerializer, ProductRatingSerializer
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
@@ -7,7 +8,7 @@ from backend.permissions import HasValidTokenForUser, IsFarmer, IsConsumer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
-from django.db.models import Avg, Count
+from django.db.models import Avg, F
 
 
 ##########################################################################################
@@ -18,9 +19,9 @@ from django.db.models import Avg, Count
 class RateFarmer(APIView):
     permission_classes = [HasValidTokenForUser, IsConsumer]
     def post(self, request):
-        # Automatically set rate_for to 'Farmer' since consumer is rating a farmer
+        # Automatically set rated_for to 'Farmer' since consumer is rating a farmer
         data = request.data.copy()
-        data['rate_for'] = 'Farmer'
+        data['rated_for'] = 'Farmer'
         serializer = RatingSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
@@ -31,7 +32,7 @@ class RateFarmer(APIView):
 class EditFarmerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsConsumer]
     def put(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Farmer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Farmer')
         serializer = RatingSerializer(rating, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -42,7 +43,7 @@ class EditFarmerRate(APIView):
 class ViewFarmerRate(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Farmer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Farmer')
         serializer = RatingSerializer(rating)
         return Response(serializer.data)
 
@@ -50,7 +51,7 @@ class ViewFarmerRate(APIView):
 class DeleteFarmerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsConsumer]
     def delete(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Farmer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Farmer')
         rating.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -58,7 +59,7 @@ class DeleteFarmerRate(APIView):
 class ListFarmerRatings(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request):
-        ratings = Rating.objects.filter(rate_for='Farmer')
+        ratings = Rating.objects.filter(rated_for='Farmer')
         serializer = RatingSerializer(ratings, many=True)
         return Response(serializer.data)
 
@@ -66,7 +67,7 @@ class ListFarmerRatings(APIView):
 class ListRatingsByFarmer(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request, farmer_id):
-        ratings = Rating.objects.filter(rated_to=farmer_id, rate_for='Farmer')
+        ratings = Rating.objects.filter(rated_to=farmer_id, rated_for='Farmer')
         serializer = RatingSerializer(ratings, many=True)
         return Response(serializer.data)
 
@@ -86,9 +87,9 @@ def farmer_profile_rating(request):
     if not farmer_id:
         return Response({'error': 'farmer_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    qs = Rating.objects.filter(rated_to=farmer_id, rate_for='Farmer')
-    avg_rating = qs.aggregate(Avg('score'))['score__avg']
-    total_count = qs.count()
+    reputation = get_user_reputation(farmer_id)
+    avg_rating = reputation.average_for('Farmer')
+    total_count = reputation.count_for('Farmer')
 
     if avg_rating is None:
         return Response({
@@ -110,9 +111,9 @@ def farmer_profile_rating(request):
 class RateConsumer(APIView):
     permission_classes = [HasValidTokenForUser, IsFarmer]
     def post(self, request):
-        # Automatically set rate_for to 'Consumer' since farmer is rating a consumer
+        # Automatically set rated_for to 'Consumer' since farmer is rating a consumer
         data = request.data.copy()
-        data['rate_for'] = 'Consumer'
+        data['rated_for'] = 'Consumer'
         serializer = RatingSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
@@ -123,7 +124,7 @@ class RateConsumer(APIView):
 class EditConsumerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsFarmer]
     def put(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Consumer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Consumer')
         serializer = RatingSerializer(rating, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -134,7 +135,7 @@ class EditConsumerRate(APIView):
 class ViewConsumerRate(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Consumer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Consumer')
         serializer = RatingSerializer(rating)
         return Response(serializer.data)
 
@@ -142,7 +143,7 @@ class ViewConsumerRate(APIView):
 class DeleteConsumerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsFarmer]
     def delete(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Consumer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Consumer')
         rating.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -150,7 +151,7 @@ class DeleteConsumerRate(APIView):
 class ListConsumerRatings(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request):
-        ratings = Rating.objects.filter(rate_for='Consumer')
+        ratings = Rating.objects.filter(rated_for='Consumer')
         serializer = RatingSerializer(ratings, many=True)
         return Response(serializer.data)
 
@@ -158,7 +159,7 @@ class ListConsumerRatings(APIView):
 class ListRatingsByConsumer(APIView):
     permission_classes = [HasValidTokenForUser]
     def get(self, request, consumer_id):
-        ratings = Rating.objects.filter(rated_to=consumer_id, rate_for='Consumer')
+        ratings = Rating.objects.filter(rated_to=consumer_id, rated_for='Consumer')
         serializer = RatingSerializer(ratings, many=True)
         return Response(serializer.data)
 
@@ -172,9 +173,9 @@ def consumer_profile_rating(request):
     if not consumer_id:
         return Response({'error': 'consumer_id is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    qs = Rating.objects.filter(rated_to=consumer_id, rate_for='Consumer')
-    avg_rating = qs.aggregate(Avg('score'))['score__avg']
-    total_count = qs.count()
+    reputation = get_user_reputation(consumer_id)
+    avg_rating = reputation.average_for('Consumer')
+    total_count = reputation.count_for('Consumer')
 
     if avg_rating is None:
         return Response({
@@ -198,7 +199,7 @@ class RateFarmerAsConsumer(APIView):
     def post(self, request):
         # Farmer acting as consumer, rating another farmer
         data = request.data.copy()
-        data['rate_for'] = 'Farmer'
+        data['rated_for'] = 'Farmer'
         serializer = RatingSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
@@ -209,7 +210,7 @@ class RateFarmerAsConsumer(APIView):
 class EditFarmerAsConsumerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsFarmer]
     def put(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Farmer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Farmer')
         # Verify the rater is the logged-in farmer
         serializer = RatingSerializer(rating, data=request.data, partial=True)
         if serializer.is_valid():
@@ -221,7 +222,7 @@ class EditFarmerAsConsumerRate(APIView):
 class DeleteFarmerAsConsumerRate(APIView):
     permission_classes = [HasValidTokenForUser, IsFarmer]
     def delete(self, request, pk):
-        rating = get_object_or_404(Rating, pk=pk, rate_for='Farmer')
+        rating = get_object_or_404(Rating, pk=pk, rated_for='Farmer')
         rating.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -339,14 +340,14 @@ def format_number(num: int) -> str:
 def topratedfarmerlist():
     """Helper function to get top 5 rated farmers with filters"""
     return (
-        Rating.objects.filter(rated_for="Farmer")
-        .values("rated_to")
-        .annotate(
-            total_ratings=Count("id"),
-            avg_score=Avg("score")
-        )
-        .filter(avg_score__gte=6, total_ratings__gte=100)
-        .order_by("-total_ratings", "-avg_score")[:5]
+        UserReputation.objects
+        .filter(farmer_avg__gte=6, farmer_count__gte=100)
+        .order_by("-farmer_count", "-farmer_avg")
+        .values(
+            rated_to=F("user_id"),
+            total_ratings=F("farmer_count"),
+            avg_score=F("farmer_avg"),
+        )[:5]
     )
 
 @api_view(['POST'])
@@ -9,6 +9,9 @@ import secrets
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from backend.utils.media_handler import FileManager
+from backend.utils.user_reputation import get_user_reputation
+from backend.utils.profile_thumbnails import generate_profile_thumbnails, delete_profile_thumbnails
+from backend.utils.media_executor import submit_media_task, MediaQueueFull, MediaExecutorClosed
 from backend.utils.validators import (validate_email_format, 
                                       validate_nepali_phone , 
                                       validate_facebook_url, 
@@ -407,6 +410,12 @@ def update_profile_picture(request):
     # Update database here
     user_obj = Users.objects.get(user_id=user_id)
     profile = UsersProfile.objects.get(profile_id=user_obj.profile_id.profile_id)
+    if profile.profile_url and profile.profile_url != result['file_url']:
+        delete_profile_thumbnails(profile.profile_url)
+    try:
+        submit_media_task(generate_profile_thumbnails, result['file_url'], name='profile-thumbnails')
+    except (MediaQueueFull, MediaExecutorClosed):
+        pass   # built on first list request instead
     profile.profile_url = result['file_url']
     profile.save()
 
@@ -439,7 +448,6 @@ def save_profile_file(user_id, new_picture):
 import base64
 import mimetypes
 from django.conf import settings
-from django.db.models import Avg
 
 def get_user_profile_data(user):
     """
@@ -513,7 +521,7 @@ def view_user_profile_by_admin(request):
         user = Users.objects.get(user_id=userid)
         profile_data = get_user_profile_data(user)
 
-        rating = Rating.objects.filter(rated_to=userid).aggregate(avg_score=Avg('score'))['avg_score']
+        rating = get_user_reputation(user).average_for()
         if rating is None:
             rating = 0.0
         else:
@@ -1,8 +1,16 @@
-from django.db.models.signals import post_save
+from decimal import Decimal
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
+from django.db import connection
 from backend.models import Wallet, Transaction, UsersProfile, Users
 from backend.utils.score_tracker import track_product_view
+from backend.utils.product_stats import apply_rating_change, apply_order_change
+from backend.utils.user_reputation import apply_rating_changes
+from backend.utils.auth_cache import invalidate_token, invalidate_user, invalidate_profile
+from backend.utils.product_search import refresh_search_vectors
+from backend.utils.locations import assign_profile_location
+from backend.utils.product_snapshot import mark_products_changed, mark_farmers_changed
 
 
 
@@ -48,7 +56,7 @@ def transaction_created_for_order(sender, instance, created, **kwargs):
 			)
 
 		elif instance.order_status == 'DELIVERED':
-			track_product_view(instance.product.user_id, instance.product.p_id, 4)
+			track_product_view(instance.product.user_id, instance.product, 4)
 	
 
 	except Exception as e:
@@ -62,3 +70,215 @@ def update_user_profile_status(sender, instance, created, **kwargs):
 	'''Automatically update the user profile status when a new verification is created'''
 	u = 'p'
 
+
+##########################################################################################
+#                            ProductStats rollup Start
+##########################################################################################
+def _order_contribution(product_id, order_status, total_cost):
+	'''(product_id, delivered, sales) an order adds to ProductStats'''
+	return product_id, (1 if order_status == 'DELIVERED' else 0), Decimal(total_cost or 0)
+
+
+@receiver(pre_save, sender='backend.ProductRating')
+def remember_previous_product_rating(sender, instance, **kwargs):
+	'''Keep the stored (product, score) so post_save can apply the delta'''
+	instance._stats_previous = None
+	if instance.pk:
+		instance._stats_previous = sender.objects.filter(pk=instance.pk).values_list('p_id', 'score').first()
+
+
+@receiver(post_save, sender='backend.ProductRating')
+def product_rating_saved(sender, instance, created, **kwargs):
+	'''Add a new / edited product rating to ProductStats'''
+	previous = getattr(instance, '_stats_previous', None)
+	if created or previous is None:
+		apply_rating_change(instance.p_id_id, Decimal(instance.score), 1)
+		return
+
+	old_product_id, old_score = previous
+	if old_product_id == instance.p_id_id:
+		apply_rating_change(instance.p_id_id, Decimal(instance.score) - Decimal(old_score), 0)
+	else:
+		apply_rating_change(old_product_id, -Decimal(old_score), -1)
+		apply_rating_change(instance.p_id_id, Decimal(instance.score), 1)
+
+
+@receiver(post_delete, sender='backend.ProductRating')
+def product_rating_deleted(sender, instance, **kwargs):
+	'''Remove a deleted product rating from ProductStats'''
+	apply_rating_change(instance.p_id_id, -Decimal(instance.score), -1)
+
+
+@receiver(pre_save, sender='backend.OrderRequest')
+def remember_previous_order_state(sender, instance, **kwargs):
+	'''Keep the stored (product, status, total_cost) for status transitions'''
+	instance._stats_previous = None
+	if instance.pk:
+		instance._stats_previous = sender.objects.filter(pk=instance.pk).values_list('product_id', 'order_status', 'total_cost').first()
+
+
+@receiver(post_save, sender='backend.OrderRequest')
+def order_saved_update_product_stats(sender, instance, created, **kwargs):
+	'''Apply DELIVERED / total_cost changes of an order to ProductStats'''
+	new_pid, new_delivered, new_sales = _order_contribution(instance.product_id, instance.order_status, instance.total_cost)
+	previous = getattr(instance, '_stats_previous', None)
+
+	if previous is None:
+		apply_order_change(new_pid, new_delivered, new_sales)
+		return
+
+	old_pid, old_delivered, old_sales = _order_contribution(*previous)
+	if old_pid == new_pid:
+		apply_order_change(new_pid, new_delivered - old_delivered, new_sales - old_sales)
+	else:
+		apply_order_change(old_pid, -old_delivered, -old_sales)
+		apply_order_change(new_pid, new_delivered, new_sales)
+
+
+@receiver(post_delete, sender='backend.OrderRequest')
+def order_deleted_update_product_stats(sender, instance, **kwargs):
+	'''Remove a deleted order from ProductStats'''
+	pid, delivered, sales = _order_contribution(instance.product_id, instance.order_status, instance.total_cost)
+	apply_order_change(pid, -delivered, -sales)
+##########################################################################################
+#                            ProductStats rollup End
+##########################################################################################
+
+
+##########################################################################################
+#                            UserReputation rollup Start
+##########################################################################################
+@receiver(pre_save, sender='backend.Rating')
+def remember_previous_rating(sender, instance, **kwargs):
+	'''Keep the stored (rated_to, rated_for, score) so an edit can be applied as a delta'''
+	instance._reputation_previous = None
+	if instance.pk:
+		instance._reputation_previous = sender.objects.filter(pk=instance.pk).values_list('rated_to_id', 'rated_for', 'score').first()
+
+
+@receiver(post_save, sender='backend.Rating')
+def rating_saved_update_reputation(sender, instance, created, **kwargs):
+	'''Add a new / edited user rating to UserReputation'''
+	changes = []
+	previous = getattr(instance, '_reputation_previous', None)
+	if previous is not None:
+		changes.append((*previous, -1))
+	changes.append((instance.rated_to_id, instance.rated_for, instance.score, 1))
+	apply_rating_changes(changes)
+
+
+@receiver(post_delete, sender='backend.Rating')
+def rating_deleted_update_reputation(sender, instance, **kwargs):
+	'''Remove a deleted user rating from UserReputation'''
+	apply_rating_changes([(instance.rated_to_id, instance.rated_for, instance.score, -1)])
+##########################################################################################
+#                            UserReputation rollup End
+##########################################################################################
+
+
+##########################################################################################
+#                            Auth cache invalidation Start
+##########################################################################################
+@receiver(post_save, sender='backend.Tokens')
+def token_saved_invalidate_auth_cache(sender, instance, **kwargs):
+	'''Token deactivated / suspended / re-activated (logout, refresh) → drop cached auth'''
+	invalidate_token(instance.token_digest, instance.user_id_id)
+
+
+@receiver(post_save, sender='backend.Users')
+def user_saved_invalidate_auth_cache(sender, instance, created, **kwargs):
+	'''profile_status / is_admin may have changed → drop cached auth of the user'''
+	if not created:
+		invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender='backend.UsersProfile')
+def profile_saved_invalidate_auth_cache(sender, instance, created, **kwargs):
+	'''user_type may have changed (e.g. verification) → drop cached auth'''
+	if not created:
+		invalidate_profile(instance.profile_id)
+##########################################################################################
+#                            Auth cache invalidation End
+##########################################################################################
+
+
+##########################################################################################
+#                            Product search vector Start
+##########################################################################################
+@receiver(pre_save, sender='backend.Product')
+def remember_previous_search_text(sender, instance, **kwargs):
+	'''Keep the stored (name, description, keywords) so unchanged saves skip the refresh'''
+	instance._search_previous = None
+	if instance.pk and connection.vendor == 'postgresql':
+		instance._search_previous = sender.objects.filter(pk=instance.pk).values_list('name', 'description', 'keywords').first()
+
+
+@receiver(post_save, sender='backend.Product')
+def product_saved_refresh_search_vector(sender, instance, created, **kwargs):
+	'''Name / description / keywords changed → recompute Product.search_vector (PostgreSQL only)'''
+	if (instance.name, instance.description, instance.keywords) != getattr(instance, '_search_previous', None):
+		refresh_search_vectors([instance])
+##########################################################################################
+#                            Product search vector End
+##########################################################################################
+
+
+##########################################################################################
+#                            Profile location Start
+##########################################################################################
+PROFILE_LOCATION_FIELDS = {'province', 'district', 'municipal', 'ward'}
+PROFILE_LOCATION_IDS = ('province_loc', 'district_loc', 'municipal_loc', 'ward_no')
+
+
+@receiver(pre_save, sender='backend.UsersProfile')
+def profile_resolve_location(sender, instance, update_fields=None, **kwargs):
+	'''Resolve the free-text province / district / municipal / ward into the Location FKs and ward_no'''
+	if update_fields is None or PROFILE_LOCATION_FIELDS & set(update_fields):
+		assign_profile_location(instance)
+
+
+@receiver(post_save, sender='backend.UsersProfile')
+def profile_store_location(sender, instance, created, update_fields=None, **kwargs):
+	'''save(update_fields=[...]) skips the resolved columns; write them when the text changed'''
+	if update_fields is None or not PROFILE_LOCATION_FIELDS & set(update_fields):
+		return
+	if set(PROFILE_LOCATION_IDS) <= set(update_fields):
+		return
+	attnames = [sender._meta.get_field(name).attname for name in PROFILE_LOCATION_IDS]
+	sender.objects.filter(pk=instance.pk).update(**{name: getattr(instance, name) for name in attnames})
+##########################################################################################
+#                            Profile location End
+##########################################################################################
+
+
+##########################################################################################
+#                            Product snapshot Start
+##########################################################################################
+@receiver(post_save, sender='backend.Product')
+@receiver(post_delete, sender='backend.Product')
+def product_changed_refresh_snapshot(sender, instance, **kwargs):
+	'''Keywords / type / expiry / owner may have changed → reload the row in the ranking snapshot'''
+	mark_products_changed([instance.pk])
+
+
+@receiver(post_save, sender='backend.ProductStats')
+def product_stats_changed_refresh_snapshot(sender, instance, **kwargs):
+	'''Rating / delivered count changed → reload the row in the ranking snapshot'''
+	mark_products_changed([instance.product_id])
+
+
+@receiver(post_save, sender='backend.UsersProfile')
+def profile_location_changed_refresh_snapshot(sender, instance, update_fields=None, **kwargs):
+	'''A farmer moved → reload the farmer's location in the ranking snapshot'''
+	if update_fields is None or PROFILE_LOCATION_FIELDS & set(update_fields):
+		mark_farmers_changed([instance.pk])
+
+
+@receiver(post_save, sender='backend.Users')
+def user_saved_refresh_snapshot(sender, instance, created, **kwargs):
+	'''New account → its profile's farmer row (user_id ↔ profile) is (re)loaded'''
+	if created:
+		mark_farmers_changed([instance.profile_id_id])
+##########################################################################################
+#                            Product snapshot End
+##########################################################################################
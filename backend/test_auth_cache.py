@@ -0,0 +1,43 @@
+from django.test import TestCase
+
+from backend.models import Users, UsersProfile, Tokens
+from backend.utils.auth_cache import resolve_auth, clear_auth_cache
+
+
+class AuthCacheTest(TestCase):
+    def setUp(self):
+        clear_auth_cache()
+        profile = UsersProfile.objects.create(profile_id='CC-00000001', f_name='Con', l_name='Sumer')
+        self.user = Users.objects.create(user_id='consumer1', password='x', profile_id=profile)
+        self.token = Tokens.create_token(self.user)
+
+    def test_single_query_then_cached(self):
+        with self.assertNumQueries(1):
+            ctx = resolve_auth(self.token.token, 'consumer1')
+        self.assertEqual(ctx.user_type, 'Consumer')
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(resolve_auth(self.token.token, 'consumer1'))
+
+        self.assertIsNone(resolve_auth(self.token.token, 'someone-else'))
+        self.assertIsNone(resolve_auth('bad-token', 'consumer1'))
+
+    def test_invalidation(self):
+        self.assertIsNotNone(resolve_auth(self.token.token, 'consumer1'))
+        self.token.deactivate()
+        self.assertIsNone(resolve_auth(self.token.token, 'consumer1'))
+
+        other = Tokens.create_token(self.user)
+        self.assertIsNotNone(resolve_auth(other.token, 'consumer1'))
+        Tokens.deactivate_all_user_tokens(self.user)
+        self.assertIsNone(resolve_auth(other.token, 'consumer1'))
+
+        third = Tokens.create_token(self.user)
+        self.assertIsNotNone(resolve_auth(third.token, 'consumer1'))
+        self.user.profile_status = 'SUSPENDED'
+        self.user.save()
+        self.assertIsNone(resolve_auth(third.token, 'consumer1'))
+
+    def test_logout_endpoint(self):
+        headers = {'HTTP_TOKEN': self.token.token, 'HTTP_USER_ID': 'consumer1'}
+        self.assertEqual(self.client.post('/api/auth/logout/', **headers).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/logout/', **headers).status_code, 403)
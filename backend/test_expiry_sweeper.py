@@ -0,0 +1,70 @@
+import io
+import json
+
+from django.test import TestCase
+from django.utils import timezone
+
+from backend.models import Users, UsersProfile, Tokens, OTP
+from backend.utils.expiry_sweeper import sweep
+
+
+class ExpirySweeperTest(TestCase):
+    def setUp(self):
+        profile = UsersProfile.objects.create(profile_id='CC-00000001', f_name='Con', l_name='Sumer')
+        self.user = Users.objects.create(user_id='consumer1', password='x', profile_id=profile)
+
+    def _token(self, expires_in_days, status='ACTIVE'):
+        token = Tokens.create_token(self.user)
+        Tokens.objects.filter(pk=token.pk).update(
+            expires_at=timezone.now() + timezone.timedelta(days=expires_in_days), token_status=status,
+        )
+        token.refresh_from_db()
+        return token
+
+    def test_reads_do_not_write(self):
+        token = self._token(-1)
+        otp = OTP.create_otp(self.user, '123456', 'LOGIN', timezone.now(), expires_in=-1)
+        with self.assertNumQueries(0):
+            self.assertTrue(token.is_expired())
+            self.assertFalse(token.is_active())
+            self.assertEqual(otp.effective_status_OTP(), 'EXPIRED')
+        token.refresh_from_db()
+        otp.refresh_from_db()
+        self.assertEqual((token.token_status, otp.otp_status), ('ACTIVE', 'ACTIVE'))
+
+    def test_sweep_expires_and_purges(self):
+        live = self._token(1)
+        overdue = [self._token(-1) for _ in range(3)]
+        old = self._token(-60, status='INACTIVE')
+        OTP.create_otp(self.user, '123456', 'LOGIN', timezone.now(), expires_in=-1)
+
+        archive = io.StringIO()
+        counts = sweep(batch_size=2, archive=archive)
+        self.assertEqual(counts, {'tokens_expired': 3, 'otps_expired': 1, 'tokens_purged': 1, 'otps_purged': 0})
+
+        self.assertEqual(Tokens.objects.get(pk=live.pk).token_status, 'ACTIVE')
+        self.assertEqual(set(Tokens.objects.filter(token_status='EXPIRED').values_list('pk', flat=True)),
+                         {t.pk for t in overdue})
+        self.assertFalse(Tokens.objects.filter(pk=old.pk).exists())
+        self.assertEqual(json.loads(archive.getvalue())['id'], old.pk)
+
+    def test_swept_token_can_still_be_refreshed(self):
+        token = self._token(-1)
+        sweep(purge=False)
+        response = self.client.post('/api/auth/login-with-token/', {
+            'token': token.token, 'user_id': 'consumer1', 'refresh_token': token.refresh_token,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['token'], token.token)
+
+    def test_logout_all_revokes_swept_tokens(self):
+        token = self._token(-1)
+        sweep(purge=False)
+        Tokens.deactivate_all_user_tokens(self.user)
+        self.assertEqual(Tokens.objects.get(pk=token.pk).token_status, 'INACTIVE')
+
+        response = self.client.post('/api/auth/login-with-token/', {
+            'token': token.token, 'user_id': 'consumer1', 'refresh_token': token.refresh_token,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Tokens.objects.filter(user_id=self.user, token_status='ACTIVE').exists())
@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+
+from backend.models import FarmProducts
+from backend.service_frontend import product_feed
+from backend.utils import farm_product_terms
+from backend.utils.farm_product_terms import FarmProductTerms, get_farm_product_terms, invalidate_farm_product_terms
+
+
+ROWS = [
+    (1, 'tomato', 'गोलभेडा', 'vegetable'),
+    (2, 'potato', 'आलु', 'vegetable'),
+    (3, 'basmati rice', 'बासमती चामल', 'grain'),
+    (4, 'wheat', 'गहुँ', 'grain'),
+    (5, 'mustard oil', 'तोरीको तेल', 'oil'),
+]
+
+
+class FarmProductTermsTest(TestCase):
+    def setUp(self):
+        for fp_id, primary, secondary, category in ROWS:
+            FarmProducts.objects.create(id=fp_id, primary_name=primary, secondary_name=secondary, category=category)
+        farm_product_terms._bump_version()
+
+    def test_lookup_modes(self):
+        terms = FarmProductTerms(ROWS)
+        self.assertEqual(terms.lookup('ATO'), [1, 2])
+        self.assertEqual(terms.lookup('ato', 'prefix'), [])
+        self.assertEqual(terms.lookup('ba', 'prefix'), [3])
+        self.assertEqual(terms.lookup('चामल'), [3])
+        self.assertEqual(terms.lookup(''), [])
+
+    def test_resolve_matches_the_sql_it_replaced(self):
+        terms = get_farm_product_terms()
+        self.assertEqual(terms.resolve('rice'), ([3], ['grain'], [3, 4]))
+        self.assertEqual(terms.resolve('veget'), ([1, 2], ['vegetable'], [1, 2]))
+        self.assertEqual(terms.resolve('तेल'), ([5], ['oil'], [5]))
+        self.assertEqual(terms.resolve('mango'), ([], [], []))
+
+        with CaptureQueriesContext(connection) as queries:
+            product_feed._resolve_farmproduct_categories('rice')
+        self.assertEqual(len(queries), 0)
+
+    def test_writes_invalidate_snapshot(self):
+        self.assertEqual(get_farm_product_terms().lookup('mango'), [])
+        FarmProducts.objects.create(id=6, primary_name='mango', secondary_name='आँप', category='fruit')
+        self.assertEqual(get_farm_product_terms().lookup('mango'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_farm_product_terms()
+        self.assertEqual(get_farm_product_terms().resolve('mango'), ([6], ['fruit'], [6]))
+
+    def test_category_endpoint(self):
+        response = Client().post(
+            '/api/product/category/products/', {'category': 'grain', 'keyword': 'bas', 'match': 'prefix'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['farm_products'], [
+            {'id': 3, 'english_name': 'basmati rice', 'nepali_name': 'बासमती चामल'},
+        ])
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from backend.models import Users, UsersProfile, Product, ProductStats
+from backend.service_frontend import product_feed
+from backend.test_product_snapshot import rank_per_product
+
+
+# user_id, province, district, municipal, ward
+FARMERS = [
+    ('farmerA', 'Bagmati', 'Kathmandu', 'Kathmandu', '2'),
+    ('farmerB', 'Bagmati', 'Lalitpur', 'Lalitpur', '1'),
+    ('farmerC', 'Koshi', 'Jhapa', 'Mechinagar', '3'),
+]
+
+# suffix, farmer, product_type, keywords, days to expiry, (rating_count, avg_score), delivered
+PRODUCTS = [
+    ('a', 'farmerA', 'vegetable', [1], None, (2, '4.50'), 3),
+    ('b', 'farmerA', 'grain', [2, 3], 40, (0, '0'), 0),
+    ('c', 'farmerB', 'vegetable', [3], 60, (1, '3.00'), 150),
+    ('d', 'farmerB', 'fruit', [], None, (0, '0'), 12),
+    ('e', 'farmerC', 'grain', [2], None, (4, '4.75'), 1),
+    ('f', 'farmerC', 'vegetable', [1, 2], 30, (0, '0'), 7),
+    ('g', 'farmerA', 'fruit', [1], 3, (1, '5.00'), 0),      # near expiry, local  -> slot [1]
+    ('h', 'farmerC', 'vegetable', [1], 5, (3, '5.00'), 90),  # near expiry, far    -> dropped
+]
+
+
+class FeedRankingTest(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.consumer_profile = UsersProfile.objects.create(
+            profile_id='CC-00000009', f_name='Con', l_name='Sumer', user_type='Consumer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='2',
+        )
+        Users.objects.create(user_id='consumer9', password='x', profile_id=self.consumer_profile)
+
+        farmers = {}
+        for i, (user_id, province, district, municipal, ward) in enumerate(FARMERS):
+            profile = UsersProfile.objects.create(
+                profile_id=f'FF-0000009{i}', f_name='Farm', l_name=user_id, user_type='Farmer',
+                province=province, district=district, municipal=municipal, ward=ward,
+            )
+            farmers[user_id] = Users.objects.create(user_id=user_id, password='x', profile_id=profile)
+
+        for suffix, farmer, product_type, keywords, days, (rating_count, avg), delivered in PRODUCTS:
+            product = Product.objects.create(
+                p_id=f'{farmer}-P-{suffix}', user_id=farmers[farmer], name=f'Product {suffix}',
+                product_type=product_type, quantity_available=Decimal('5'), cost_per_unit=Decimal('10'),
+                media_url=[], keywords=keywords,
+                expiry_Date=today + timedelta(days=days) if days is not None else None,
+            )
+            ProductStats.objects.create(
+                product=product, rating_count=rating_count, avg_score=Decimal(avg), delivered_count=delivered,
+            )
+
+        self.category_scores = {'vegetable': 35, 'fruit': 5}
+        self.product_scores = {1: 40, 2: 15, 3: 0}
+        self.connections = {'farmerC'}
+
+    def _rank(self, rank, **kwargs):
+        return rank(
+            product_feed._active_products_qs('consumer9'), self.consumer_profile,
+            self.category_scores, self.product_scores, self.connections, **kwargs,
+        )
+
+    def test_sql_ranking_matches_python_ranking(self):
+        ranked, ratings_map, sold_map = self._rank(product_feed._rank_in_db)
+        expected, expected_ratings, expected_sold = rank_per_product(
+            list(product_feed._active_products_qs('consumer9')), self.consumer_profile,
+            self.category_scores, self.product_scores, self.connections,
+        )
+        self.assertEqual([p.p_id for p in ranked], [p.p_id for p in expected])
+        self.assertEqual(ranked[1].p_id, 'farmerA-P-g')
+        self.assertNotIn('farmerC-P-h', [p.p_id for p in ranked])
+
+        for p in ranked:
+            self.assertAlmostEqual(ratings_map.get(p.p_id, 0.0), expected_ratings.get(p.p_id, 0.0))
+            self.assertEqual(sold_map.get(p.p_id, 0), expected_sold.get(p.p_id, 0))
+
+    def test_scores_match_compute_score(self):
+        qs = product_feed._annotate_feed_score(
+            product_feed._active_products_qs('consumer9'), self.consumer_profile,
+            self.category_scores, self.product_scores, self.connections,
+        )
+        ratings_map, sold_map = product_feed._batch_fetch_stats([p.p_id for p in qs])
+        for p in qs:
+            with self.subTest(p_id=p.p_id):
+                self.assertAlmostEqual(p.feed_score, product_feed._compute_score(
+                    p, self.consumer_profile, self.category_scores, self.product_scores,
+                    ratings_map, sold_map, connection_bonus=p.user_id.user_id in self.connections,
+                ))
+
+    def test_top_k_is_limited_in_the_query(self):
+        with self.assertNumQueries(2):
+            ranked, _, _ = self._rank(product_feed._rank_in_db, limit=2)
+        self.assertEqual(len(ranked), 3)   # top 2 + the local near-expiry product
+        self.assertEqual(ranked[1].p_id, 'farmerA-P-g')
+
+    def test_expiry_recommendations_are_scored_and_limited_in_the_query(self):
+        qs = product_feed._active_products_qs('consumer9')
+        # Municipal bucket (≤ 15 days left): farmerA-P-g; province bucket (> 20 days): farmerA-P-b, farmerB-P-c
+        with self.assertNumQueries(1):
+            recs, ratings_map, sold_map = product_feed._get_expiry_recommendations(
+                qs, self.consumer_profile, set(),
+                self.category_scores, self.product_scores, self.connections, limit=1,
+            )
+        self.assertEqual([p.p_id for p in recs], ['farmerA-P-g'])
+        self.assertEqual((ratings_map, sold_map), ({'farmerA-P-g': 5.0}, {}))
+
+        recs, ratings_map, sold_map = product_feed._get_expiry_recommendations(
+            qs, self.consumer_profile, {'farmerA-P-g'},
+            self.category_scores, self.product_scores, self.connections, limit=10,
+        )
+        stats = product_feed._batch_fetch_stats([p.p_id for p in recs])
+        scores = [product_feed._compute_score(
+            p, self.consumer_profile, self.category_scores, self.product_scores, *stats,
+            connection_bonus=p.user_id.user_id in self.connections,
+        ) for p in recs]
+        self.assertEqual(sorted(p.p_id for p in recs), ['farmerA-P-b', 'farmerB-P-c'])
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_all_feed_session_is_capped_at_top_k(self):
+        for top_k in (2, 3, 50):
+            with self.subTest(top_k=top_k), mock.patch.object(product_feed, 'FEED_TOP_K', top_k):
+                ranked, _, _ = product_feed._feed_all(
+                    Users.objects.get(user_id='consumer9'), self.consumer_profile,
+                    product_feed._active_products_qs('consumer9'),
+                    self.category_scores, self.product_scores, self.connections,
+                )
+                self.assertEqual(len(ranked), min(top_k, 7))   # every product but the far near-expiry one
+                self.assertEqual(len({p.p_id for p in ranked}), len(ranked))
@@ -0,0 +1,32 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from backend.management.commands.benchmark_image_encoder import synthetic_photo
+from backend.utils.image_encoder import encode_to_target, downscale, IMAGE_MAX_ENCODES
+
+
+class ImageEncoderTest(SimpleTestCase):
+    def setUp(self):
+        self.photo = synthetic_photo(1600, 1200)
+
+    def test_hits_budget_in_few_encodes(self):
+        for target_kb in (60, 150, 300):
+            result = encode_to_target(self.photo, target_kb * 1024)
+            self.assertLessEqual(len(result['data']), target_kb * 1024)
+            self.assertGreater(len(result['data']), target_kb * 1024 * 0.6)
+            self.assertLessEqual(result['encodes'], IMAGE_MAX_ENCODES)
+
+    def test_probe_that_fits_is_kept(self):
+        flat = np.full((400, 300, 3), 128, dtype=np.uint8)
+        result = encode_to_target(flat, 800 * 1024)
+        self.assertEqual((result['encodes'], result['quality']), (1, 85))
+
+    def test_downscales_before_encoding(self):
+        result = encode_to_target(self.photo, 800 * 1024, max_dimension=800)
+        self.assertEqual((result['width'], result['height']), (800, 600))
+        self.assertIs(downscale(self.photo, 4000), self.photo)
+
+    def test_webp(self):
+        result = encode_to_target(self.photo, 100 * 1024, fmt='webp')
+        self.assertEqual(result['data'][8:12], b'WEBP')
+        self.assertLessEqual(len(result['data']), 100 * 1024)
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+import cv2
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from backend.management.commands.benchmark_image_encoder import synthetic_photo
+from backend.models import Users, UsersProfile, Product
+from backend.service_frontend.product_feed import _serialize_product
+from backend.utils.image_variants import PRODUCT_IMAGE_VARIANTS
+from backend.utils.media_handler import FileManager
+
+
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        self.temp_media_root = tempfile.mkdtemp()
+        media_root = override_settings(MEDIA_ROOT=self.temp_media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        self.farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=profile)
+        ok, buf = cv2.imencode('.png', synthetic_photo(1600, 1200))
+        upload = SimpleUploadedFile('photo.png', buf.tobytes(), content_type='image/png')
+        self.result = FileManager('farmer1').save_product_file(upload, 'farmer1-P-01', 'img', sequence=1)
+        self.product = Product.objects.create(
+            p_id='farmer1-P-01', user_id=self.farmer, name='Tomato',
+            quantity_available=Decimal('5'), cost_per_unit=Decimal('50'),
+            media_url=[{
+                'serial_no': 1, 'media_type': 'img',
+                'media_url': self.result['file_url'], 'variants': self.result['variants'],
+            }],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_media_root)
+
+    def test_variants_fit_their_budget(self):
+        self.assertTrue(self.result['success'])
+        self.assertEqual(set(self.result['variants']), set(PRODUCT_IMAGE_VARIANTS))
+        for name, url in self.result['variants'].items():
+            max_dimension, budget_kb = PRODUCT_IMAGE_VARIANTS[name]
+            path = settings.MEDIA_ROOT + '/' + url
+            self.assertLessEqual(os.path.getsize(path), budget_kb * 1024)
+            self.assertEqual(max(cv2.imread(path).shape[:2]), max_dimension)
+
+    def test_feed_and_download_pick_the_variant(self):
+        card = _serialize_product(self.product, {}, {})
+        self.assertEqual(card['image_url'], self.result['variants']['small'])
+        self.assertEqual(_serialize_product(self.product, {}, {}, 'original')['image_url'], self.result['file_url'])
+
+        url = '/api/file/stream/?subject=PRODUCT_MEDIA&product_id=farmer1-P-01&seq=1'
+        small = self.client.get(url + '&variant=small')
+        full = self.client.get(url)
+        self.assertEqual(int(small['Content-Length']), os.path.getsize(settings.MEDIA_ROOT + '/' + card['image_url']))
+        self.assertGreater(int(full['Content-Length']), 10 * int(small['Content-Length']))
+
+    def test_delete_removes_variants(self):
+        FileManager('farmer1').delete_file('product', self.result['file_name'])
+        for url in self.result['variants'].values():
+            self.assertFalse(os.path.exists(settings.MEDIA_ROOT + '/' + url))
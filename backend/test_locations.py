@@ -0,0 +1,94 @@
+from django.test import TestCase
+
+from backend.models import Location, UsersProfile
+from backend.utils import locations
+from backend.utils.locations import (
+    sync_locations, get_location_index, invalidate_location_index, location_tier, annotate_location_tier,
+    same_location_q, backfill_profile_locations,
+)
+
+
+# profile_id suffix, province, district, municipal, ward
+PROFILES = [
+    ('01', 'Bagmati', 'Kathmandu', 'Kathmandu', '4'),
+    ('02', 'bagmati', 'kathmandu', 'Kathmandu Metropolitan City', 'Ward No. 4'),
+    ('03', 'Bagmati', 'Kathmandu', 'Kathmandu', '7'),
+    ('04', 'Bagmati Province', 'Kathmandu', 'Budhanilkantha', '4'),
+    ('05', 'Bagmati', 'Lalitpur', 'Lalitpur', '4'),
+    ('06', 'Koshi', 'Jhapa', 'Mechinagar', '4'),
+    ('07', 'Nowhere', 'Unknown', 'Kathmandu', '4'),     # unique municipality: resolved anyway
+    ('08', 'Nowhere', 'Unknown', 'Somewhere', '4'),     # unresolved: compared as text
+    ('09', 'nowhere', 'Unknown', 'somewhere', '9'),
+]
+
+
+class LocationHierarchyTest(TestCase):
+    def setUp(self):
+        self.addCleanup(invalidate_location_index)
+        sync_locations()
+        self.profiles = [
+            UsersProfile.objects.create(
+                profile_id=f'FF-000001{suffix}', f_name='Loc', l_name=suffix, user_type='Farmer',
+                province=province, district=district, municipal=municipal, ward=ward,
+            )
+            for suffix, province, district, municipal, ward in PROFILES
+        ]
+
+    def _loc(self, level, name):
+        return Location.objects.get(level=level, key=locations.location_key(name))
+
+    def test_sync_is_idempotent(self):
+        count = Location.objects.count()
+        self.assertGreater(Location.objects.filter(level='municipal').count(), 700)
+        self.assertEqual(sync_locations(), 0)
+        self.assertEqual(Location.objects.count(), count)
+
+    def test_resolve_aliases_and_typos(self):
+        index = get_location_index()
+        bagmati = self._loc('province', 'Bagmati').pk
+        kathmandu_district = self._loc('district', 'Kathmandu').pk
+
+        self.assertEqual(index.resolve('Province 3', 'Kathmandhu', None), (bagmati, kathmandu_district, None))
+        self.assertEqual(index.resolve('Koshi', None, None)[0], self._loc('province', 'Province No. 1').pk)
+        # The district decides the province, and a unique municipality implies both
+        self.assertEqual(index.resolve('Karnali', 'Kathmandu', None)[0], bagmati)
+        self.assertEqual(index.resolve('', '', 'Budhanilkantha Municipality')[:2], (bagmati, kathmandu_district))
+        self.assertEqual(index.resolve('', '', 'Nothing like it'), (None, None, None))
+
+    def test_profile_save_resolves_location(self):
+        first, second = self.profiles[0], self.profiles[1]
+        self.assertIsNotNone(first.municipal_loc_id)
+        self.assertEqual(first.municipal_loc_id, second.municipal_loc_id)
+        self.assertEqual((first.ward_no, second.ward_no), (4, 4))
+        self.assertIsNone(self.profiles[-1].municipal_loc_id)
+
+        first.district = 'Lalitpur'
+        first.municipal = 'Lalitpur'
+        first.save(update_fields=['district', 'municipal'])
+        first.refresh_from_db()
+        self.assertEqual(first.municipal_loc_id, self.profiles[4].municipal_loc_id)
+
+    def test_backfill(self):
+        UsersProfile.objects.update(province_loc=None, district_loc=None, municipal_loc=None, ward_no=None)
+        self.assertEqual(backfill_profile_locations(), 7)
+        self.assertEqual(
+            UsersProfile.objects.get(pk=self.profiles[0].pk).municipal_loc_id, self.profiles[0].municipal_loc_id,
+        )
+
+    def test_python_and_sql_tiers_agree(self):
+        for viewer in (self.profiles[0], self.profiles[7]):
+            with self.subTest(viewer=viewer.pk):
+                sql = dict(
+                    annotate_location_tier(UsersProfile.objects.all(), viewer).values_list('pk', 'location_tier')
+                )
+                for profile in self.profiles:
+                    self.assertEqual(sql[profile.pk], location_tier(profile, viewer))
+        self.assertEqual([location_tier(p, self.profiles[0]) for p in self.profiles], [4, 4, 3, 2, 1, 0, 4, 0, 0])
+        self.assertEqual([location_tier(p, self.profiles[7]) for p in self.profiles], [0, 0, 0, 0, 0, 0, 2, 4, 3])
+
+    def test_same_location_q(self):
+        district = UsersProfile.objects.filter(same_location_q(self.profiles[0], 'district'))
+        self.assertEqual(sorted(p.pk for p in district), [p.pk for p in self.profiles[:4]] + [self.profiles[6].pk])
+
+        nowhere = UsersProfile(province='', district='', municipal='')
+        self.assertFalse(UsersProfile.objects.filter(same_location_q(nowhere, 'municipal')).exists())
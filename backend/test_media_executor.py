@@ -0,0 +1,59 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from backend.utils import media_executor
+from backend.utils.media_executor import MediaExecutor, MediaQueueFull, MediaExecutorClosed
+
+
+class MediaExecutorTest(SimpleTestCase):
+    def setUp(self):
+        self.executor = MediaExecutor(threads=1, processes=1, max_queue=2, inline=False)
+        self.release = threading.Event()
+        self.addCleanup(self.executor.drain, 0)
+        self.addCleanup(self.release.set)
+
+    def test_bounded_queue_and_metrics(self):
+        first = self.executor.submit(self.release.wait, 5)
+        self.executor.submit(lambda: 42)
+        with self.assertRaises(MediaQueueFull):
+            self.executor.submit(lambda: 0)
+        self.assertEqual(self.executor.queue_depth(), 2)
+
+        self.release.set()
+        self.assertTrue(first.result(timeout=5))
+
+        metrics = self.executor.metrics()['thread']
+        self.assertEqual(metrics['rejected'], 1)
+        self.assertIsNotNone(metrics['run_ms']['p50'])
+
+    def test_failure_is_counted(self):
+        future = self.executor.submit(lambda: 1 / 0, name='divide')
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=5)
+        self.assertEqual(self.executor.metrics()['thread']['failed'], 1)
+
+    @mock.patch.object(media_executor, 'WATCHDOG_INTERVAL', 0.05)
+    def test_queued_task_times_out(self):
+        running = self.executor.submit(self.release.wait, 5, timeout=0.1)
+        waiting = self.executor.submit(lambda: 'late', timeout=0.1)
+        with self.assertRaises(Exception):
+            waiting.result(timeout=5)
+        self.assertTrue(waiting.cancelled())
+
+        # The running task can't be interrupted, it is reported as an overrun
+        for _ in range(100):
+            if self.executor.metrics()['thread']['overruns']:
+                break
+            self.release.wait(0.02)
+        self.assertEqual(self.executor.metrics()['thread']['overruns'], 1)
+        self.release.set()
+        self.assertTrue(running.result(timeout=5))
+
+    def test_drain_refuses_new_work(self):
+        done = self.executor.submit(lambda: 'ok')
+        self.assertEqual(self.executor.drain(timeout=5), 0)
+        self.assertEqual(done.result(), 'ok')
+        with self.assertRaises(MediaExecutorClosed):
+            self.executor.submit(lambda: 0)
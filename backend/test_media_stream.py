@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from backend.models import Users, UsersProfile, Product, Tokens
+
+
+class MediaStreamTest(TestCase):
+    def setUp(self):
+        self.temp_media_root = tempfile.mkdtemp()
+        media_root = override_settings(MEDIA_ROOT=self.temp_media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=profile)
+        rel_path = 'Uploaded_Files/farmer1/test-stream.mp4'
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'Uploaded_Files/farmer1'), exist_ok=True)
+        self.payload = bytes(range(256)) * 40
+        with open(os.path.join(settings.MEDIA_ROOT, rel_path), 'wb') as f:
+            f.write(self.payload)
+        Product.objects.create(
+            p_id='farmer1-P-01', user_id=farmer, name='Tomato',
+            quantity_available=Decimal('5'), cost_per_unit=Decimal('50'),
+            media_url=[{'serial_no': 1, 'media_url': rel_path, 'media_type': 'vid'}],
+        )
+        self.url = '/api/file/stream/?subject=PRODUCT_MEDIA&product_id=farmer1-P-01&seq=1'
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_media_root)
+
+    def test_full_range_and_conditional(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.payload)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.payload)}')
+        self.assertEqual(b''.join(response.streaming_content), self.payload[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.payload[-10:])
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.payload)}-').status_code, 416)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A stale If-Range turns the Range request into a full response
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_json_variant_still_works(self):
+        response = self.client.post('/api/file/download/', {'subject': 'PRODUCT_MEDIA', 'product_id': 'farmer1-P-01', 'seq': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['media_type'], 'vid')
+        self.assertEqual(self.client.get('/api/file/stream/?subject=PRODUCT_MEDIA&product_id=nope').status_code, 404)
+
+    def test_id_verification_stream_needs_owner_token(self):
+        url = '/api/file/stream/?subject=USER_ID_VERIFICATION_MEDIA&seq=1'
+        token = Tokens.create_token(Users.objects.get(user_id='farmer1')).token
+        self.assertEqual(self.client.get(url, HTTP_USER_ID='farmer1').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_USER_ID='farmer1', HTTP_TOKEN=token).status_code, 404)
+        self.assertEqual(self.client.get(url + '&user_id=someone', HTTP_USER_ID='farmer1', HTTP_TOKEN=token).status_code, 403)
@@ -0,0 +1,142 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+
+from backend.models import Users, UsersProfile, Product
+from backend.service_frontend import product_feed
+
+
+class ProductFeedSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        farmer_profile = UsersProfile.objects.create(
+            profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='1',
+        )
+        consumer_profile = UsersProfile.objects.create(
+            profile_id='CC-00000001', f_name='Con', l_name='Sumer', user_type='Consumer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='2',
+        )
+        self.farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=farmer_profile)
+        self.consumer = Users.objects.create(user_id='consumer1', password='x', profile_id=consumer_profile)
+
+        for i in range(12):
+            Product.objects.create(
+                p_id=f'farmer1-P-{i:02d}', user_id=self.farmer, name=f'Product {i}',
+                product_type='vegetable', quantity_available=Decimal('10'),
+                cost_per_unit=Decimal(10 + i), media_url=[], keywords=[],
+            )
+
+    def _feed(self, **body):
+        return self.client.post(
+            '/api/product/feed/', body,
+            content_type='application/json', HTTP_USER_ID='consumer1',
+        )
+
+    def test_feed_is_ranked_once_per_session(self):
+        with mock.patch.object(
+            product_feed, '_build_ranked_feed', wraps=product_feed._build_ranked_feed
+        ) as build:
+            seen = []
+            for serial_no in range(1, 11):
+                response = self._feed(page=1, serial_no=serial_no)
+                self.assertEqual(response.status_code, 200)
+                seen.append(response.json()['product']['id'])
+            response = self._feed(page=2, serial_no=2)
+            self.assertEqual(response.status_code, 200)
+            seen.append(response.json()['product']['id'])
+
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(len(set(seen)), 11)
+        self.assertFalse(response.json()['has_more'])
+
+    def test_refresh_and_out_of_range(self):
+        self._feed(page=1, serial_no=1)
+        with mock.patch.object(
+            product_feed, '_build_ranked_feed', wraps=product_feed._build_ranked_feed
+        ) as build:
+            self.assertEqual(self._feed(page=1, serial_no=2).status_code, 200)
+            self.assertEqual(self._feed(page=1, serial_no=3, refresh=True).status_code, 200)
+            self.assertEqual(self._feed(page=3, serial_no=1).status_code, 404)
+
+        self.assertEqual(build.call_count, 1)
+
+    def test_page_mode_walks_feed_with_cursor(self):
+        response = self.client.post(
+            '/api/product/feed/page/', {}, content_type='application/json', HTTP_USER_ID='consumer1',
+        )
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual(len(first['products']), product_feed.PAGE_SIZE)
+        self.assertTrue(first['has_more'])
+
+        response = self.client.post(
+            '/api/product/feed/page/', {'cursor': first['next_cursor']},
+            content_type='application/json', HTTP_USER_ID='consumer1',
+        )
+        second = response.json()
+        self.assertEqual(second['page'], 2)
+        self.assertEqual(len(second['products']), 2)
+        self.assertIsNone(second['next_cursor'])
+
+        ids = [p['id'] for p in first['products'] + second['products']]
+        self.assertEqual(len(set(ids)), 12)
+
+        response = self.client.post(
+            '/api/product/feed/page/', {'cursor': first['next_cursor']},
+            content_type='application/json', HTTP_USER_ID='farmer1',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_session_hits_skip_products_that_no_longer_qualify(self):
+        ranked = [self._feed(page=1, serial_no=1).json()['product']['id']]
+        ranked_ids = cache.get(product_feed._feed_session_key('consumer1', 'all', ''))['ids']
+        Product.objects.filter(p_id=ranked_ids[1]).update(quantity_available=0)
+        Product.objects.filter(p_id=ranked_ids[2]).update(product_status='Disable')
+
+        with mock.patch.object(product_feed, '_build_ranked_feed') as build:
+            for serial_no in range(2, 11):
+                ranked.append(self._feed(page=1, serial_no=serial_no).json()['product']['id'])
+            self.assertEqual(self._feed(page=2, serial_no=1).status_code, 404)
+        build.assert_not_called()
+        self.assertEqual(ranked, [ranked_ids[0]] + ranked_ids[3:])
+
+    def test_session_hits_do_not_rewrite_the_session(self):
+        self._feed(page=1, serial_no=1)
+        with mock.patch.object(product_feed.cache, 'set') as cache_set:
+            for serial_no in range(2, 6):
+                self.assertEqual(self._feed(page=1, serial_no=serial_no).status_code, 200)
+        cache_set.assert_not_called()
+
+        key = product_feed._feed_session_key('consumer1', 'all', '')
+        ranked_ids = cache.get(key)['ids']
+        Product.objects.filter(p_id=ranked_ids[6]).update(quantity_available=0)
+        self._feed(page=1, serial_no=7)
+        self.assertNotIn(ranked_ids[6], cache.get(key)['ids'])
+
+    def test_page_mode_skips_products_that_no_longer_qualify(self):
+        first = self.client.post(
+            '/api/product/feed/page/', {}, content_type='application/json', HTTP_USER_ID='consumer1',
+        ).json()
+        ranked_ids = cache.get(product_feed._feed_session_key('consumer1', 'all', ''))['ids']
+        Product.objects.filter(p_id=ranked_ids[-1]).update(quantity_available=0)
+
+        second = self.client.post(
+            '/api/product/feed/page/', {'cursor': first['next_cursor']},
+            content_type='application/json', HTTP_USER_ID='consumer1',
+        ).json()
+        self.assertEqual([p['id'] for p in second['products']], ranked_ids[10:11])
+        self.assertFalse(second['has_more'])
+
+    def test_page_cursor_expires_with_the_session(self):
+        cursor = product_feed._encode_feed_cursor('consumer1', 'all', '', 10)
+        self.assertEqual(product_feed._decode_feed_cursor(cursor, 'consumer1')['o'], 10)
+
+        later = time.time() + product_feed.FEED_SESSION_TTL + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertIsNone(product_feed._decode_feed_cursor(cursor, 'consumer1'))
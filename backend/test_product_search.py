@@ -0,0 +1,77 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from backend.models import Users, UsersProfile, Product
+from backend.service_frontend import product_feed
+from backend.utils.product_search import prefix_tsquery, keyword_search_text, use_postgres_search
+
+
+class ProductSearchHelpersTest(SimpleTestCase):
+    def test_prefix_tsquery_strips_operators(self):
+        self.assertEqual(prefix_tsquery('Fresh  TOMA'), "'fresh':* & 'toma':*")
+        self.assertEqual(prefix_tsquery("rice' | !(x:*)"), "'rice':* & 'x':*")
+        self.assertIsNone(prefix_tsquery(' & | '))
+
+    def test_keyword_text_uses_farm_product_names(self):
+        names = {3: ('tomato', 'गोलभेडा')}
+        self.assertEqual(keyword_search_text([3, 'cherry', 99], names), 'tomato गोलभेडा cherry')
+        self.assertEqual(keyword_search_text(None, names), '')
+
+
+class ProductSearchFallbackTest(TestCase):
+    """Off PostgreSQL search keeps the plain icontains tiers"""
+
+    def setUp(self):
+        profile = UsersProfile.objects.create(
+            profile_id='FF-00000009', f_name='Farm', l_name='Er', user_type='Farmer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='1',
+        )
+        self.farmer = Users.objects.create(user_id='farmer9', password='x', profile_id=profile)
+        self.profile = profile
+        for p_id, name, product_type, description in [
+            ('farmer9-P-1', 'Red Tomato', 'vegetable', ''),
+            ('farmer9-P-2', 'Potato', 'vegetable', 'goes well with tomato'),
+            ('farmer9-P-3', 'Mustard Oil', 'oil', 'tomato free'),
+        ]:
+            Product.objects.create(
+                p_id=p_id, user_id=self.farmer, name=name, product_type=product_type,
+                description=description, quantity_available=Decimal('5'), cost_per_unit=Decimal('10'),
+                media_url=[], keywords=[],
+            )
+
+    def _search(self, term):
+        return [
+            p.p_id for p in product_feed._search_products(
+                term, self.profile, product_feed._active_products_qs(), None, {}, {}, set(),
+            )
+        ]
+
+    def test_tiers_unchanged_on_sqlite(self):
+        self.assertFalse(use_postgres_search())
+        with mock.patch.object(product_feed, 'fulltext_q') as fulltext:
+            # description-only hits stay out, no typo tolerance
+            self.assertEqual(self._search('tomato'), ['farmer9-P-1'])
+            self.assertEqual(self._search('red tomato'), ['farmer9-P-1'])
+            self.assertEqual(self._search('tomatoe'), [])
+        fulltext.assert_not_called()
+        self.assertIsNone(Product.objects.get(p_id='farmer9-P-1').search_vector)
+
+
+class KeywordOverlapLookupTest(TestCase):
+    def test_overlaps_matches_any_integer_id(self):
+        profile = UsersProfile.objects.create(profile_id='FF-00000010', f_name='F', l_name='E', user_type='Farmer')
+        farmer = Users.objects.create(user_id='farmer10', password='x', profile_id=profile)
+        for p_id, keywords in [('k1', [1, 5]), ('k2', [7]), ('k3', ['5', 'rice']), ('k4', None), ('k5', [])]:
+            Product.objects.create(
+                p_id=p_id, user_id=farmer, name=p_id, cost_per_unit=Decimal('1'), keywords=keywords,
+            )
+
+        def matches(ids):
+            return sorted(Product.objects.filter(keywords__overlaps=ids).values_list('p_id', flat=True))
+
+        self.assertEqual(matches([5, 7]), ['k1', 'k2'])
+        self.assertEqual(matches([5]), ['k1'])       # string '5' is not the id 5
+        self.assertEqual(matches([99]), [])
+        self.assertEqual(matches([]), [])
@@ -0,0 +1,215 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend.models import Users, UsersProfile, Product, ProductStats
+from backend.service_frontend import product_feed
+from backend.utils import product_snapshot
+
+
+# user_id, province, district, municipal, ward
+FARMERS = [
+    ('farmerS1', 'Bagmati', 'Kathmandu', 'Kathmandu', '2'),
+    ('farmerS2', 'Bagmati', 'Lalitpur', 'Lalitpur', '1'),
+    ('farmerS3', 'Koshi', 'Jhapa', 'Mechinagar', '3'),
+]
+
+# suffix, farmer, product_type, keywords, days to expiry, (rating_count, avg_score), delivered
+PRODUCTS = [
+    ('a', 'farmerS1', 'vegetable', [1, 1], None, (2, '4.15'), 3),
+    ('b', 'farmerS1', 'grain', [2, 3], 40, (0, '0'), 0),
+    ('c', 'farmerS2', 'vegetable', [3, 'tomato'], 60, (1, '3.00'), 150),
+    ('d', 'farmerS2', 'fruit', [], None, (0, '0'), 12),
+    ('e', 'farmerS3', 'grain', [2], None, (4, '4.75'), 1),
+    ('f', 'farmerS3', 'vegetable', [1, 2], 30, (0, '0'), 7),
+    ('g', 'farmerS3', None, None, None, (0, '0'), 0),
+    ('h', 'farmerS3', None, None, None, (0, '0'), 0),        # ties with g on score
+    ('i', 'farmerS1', 'fruit', [1], 3, (1, '5.00'), 0),      # near expiry, local  -> slot [1]
+    ('j', 'farmerS3', 'vegetable', [1], 5, (3, '5.00'), 90),  # near expiry, far    -> dropped
+]
+
+
+def rank_per_product(products, user_profile, category_scores, product_scores, connection_farmer_ids):
+    """
+    Reference feed ranking, one _compute_score call per product: local
+    near-expiry products go to slot [1], far ones are dropped, the rest is
+    sorted by score. Returns (ranked_products, ratings_map, sold_map).
+    """
+    today = timezone.now().date()
+    ratings_map, sold_map = product_feed._batch_fetch_stats([p.p_id for p in products])
+
+    regular, near_expiry_local = [], []
+    for product in products:
+        tier = product_feed._location_tier(product.user_id.profile_id, user_profile)
+        if product.expiry_Date and (product.expiry_Date - today).days <= product_feed.EXPIRY_NEAR_DAYS:
+            if tier >= 2:
+                near_expiry_local.append(product)
+            continue
+        regular.append((product, product_feed._compute_score(
+            product, user_profile, category_scores, product_scores, ratings_map, sold_map,
+            connection_bonus=product.user_id.user_id in connection_farmer_ids,
+        )))
+
+    regular.sort(key=lambda x: x[1], reverse=True)
+    ranked = [p for p, _ in regular]
+    return ranked[:1] + near_expiry_local + ranked[1:], ratings_map, sold_map
+
+
+def rank_on_snapshot(products, user_profile, category_scores, product_scores, connection_farmer_ids, limit=None):
+    """product_feed._rank_ids over loaded products, in the shape of rank_per_product"""
+    ranked_ids, ratings_map, sold_map = product_feed._rank_ids(
+        [p.p_id for p in products], user_profile,
+        category_scores, product_scores, connection_farmer_ids, limit,
+    )
+    by_id = {p.p_id: p for p in products}
+    return [by_id[p_id] for p_id in ranked_ids], ratings_map, sold_map
+
+
+class ProductSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_snapshot._reset()
+        today = timezone.now().date()
+        self.consumer_profile = UsersProfile.objects.create(
+            profile_id='CC-00000011', f_name='Con', l_name='Sumer', user_type='Consumer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='2',
+        )
+        Users.objects.create(user_id='consumer11', password='x', profile_id=self.consumer_profile)
+
+        farmers = {}
+        for i, (user_id, province, district, municipal, ward) in enumerate(FARMERS):
+            profile = UsersProfile.objects.create(
+                profile_id=f'FF-0000011{i}', f_name='Farm', l_name=user_id, user_type='Farmer',
+                province=province, district=district, municipal=municipal, ward=ward,
+            )
+            farmers[user_id] = Users.objects.create(user_id=user_id, password='x', profile_id=profile)
+        self.farmers = farmers
+
+        for suffix, farmer, product_type, keywords, days, (rating_count, avg), delivered in PRODUCTS:
+            product = Product.objects.create(
+                p_id=f'{farmer}-P-{suffix}', user_id=farmers[farmer], name=f'Product {suffix}',
+                product_type=product_type, quantity_available=Decimal('5'), cost_per_unit=Decimal('10'),
+                media_url=[], keywords=keywords,
+                expiry_Date=today + timedelta(days=days) if days is not None else None,
+            )
+            ProductStats.objects.create(
+                product=product, rating_count=rating_count, avg_score=Decimal(avg), delivered_count=delivered,
+            )
+
+        self.category_scores = {'vegetable': 35, 'fruit': 5, 'meat': 9}
+        self.product_scores = {1: 40, 2: 15, 3: 0, 99: 4}
+        self.connections = {'farmerS3'}
+
+    def _products(self):
+        return list(product_feed._active_products_qs('consumer11'))
+
+    def _rank(self, rank, **kwargs):
+        ranked, ratings_map, sold_map = rank(
+            self._products(), self.consumer_profile,
+            self.category_scores, self.product_scores, self.connections, **kwargs,
+        )
+        return [p.p_id for p in ranked], ratings_map, sold_map
+
+    def test_matches_per_product_ranking(self):
+        ranked, ratings_map, sold_map = self._rank(rank_on_snapshot)
+        expected, expected_ratings, expected_sold = self._rank(rank_per_product)
+        self.assertEqual(ranked, expected)
+        # The reference also returns stats of the products it dropped
+        self.assertEqual(ratings_map, {k: v for k, v in expected_ratings.items() if k in ranked})
+        self.assertEqual(sold_map, {k: v for k, v in expected_sold.items() if k in ranked})
+        self.assertEqual(ranked[1], 'farmerS1-P-i')
+        self.assertNotIn('farmerS3-P-j', ranked)
+
+        for limit in (1, 3, 6):
+            with self.subTest(limit=limit):
+                top, _, _ = self._rank(rank_on_snapshot, limit=limit)
+                self.assertEqual(top, ranked[:1] + ['farmerS1-P-i'] + [p for p in ranked[2:]][:limit - 1])
+
+    def test_top_k_is_stable_sort_prefix(self):
+        rng = np.random.default_rng(7)
+        scores = rng.integers(0, 20, size=500).astype(float)
+        full = np.argsort(-scores, kind='stable')
+        for limit in (0, 1, 37, 499, 500, 900):
+            with self.subTest(limit=limit):
+                np.testing.assert_array_equal(product_feed._top_k(scores, limit), full[:limit])
+
+    def test_changes_are_applied_incrementally(self):
+        self._rank(rank_on_snapshot)
+        stats = ProductStats.objects.get(product_id='farmerS2-P-d')
+        stats.delivered_count = 400
+        stats.save()
+
+        with self.assertNumQueries(2):   # candidates + the one changed row
+            ranked, _, sold_map = self._rank(rank_on_snapshot)
+        self.assertEqual(sold_map['farmerS2-P-d'], 400)
+        self.assertEqual(ranked, self._rank(rank_per_product)[0])
+
+        profile = self.farmers['farmerS2'].profile_id
+        profile.district, profile.municipal, profile.ward = 'Kathmandu', 'Kathmandu', '2'
+        profile.save(update_fields=['district', 'municipal', 'ward'])
+        moved = self._rank(rank_on_snapshot)[0]
+        self.assertEqual(moved, self._rank(rank_per_product)[0])
+        self.assertLess(moved.index('farmerS2-P-d'), ranked.index('farmerS2-P-d'))
+
+    def test_other_processes_replay_the_change_log(self):
+        with product_snapshot.product_snapshot() as snapshot:
+            self.assertEqual(len(snapshot), len(PRODUCTS))
+
+        # Written by another process: no signal here, only its log entry
+        ProductStats.objects.filter(product_id='farmerS1-P-b').update(delivered_count=33)
+        product_snapshot._publish({('product', 'farmerS1-P-b')})
+        with self.assertNumQueries(1), product_snapshot.product_snapshot() as replayed:
+            self.assertIs(replayed, snapshot)
+            self.assertEqual(replayed.sold[replayed.row_of['farmerS1-P-b']], 33)
+
+        # A log entry that fell out of the cache forces a rebuild
+        product_snapshot._publish({('product', 'farmerS1-P-b')})
+        cache.delete(product_snapshot.CHANGE_CACHE_KEY.format(cache.get(product_snapshot.SEQ_CACHE_KEY)))
+        with product_snapshot.product_snapshot() as rebuilt:
+            self.assertIsNot(rebuilt, snapshot)
+            self.assertEqual(len(rebuilt), len(PRODUCTS))
+
+    def test_search_expiry_gate_keeps_order(self):
+        products = {p.p_id: p for p in self._products()}
+        order = ['farmerS3-P-f', 'farmerS3-P-j', 'farmerS2-P-c', 'farmerS1-P-i', 'farmerS1-P-a']
+        for mode in ('sql', 'python'):
+            with self.subTest(mode=mode), mock.patch.object(product_feed, 'FEED_RANKING_MODE', mode):
+                ranked, ratings_map, sold_map = product_feed._apply_search_expiry_gate(
+                    [products[p_id] for p_id in order], self.consumer_profile, self.connections,
+                )
+                self.assertEqual(
+                    [p.p_id for p in ranked], ['farmerS3-P-f', 'farmerS1-P-i', 'farmerS2-P-c', 'farmerS1-P-a'],
+                )
+                self.assertEqual(ratings_map, {'farmerS2-P-c': 3.0, 'farmerS1-P-i': 5.0, 'farmerS1-P-a': 4.15})
+                self.assertEqual(sold_map, {'farmerS3-P-f': 7, 'farmerS2-P-c': 150, 'farmerS1-P-a': 3})
+                # The sql gate never builds a snapshot (it may be stale on other workers)
+                self.assertEqual(product_snapshot._snapshot is not None, mode == 'python')
+
+    def test_python_mode_loads_only_the_top_k(self):
+        qs = product_feed._active_products_qs('consumer11')
+        expected = [p.p_id for p in product_feed._rank_in_db(
+            qs, self.consumer_profile, self.category_scores, self.product_scores, self.connections,
+        )[0]]
+        with mock.patch.object(product_feed, 'FEED_RANKING_MODE', 'python'), \
+                mock.patch.object(product_feed, 'FEED_TOP_K', 3):
+            ranked, _, _ = product_feed._rank_queryset(
+                qs, self.consumer_profile, self.category_scores, self.product_scores, self.connections,
+            )
+        self.assertEqual([p.p_id for p in ranked], expected[:4])
+
+    def test_python_mode_needs_a_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(FEED_RANKING_MODE='sql', CACHES=locmem):
+            self.assertEqual(product_snapshot.check_snapshot_cache(), [])
+        with override_settings(FEED_RANKING_MODE='python', CACHES=shared):
+            self.assertEqual(product_snapshot.check_snapshot_cache(), [])
+        with override_settings(FEED_RANKING_MODE='python', CACHES=locmem, DEBUG=False):
+            self.assertEqual([e.id for e in product_snapshot.check_snapshot_cache()], ['backend.E001'])
+        with override_settings(FEED_RANKING_MODE='python', CACHES=locmem, DEBUG=True):
+            self.assertEqual([e.id for e in product_snapshot.check_snapshot_cache()], ['backend.W001'])
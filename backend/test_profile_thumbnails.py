@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from backend.models import UsersProfile
+from backend.utils.profile_thumbnails import (
+    generate_profile_thumbnails, get_profile_thumbnail, thumbnail_relative_path,
+)
+
+
+class ProfileThumbnailTest(TestCase):
+    def setUp(self):
+        self.temp_media_root = tempfile.mkdtemp()
+        media_root = override_settings(MEDIA_ROOT=self.temp_media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.profile_url = 'Uploaded_Files/thumbuser/profile/profile-pic-test.jpg'
+        path = os.path.join(settings.MEDIA_ROOT, self.profile_url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cv2.imwrite(path, np.full((400, 200, 3), 128, dtype=np.uint8))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_media_root)
+
+    def test_generate_then_read_prebuilt(self):
+        self.assertEqual(generate_profile_thumbnails(self.profile_url), 2)
+        thumb = cv2.imread(os.path.join(settings.MEDIA_ROOT, thumbnail_relative_path(self.profile_url, 100)))
+        self.assertEqual(thumb.shape[:2], (100, 50))
+
+        profile = UsersProfile(profile_id='CC-1', profile_url=self.profile_url)
+        with open(os.path.join(settings.MEDIA_ROOT, thumbnail_relative_path(self.profile_url, 100)), 'rb') as f:
+            self.assertEqual(get_profile_thumbnail(profile), f.read())
+
+    def test_default_avatar_is_cached(self):
+        profile = UsersProfile(profile_id='CC-2', user_type='Farmer')
+        first = get_profile_thumbnail(profile)
+        self.assertTrue(first.startswith(b'\xff\xd8'))
+        self.assertIs(get_profile_thumbnail(profile), first)
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from backend.models import Users, UsersProfile, Product, ProductStats, FarmProducts
+from backend.service_frontend import product_feed
+from backend.utils import farm_product_terms
+
+
+FARM_PRODUCTS = [
+    (1, 'rice', 'चामल', 'grain'),
+    (2, 'wheat', 'गहुँ', 'grain'),
+    (3, 'tomato', 'गोलभेडा', 'vegetable'),
+    (4, 'basmati', 'बासमती', 'grain'),
+]
+
+# suffix, name, product_type, keywords, delivered orders (→ composite score)
+PRODUCTS = [
+    ('a', 'Basmati Rice', 'grain', [4], 5),
+    ('b', 'Brown Rice', 'grain', [1], 9),
+    ('c', 'Wheat Flour', 'grain', [2], 1),
+    ('d', 'Red Tomato', 'vegetable', [3], 7),
+    ('e', 'Rice Straw Mat', 'misc', [1], 3),
+    ('f', 'Organic Mix', 'vegetable', [1, 3], 2),
+    ('g', 'Red Lentil', 'legume', [], 4),
+]
+
+
+class SearchExecutorTest(TestCase):
+    def setUp(self):
+        profile = UsersProfile.objects.create(
+            profile_id='FF-00000007', f_name='Farm', l_name='Er', user_type='Farmer',
+            province='Bagmati', district='Kathmandu', municipal='Kathmandu', ward='1',
+        )
+        self.profile = profile
+        farmer = Users.objects.create(user_id='farmer7', password='x', profile_id=profile)
+        for fp_id, primary, secondary, category in FARM_PRODUCTS:
+            FarmProducts.objects.create(id=fp_id, primary_name=primary, secondary_name=secondary, category=category)
+        farm_product_terms._bump_version()
+
+        for suffix, name, product_type, keywords, delivered in PRODUCTS:
+            product = Product.objects.create(
+                p_id=f'farmer7-P-{suffix}', user_id=farmer, name=name, product_type=product_type,
+                quantity_available=Decimal('5'), cost_per_unit=Decimal('10'), media_url=[], keywords=keywords,
+            )
+            ProductStats.objects.create(product=product, delivered_count=delivered)
+
+    def _run(self, search, term):
+        return [p.p_id for p in search(term, self.profile, product_feed._active_products_qs(), None, {}, {}, set())]
+
+    def test_orderings(self):
+        for term, expected in [
+            ('rice', 'baec'),
+            ('basmati rice', 'abce'),
+            ('rice tomato wheat', 'bacedf'),
+            ('red basmati rice rice', 'abcedg'),
+            ('RED', 'dg'),
+            ('farmer7-P-b', 'b'),
+            ('P-', 'abcdefg'),
+            ('grain', 'bac'),
+            ('चामल', 'bac'),
+            ('mango', ''),
+            ('mango rice', 'baec'),
+        ]:
+            with self.subTest(term=term):
+                self.assertEqual(
+                    self._run(product_feed._search_products, term),
+                    [f'farmer7-P-{suffix}' for suffix in expected],
+                )
+
+    def test_phrase_and_tiers(self):
+        self.assertEqual(
+            self._run(product_feed._search_products, 'basmati rice'),
+            # phrase match, then grain products in tier order, then misc by name
+            ['farmer7-P-a', 'farmer7-P-b', 'farmer7-P-c', 'farmer7-P-e'],
+        )
+
+    def test_query_count_does_not_grow_with_words(self):
+        farm_product_terms.get_farm_product_terms()
+        with self.assertNumQueries(2):
+            self._run(product_feed._search_products, 'rice tomato wheat basmati')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._run(product_feed._search_products, '   '), [])
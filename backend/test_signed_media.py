@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from backend.models import Users, UsersProfile, Product, Tokens
+from backend.utils import signed_media
+
+
+class SignedMediaTest(TestCase):
+    def setUp(self):
+        self.temp_media_root = tempfile.mkdtemp()
+        media_root = override_settings(MEDIA_ROOT=self.temp_media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=profile)
+        rel_path = 'Uploaded_Files/farmer1/product/signed test.jpg'
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'Uploaded_Files/farmer1/product'), exist_ok=True)
+        self.payload = b'\xff\xd8' + os.urandom(2000)
+        with open(os.path.join(settings.MEDIA_ROOT, rel_path), 'wb') as f:
+            f.write(self.payload)
+        Product.objects.create(
+            p_id='farmer1-P-01', user_id=farmer, name='Tomato',
+            quantity_available=Decimal('5'), cost_per_unit=Decimal('50'),
+            media_url=[{'serial_no': 1, 'media_url': rel_path, 'media_type': 'img'}],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_media_root)
+
+    def _mint(self):
+        response = self.client.post(
+            '/api/file/signed-url/', {'subject': 'PRODUCT_MEDIA', 'product_id': 'farmer1-P-01', 'seq': 1},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_signed_url_is_served_and_checked(self):
+        minted = self._mint()
+        self.assertTrue(minted['url'].startswith('/api/file/signed/m/Uploaded_Files/farmer1/product/signed%20test.jpg?'))
+        self.assertEqual(minted['mime_type'], 'image/jpeg')
+
+        response = self.client.get(minted['url'])
+        self.assertEqual(b''.join(response.streaming_content), self.payload)
+
+        self.assertEqual(self.client.get(minted['url'].replace('sig=', 'sig=0')).status_code, 403)
+        self.assertEqual(self.client.get(minted['url'].replace('signed%20test', 'other')).status_code, 403)
+        with mock.patch.object(signed_media.time, 'time', return_value=minted['expires_at'] + 1):
+            self.assertEqual(self.client.get(minted['url']).status_code, 403)
+
+    @mock.patch.object(signed_media, 'MEDIA_SENDFILE_BACKEND', 'nginx')
+    def test_proxy_offload_headers(self):
+        response = self.client.get(self._mint()['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/m/Uploaded_Files/farmer1/product/signed%20test.jpg')
+        self.assertEqual(response.content, b'')
+
+        with mock.patch.object(signed_media, 'MEDIA_SENDFILE_BACKEND', 'apache'):
+            response = self.client.get(self._mint()['url'])
+        self.assertEqual(response['X-Sendfile'], os.path.realpath(
+            os.path.join(settings.MEDIA_ROOT, 'Uploaded_Files/farmer1/product/signed test.jpg')))
+
+    def test_id_verification_urls_need_owner_token(self):
+        admin_profile = UsersProfile.objects.create(profile_id='AA-00000001', f_name='Ad', l_name='Min', user_type='Admin')
+        Users.objects.create(user_id='admin1', password='x', profile_id=admin_profile, is_admin=True)
+        other_profile = UsersProfile.objects.create(profile_id='CC-00000001', f_name='Con', l_name='Sumer')
+        Users.objects.create(user_id='consumer1', password='x', profile_id=other_profile)
+
+        def mint(requester, token=None, **body):
+            headers = {'HTTP_USER_ID': requester}
+            if token:
+                headers['HTTP_TOKEN'] = token
+            return self.client.post('/api/file/signed-url/', {'subject': 'USER_ID_VERIFICATION_MEDIA', **body},
+                                    content_type='application/json', **headers).status_code
+
+        owner_token = Tokens.create_token(Users.objects.get(user_id='farmer1')).token
+        self.assertEqual(mint('farmer1'), 401)
+        self.assertEqual(mint('farmer1', 'forged'), 401)
+        self.assertEqual(mint('farmer1', owner_token), 404)   # allowed; nothing submitted
+        consumer_token = Tokens.create_token(Users.objects.get(user_id='consumer1')).token
+        self.assertEqual(mint('consumer1', consumer_token, user_id='farmer1'), 403)
+        admin_token = Tokens.create_token(Users.objects.get(user_id='admin1')).token
+        self.assertEqual(mint('admin1', admin_token, user_id='farmer1'), 404)
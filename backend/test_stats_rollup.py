@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from backend.models import Users, UsersProfile, Product, ProductRating, ProductStats, OrderRequest, Rating, UserReputation
+from backend.utils.product_stats import rebuild_product_stats
+from backend.utils.user_reputation import rebuild_user_reputation
+
+
+class ProductStatsRollupTest(TestCase):
+    def setUp(self):
+        farmer_profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        consumer_profile = UsersProfile.objects.create(profile_id='CC-00000001', f_name='Con', l_name='Sumer')
+        self.farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=farmer_profile)
+        self.consumer = Users.objects.create(user_id='consumer1', password='x', profile_id=consumer_profile)
+        self.product = Product.objects.create(
+            p_id='farmer1-P-01', user_id=self.farmer, name='Tomato',
+            quantity_available=Decimal('5'), cost_per_unit=Decimal('50'),
+        )
+
+    def _rate(self, score):
+        return ProductRating.objects.create(
+            p_id=self.product, consumer_id=self.consumer, score=Decimal(score),
+            comment='', created_at=timezone.now(),
+        )
+
+    def _order(self, order_id, total):
+        return OrderRequest.objects.create(
+            order_id=order_id, product=self.product, consumer_id=self.consumer,
+            total_cost=Decimal(total), payment_method='CashOnDelivery',
+        )
+
+    def test_signals_keep_stats_in_sync(self):
+        first = self._rate('4.0')
+        self._rate('2.0')
+        first.score = Decimal('5.0')
+        first.save()
+
+        order = self._order('O-1', '100')
+        self._order('O-2', '50')
+        order.order_status = 'DELIVERED'
+        order.save()
+
+        stats = ProductStats.objects.get(product=self.product)
+        self.assertEqual(stats.rating_count, 2)
+        self.assertEqual(stats.avg_score, Decimal('3.50'))
+        self.assertEqual(stats.delivered_count, 1)
+        self.assertEqual(stats.total_sales, Decimal('150'))
+
+        first.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.rating_count, stats.avg_score), (1, Decimal('2.00')))
+
+    def test_rebuild_matches_incremental(self):
+        self._rate('3.0')
+        order = self._order('O-1', '80')
+        order.order_status = 'DELIVERED'
+        order.save()
+        incremental = ProductStats.objects.values().get(product=self.product)
+
+        ProductStats.objects.all().delete()
+        self.assertEqual(rebuild_product_stats(), 1)
+        rebuilt = ProductStats.objects.values().get(product=self.product)
+
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(incremental, rebuilt)
+
+
+class UserReputationRollupTest(TestCase):
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            profile = UsersProfile.objects.create(profile_id=f'UU-0000000{i}', f_name='U', l_name=str(i))
+            self.users.append(Users.objects.create(user_id=f'user{i}', password='x', profile_id=profile))
+
+    def _rate(self, by, to, score, rated_for):
+        return Rating.objects.create(
+            rated_by=by, rated_to=to, score=Decimal(score), rated_for=rated_for,
+            comment='', created_at=timezone.now(),
+        )
+
+    def test_create_edit_delete_and_rebuild(self):
+        farmer, consumer_a, consumer_b = self.users
+        first = self._rate(consumer_a, farmer, '5.0', 'Farmer')
+        self._rate(consumer_b, farmer, '3.0', 'Farmer')
+        self._rate(consumer_b, farmer, '2.0', 'Consumer')
+        first.score = Decimal('4.0')
+        first.save()
+
+        reputation = UserReputation.objects.get(user=farmer)
+        self.assertEqual(reputation.count_for(), 3)
+        self.assertEqual(reputation.average_for(), Decimal('3.00'))
+        self.assertEqual(reputation.average_for('Farmer'), Decimal('3.50'))
+        self.assertEqual(reputation.count_for('Consumer'), 1)
+        self.assertEqual(reputation.histogram, {'1': 0, '2': 1, '3': 1, '4': 1, '5': 0})
+
+        first.delete()
+        incremental = UserReputation.objects.values().get(user=farmer)
+        UserReputation.objects.all().delete()
+        rebuild_user_reputation()
+        rebuilt = UserReputation.objects.values().get(user=farmer)
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(incremental, rebuilt)
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from backend.models import TranscodeJob, Users, UsersProfile, Product
+from backend.utils import transcoder
+from backend.utils.transcoder import submit_transcode, plan_renditions, TranscodeQueueFull
+
+
+def _write_clip(path, frames=12, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+
+class TranscodeQueueTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'raw.avi')
+        self.dest = os.path.join(self.dir, 'out.mp4')
+        _write_clip(self.src)
+
+    @mock.patch.object(transcoder, 'TRANSCODE_EXECUTOR', 'inline')
+    def test_inline_job_runs_to_done(self):
+        job = submit_transcode('farmer1', self.src, self.dest, self.src, product_id='farmer1-P-01')
+        self.assertEqual((job.status, job.progress), ('DONE', 100))
+        self.assertTrue(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.src))
+
+        response = self.client.get(f'/api/file/transcode-job/{job.pk}/', HTTP_USER_ID='farmer1')
+        self.assertEqual(response.json()['status'], 'DONE')
+        self.assertEqual(self.client.get(f'/api/file/transcode-job/{job.pk}/', HTTP_USER_ID='other').status_code, 404)
+
+    @mock.patch.object(transcoder, 'TRANSCODE_EXECUTOR', 'inline')
+    def test_failure_is_recorded(self):
+        job = submit_transcode('farmer1', os.path.join(self.dir, 'missing.mp4'), self.dest)
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn('Cannot open', job.error)
+
+    @mock.patch.object(transcoder, 'TRANSCODE_EXECUTOR', 'external')
+    @mock.patch.object(transcoder, 'TRANSCODE_MAX_PENDING', 2)
+    def test_backpressure(self):
+        submit_transcode('farmer1', self.src, self.dest)
+        submit_transcode('farmer1', self.src, self.dest)
+        with self.assertRaises(TranscodeQueueFull):
+            submit_transcode('farmer1', self.src, self.dest)
+        self.assertEqual(TranscodeJob.objects.filter(status='QUEUED').count(), 2)
+
+
+class RenditionLadderTest(TestCase):
+    def setUp(self):
+        self.temp_media_root = tempfile.mkdtemp()
+        media_root = override_settings(MEDIA_ROOT=self.temp_media_root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_media_root)
+
+    def test_plan_never_upscales(self):
+        self.assertEqual(
+            plan_renditions(1920, 1080),
+            [('360p', 640, 360), ('480p', 852, 480), ('720p', 1280, 720)],
+        )
+        self.assertEqual(plan_renditions(720, 1280)[-1], ('720p', 720, 1280))
+        self.assertEqual(plan_renditions(64, 48), [('360p', 64, 48)])
+
+    @mock.patch.object(transcoder, 'TRANSCODE_EXECUTOR', 'inline')
+    @mock.patch.object(transcoder, 'TRANSCODE_SEGMENT_SECONDS', 1)
+    def test_ladder_is_attached_to_product_media(self):
+        profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=profile)
+        folder = os.path.join(settings.MEDIA_ROOT, 'Uploaded_Files', 'farmer1', 'product')
+        os.makedirs(folder, exist_ok=True)
+        src = os.path.join(folder, 'farmer1-P-01-vid-1-raw.avi')
+        dest = os.path.join(folder, 'farmer1-P-01-vid-1-x.mp4')
+        _write_clip(src, frames=15, size=(854, 480))
+        Product.objects.create(
+            p_id='farmer1-P-01', user_id=farmer, name='Tomato',
+            quantity_available=Decimal('5'), cost_per_unit=Decimal('50'),
+            media_url=[{'serial_no': 1, 'media_url': '/Uploaded_Files/farmer1/product/farmer1-P-01-vid-1-x.mp4', 'media_type': 'vid'}],
+        )
+
+        job = submit_transcode('farmer1', src, dest, src, product_id='farmer1-P-01')
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual([r['label'] for r in job.outputs['renditions']], ['360p', '480p'])
+        self.assertEqual(job.outputs['renditions'][0]['segments'], 2)
+
+        entry = Product.objects.get(p_id='farmer1-P-01').media_url[0]
+        self.assertEqual(entry['playlist_url'], '/Uploaded_Files/farmer1/product/farmer1-P-01-vid-1-x/master.m3u8')
+        self.assertTrue(os.path.exists(settings.MEDIA_ROOT + '/' + entry['poster_url']))
+
+        master = self.client.get('/api/file/video/farmer1-P-01/1/master.m3u8')
+        self.assertEqual(master['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertIn(b'RESOLUTION=640x360', b''.join(master.streaming_content))
+        variant = b''.join(self.client.get('/api/file/video/farmer1-P-01/1/360p/index.m3u8').streaming_content)
+        self.assertIn(b'seg-001.mp4', variant)
+        self.assertEqual(self.client.get('/api/file/video/farmer1-P-01/1/../../x.mp4').status_code, 400)
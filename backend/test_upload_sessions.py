@@ -0,0 +1,160 @@
+import os
+import base64
+import hashlib
+from decimal import Decimal
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from backend.models import Users, UsersProfile, Product
+from backend.utils import upload_sessions
+from backend.utils.upload_sessions import (
+    ChunkBitmap, FileSessionStore, CacheSessionStore, DatabaseSessionStore, session_dir,
+)
+
+
+class ChunkedUploadSessionTest(TestCase):
+    headers = {'HTTP_USER_ID': 'farmer1'}
+
+    def _init(self):
+        response = self.client.post('/api/file/upload/', {
+            'action': 'init', 'file_name': 'clip.mp4', 'file_size': 30 * 1024 * 1024,
+            'subject': 'PRODUCT_MEDIA', 'total_chunks': 3,
+        }, **self.headers)
+        return response.json()['upload_id']
+
+    def _chunk(self, upload_id, index, user='farmer1'):
+        return self.client.post('/api/file/upload/', {
+            'action': 'chunk', 'upload_id': upload_id, 'chunk_index': index,
+            'file': SimpleUploadedFile('blob', b'x' * 10),
+        }, HTTP_USER_ID=user)
+
+    def _flow(self, store):
+        with mock.patch.object(upload_sessions, '_store', store):
+            upload_id = self._init()
+            self.assertEqual(self._chunk(upload_id, 2).status_code, 200)
+            self.assertEqual(self._chunk(upload_id, 0).status_code, 200)
+            self.assertEqual(self._chunk(upload_id, 1, user='intruder').status_code, 403)
+            self.assertEqual(self._chunk(upload_id, 7).status_code, 400)
+
+            response = self.client.post('/api/file/upload/', {'action': 'finish', 'upload_id': upload_id}, **self.headers)
+            self.assertEqual(response.json()['missing'], [1])
+
+            self.client.post('/api/file/upload/', {'action': 'abort', 'upload_id': upload_id}, **self.headers)
+            self.assertIsNone(store.get(upload_id))
+            self.assertFalse(os.path.exists(session_dir(upload_id)))
+
+    def test_file_backend(self):
+        self._flow(FileSessionStore())
+
+    def test_cache_backend(self):
+        self._flow(CacheSessionStore())
+
+    def test_db_backend(self):
+        self._flow(DatabaseSessionStore())
+
+    def test_bitmap(self):
+        bitmap = ChunkBitmap(10)
+        for i in (0, 3, 9):
+            bitmap.add(i)
+        self.assertEqual(len(bitmap), 3)
+        self.assertEqual(ChunkBitmap(10, bitmap.bits).missing(), [1, 2, 4, 5, 6, 7, 8])
+
+
+class InPlaceChunkWriteTest(TestCase):
+    headers = {'HTTP_USER_ID': 'farmer1'}
+
+    def _post(self, **data):
+        return self.client.post('/api/file/upload/', data, **self.headers)
+
+    def test_out_of_order_chunks_land_at_their_offsets(self):
+        payload = os.urandom(25 * 1024 * 1024 + 10)
+        chunk_size = 10 * 1024 * 1024
+        upload_id = self._post(
+            action='init', file_name='clip.mp4', file_size=len(payload), subject='PRODUCT_MEDIA',
+            total_chunks=3, chunk_size=chunk_size,
+        ).json()['upload_id']
+
+        for index in (2, 0, 1):
+            piece = payload[index * chunk_size:(index + 1) * chunk_size]
+            response = self._post(action='chunk', upload_id=upload_id, chunk_index=index,
+                                  file=SimpleUploadedFile('blob', piece))
+            self.assertEqual(response.status_code, 200)
+
+        bad = self._post(action='chunk', upload_id=upload_id, chunk_index=1, file=SimpleUploadedFile('blob', b'short'))
+        self.assertEqual(bad.status_code, 400)
+
+        with open(os.path.join(session_dir(upload_id), 'upload.part'), 'rb') as f:
+            self.assertEqual(f.read(), payload)
+        self._post(action='abort', upload_id=upload_id)
+
+    def test_declared_size_is_checked_before_reserving_space(self):
+        for name, size in (('a.jpg', 0), ('a.jpg', 'big'), ('a.pdf', 11 * 1024 * 1024), ('clip.mp4', 201 * 1024 * 1024)):
+            with self.subTest(name=name, size=size):
+                self.assertEqual(self._post(action='init', file_name=name, file_size=size,
+                                            subject='PRODUCT_MEDIA').status_code, 400)
+
+        clip = {'file_name': 'clip.mp4', 'file_size': 30 * 1024 * 1024, 'subject': 'PRODUCT_MEDIA'}
+        for bad in ({'total_chunks': 'three'}, {'total_chunks': 0}, {'total_chunks': 31},
+                    {'total_chunks': 3, 'chunk_size': '10MB'}):
+            with self.subTest(**bad):
+                self.assertEqual(self._post(action='init', **clip, **bad).status_code, 400)
+
+        upload_id = self._post(action='init', file_name='a.jpg', file_size=40 * 1024 * 1024,
+                               subject='PRODUCT_MEDIA').json()['upload_id']
+        self.assertEqual(os.path.getsize(os.path.join(session_dir(upload_id), 'upload.part')), 0)
+        self._post(action='abort', upload_id=upload_id)
+
+    def test_single_chunk_image_is_handed_to_file_manager(self):
+        profile = UsersProfile.objects.create(profile_id='FF-00000001', f_name='Farm', l_name='Er', user_type='Farmer')
+        farmer = Users.objects.create(user_id='farmer1', password='x', profile_id=profile)
+        Product.objects.create(p_id='farmer1-P-01', user_id=farmer, name='Tomato',
+                               quantity_available=Decimal('5'), cost_per_unit=Decimal('50'))
+        _, jpeg = cv2.imencode('.jpg', np.zeros((64, 64, 3), dtype=np.uint8))
+
+        upload_id = self._post(action='init', file_name='a.jpg', file_size=1, subject='PRODUCT_MEDIA',
+                               product_id='farmer1-P-01').json()['upload_id']
+        self._post(action='chunk', upload_id=upload_id, chunk_index=0, file=SimpleUploadedFile('a.jpg', jpeg.tobytes()))
+        response = self._post(action='finish', upload_id=upload_id)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(os.path.exists(session_dir(upload_id)))
+        stored = Product.objects.get(p_id='farmer1-P-01').media_url[0]['media_url']
+        self.assertTrue(stored.endswith('.jpg'))
+
+
+class ResumableUploadTest(TestCase):
+    headers = {'HTTP_USER_ID': 'farmer1'}
+
+    def _post(self, **data):
+        return self.client.post('/api/file/upload/', data, **self.headers)
+
+    def test_status_and_checksums(self):
+        chunks = [b'a' * 100, b'b' * 100, b'c' * 50]
+        upload_id = self._post(
+            action='init', file_name='clip.mp4', file_size=30 * 1024 * 1024, subject='PRODUCT_MEDIA',
+            total_chunks=3, file_checksum='sha256:' + hashlib.sha256(b'something else').hexdigest(),
+        ).json()['upload_id']
+
+        good = hashlib.sha256(chunks[1]).hexdigest()
+        self.assertEqual(self._post(action='chunk', upload_id=upload_id, chunk_index=1, checksum=good,
+                                    file=SimpleUploadedFile('blob', chunks[1])).status_code, 200)
+        bad = self._post(action='chunk', upload_id=upload_id, chunk_index=0, checksum=good,
+                         file=SimpleUploadedFile('blob', chunks[0]))
+        self.assertEqual(bad.status_code, 400)
+
+        status = self._post(action='status', upload_id=upload_id).json()
+        self.assertEqual((status['received_count'], status['missing']), (1, [0, 2]))
+        self.assertEqual(ChunkBitmap(3, base64.b64decode(status['received_bitmap'])).missing(), [0, 2])
+
+        for index in (0, 2):
+            self._post(action='chunk', upload_id=upload_id, chunk_index=index, file=SimpleUploadedFile('blob', chunks[index]))
+        self.assertTrue(self._post(action='status', upload_id=upload_id).json()['complete'])
+
+        finish = self._post(action='finish', upload_id=upload_id)
+        self.assertEqual(finish.status_code, 400)
+        self.assertIn('checksum', finish.json()['error'])
+        self.assertEqual(self._post(action='status', upload_id=upload_id).status_code, 404)
@@ -0,0 +1,189 @@
+"""
+Cached token authentication.
+
+resolve_auth(token, user_id) turns the (token, user-id) header pair into an
+AuthContext (user + profile + token state) with ONE joined query on the
+unique Tokens.token_digest index, and keeps
+the result in a bounded, per-process TTL LRU so the following requests of
+the same client skip the database entirely.
+
+Entries are dropped on logout / token status changes / user status changes
+(see backend.signals) and never outlive AUTH_CACHE_TTL or the token expiry.
+The cache is per process: another worker may serve a revoked token for at
+most AUTH_CACHE_TTL seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from backend.models import Tokens, Users
+
+
+AUTH_CACHE_TTL         = getattr(settings, 'AUTH_CACHE_TTL', 30)            # seconds
+AUTH_CACHE_MAX_ENTRIES = getattr(settings, 'AUTH_CACHE_MAX_ENTRIES', 4096)
+
+
+class AuthContext:
+    """Authenticated (user, profile, token) triple attached to request.auth_context"""
+    __slots__ = ('user', 'profile', 'token_id', 'token_status', 'expires_at')
+
+    def __init__(self, user, token):
+        self.user = user
+        self.profile = user.profile_id
+        self.token_id = token.pk
+        self.token_status = token.token_status
+        self.expires_at = token.expires_at
+
+    @property
+    def user_id(self):
+        return self.user.user_id
+
+    @property
+    def user_type(self):
+        return self.profile.user_type
+
+    def is_valid(self):
+        return (
+            self.token_status == 'ACTIVE'
+            and self.user.profile_status == 'ACTIVATED'
+            and timezone.now() < self.expires_at
+        )
+
+
+class _TTLLRUCache:
+    """Small thread-safe LRU where every entry also carries its own deadline"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # key -> (deadline, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            deadline, value = item
+            if deadline <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate):
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _TTLLRUCache(AUTH_CACHE_MAX_ENTRIES)
+
+
+def _cache_key(token_digest, user_id):
+    return (token_digest, user_id)
+
+
+def resolve_auth(token_value, user_id):
+    """
+    Return the AuthContext for a (token, user-id) pair, or None when the
+    token is unknown, not ACTIVE, expired, or the user is not ACTIVATED.
+    Pure read: an expired token is NOT deactivated here.
+    """
+    if not token_value or not user_id:
+        return None
+
+    token_digest = Tokens.hash_token(token_value)
+    key = _cache_key(token_digest, user_id)
+    ctx = _cache.get(key)
+    if ctx is not None:
+        return ctx if ctx.is_valid() else None
+
+    token = (
+        Tokens.objects
+        .select_related('user_id__profile_id')
+        .filter(token_digest=token_digest, user_id__user_id=user_id)
+        .first()
+    )
+    if token is None:
+        return None
+
+    ctx = AuthContext(token.user_id, token)
+    if not ctx.is_valid():
+        return None
+
+    remaining = (ctx.expires_at - timezone.now()).total_seconds()
+    _cache.set(key, ctx, min(AUTH_CACHE_TTL, remaining))
+    return ctx
+
+
+def get_request_user(request):
+    """
+    The ACTIVATED Users row (with profile) named by the user-id header.
+    Reuses request.auth_context when HasValidTokenForUser already ran and
+    otherwise runs at most one query per request.
+    """
+    user_id = request.headers.get('user-id')
+    if not user_id:
+        return None
+
+    ctx = getattr(request, 'auth_context', None)
+    if ctx is not None and ctx.user_id == user_id:
+        return ctx.user
+
+    cached = getattr(request, '_request_user', None)
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+
+    user = (
+        Users.objects
+        .select_related('profile_id')
+        .filter(user_id=user_id, profile_status='ACTIVATED')
+        .first()
+    )
+    request._request_user = (user_id, user)
+    return user
+
+
+##########################################################################################
+#                            Invalidation
+##########################################################################################
+
+def invalidate_token(token_digest, user_id):
+    """Drop one cached token (logout, status change)"""
+    _cache.pop(_cache_key(token_digest, user_id))
+
+
+def invalidate_user(user_id):
+    """Drop every cached token of a user (logout-all, user status change)"""
+    return _cache.pop_where(lambda key, ctx: ctx.user_id == user_id)
+
+
+def invalidate_profile(profile_id):
+    """Drop every cached token whose user has this profile (user_type change)"""
+    return _cache.pop_where(lambda key, ctx: ctx.profile.pk == profile_id)
+
+
+def clear_auth_cache():
+    _cache.clear()
@@ -0,0 +1,153 @@
+"""
+Token / OTP expiry sweeper.
+
+Read paths (permission checks, login, OTP verification) only *compute*
+expiry; this module is what persists it. sweep() flips overdue ACTIVE rows
+to EXPIRED with one UPDATE per batch and deletes (optionally archiving
+first) dead rows older than the retention window.
+
+Run it from cron through `manage.py sweep_expired`, or set
+EXPIRY_SWEEPER_ENABLED = True to run it in a daemon thread of the server
+process every EXPIRY_SWEEP_INTERVAL seconds.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from backend.models import Tokens, OTP
+
+
+EXPIRY_SWEEP_BATCH_SIZE = getattr(settings, 'EXPIRY_SWEEP_BATCH_SIZE', 1000)
+EXPIRY_SWEEP_INTERVAL   = getattr(settings, 'EXPIRY_SWEEP_INTERVAL', 300)       # seconds
+TOKEN_RETENTION_DAYS    = getattr(settings, 'TOKEN_RETENTION_DAYS', 30)         # after expiry
+OTP_RETENTION_DAYS      = getattr(settings, 'OTP_RETENTION_DAYS', 7)            # after expiry
+
+TOKEN_DEAD_STATUSES = ('INACTIVE', 'EXPIRED')
+OTP_DEAD_STATUSES   = ('USED', 'EXPIRED')
+
+
+def _expire_in_batches(queryset, status_field, batch_size):
+    """Set status_field='EXPIRED' on every row of queryset, one UPDATE per batch"""
+    total = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return total
+        # Re-apply the filter so a row that changed since the SELECT is left alone
+        total += queryset.filter(pk__in=pks).update(**{status_field: 'EXPIRED'})
+        if len(pks) < batch_size:
+            return total
+
+
+def _delete_in_batches(queryset, batch_size, archive=None):
+    """Delete every row of queryset in batches, writing each row to archive (JSON lines) first"""
+    total = 0
+    model = queryset.model
+    pk_name = model._meta.pk.attname
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('pk').values()[:batch_size])
+            if not rows:
+                return total
+            if archive is not None:
+                for row in rows:
+                    archive.write(json.dumps({'model': model.__name__, **row}, cls=DjangoJSONEncoder) + '\n')
+            deleted, _ = model.objects.filter(pk__in=[row[pk_name] for row in rows]).delete()
+            total += deleted
+        if len(rows) < batch_size:
+            return total
+
+
+def expire_tokens(now=None, batch_size=EXPIRY_SWEEP_BATCH_SIZE):
+    now = now or timezone.now()
+    return _expire_in_batches(
+        Tokens.objects.filter(token_status='ACTIVE', expires_at__lte=now),
+        'token_status', batch_size,
+    )
+
+
+def expire_otps(now=None, batch_size=EXPIRY_SWEEP_BATCH_SIZE):
+    now = now or timezone.now()
+    return _expire_in_batches(
+        OTP.objects.filter(otp_status='ACTIVE', expires_at__lte=now),
+        'otp_status', batch_size,
+    )
+
+
+def purge_tokens(now=None, batch_size=EXPIRY_SWEEP_BATCH_SIZE, archive=None):
+    now = now or timezone.now()
+    cutoff = now - timezone.timedelta(days=TOKEN_RETENTION_DAYS)
+    return _delete_in_batches(
+        Tokens.objects.filter(token_status__in=TOKEN_DEAD_STATUSES, expires_at__lte=cutoff),
+        batch_size, archive,
+    )
+
+
+def purge_otps(now=None, batch_size=EXPIRY_SWEEP_BATCH_SIZE, archive=None):
+    now = now or timezone.now()
+    cutoff = now - timezone.timedelta(days=OTP_RETENTION_DAYS)
+    return _delete_in_batches(
+        OTP.objects.filter(otp_status__in=OTP_DEAD_STATUSES, expires_at__lte=cutoff),
+        batch_size, archive,
+    )
+
+
+def sweep(batch_size=EXPIRY_SWEEP_BATCH_SIZE, purge=True, archive=None):
+    """
+    Expire overdue tokens and OTPs and, when purge is set, delete dead rows
+    past their retention window.
+
+    archive – optional writable text file; purged rows are written to it as
+              JSON lines before they are deleted.
+    Returns a dict of counts per action.
+    """
+    now = timezone.now()
+    counts = {
+        'tokens_expired': expire_tokens(now, batch_size),
+        'otps_expired': expire_otps(now, batch_size),
+        'tokens_purged': 0,
+        'otps_purged': 0,
+    }
+    if purge:
+        counts['tokens_purged'] = purge_tokens(now, batch_size, archive)
+        counts['otps_purged'] = purge_otps(now, batch_size, archive)
+    return counts
+
+
+##########################################################################################
+#                            In-process scheduler
+##########################################################################################
+
+_scheduler_lock = threading.Lock()
+_scheduler_thread = None
+
+
+def _run_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            close_old_connections()
+            counts = sweep()
+            if any(counts.values()):
+                print(f"Expiry sweep: {counts}")
+        except Exception as e:
+            print(f"Expiry sweep failed: {e}")
+        finally:
+            close_old_connections()
+
+
+def start_expiry_sweeper(interval=EXPIRY_SWEEP_INTERVAL):
+    """Start the sweeper daemon thread once per process; returns the thread"""
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(
+                target=_run_forever, args=(interval,), name='expiry-sweeper', daemon=True,
+            )
+            _scheduler_thread.start()
+        return _scheduler_thread
@@ -0,0 +1,171 @@
+"""
+In-process dictionary of FarmProducts terms.
+
+The FarmProducts table is small, read-mostly and bilingual (English
+primary_name / Nepali secondary_name), yet search resolved every word
+against it with SQL. get_farm_product_terms() keeps one immutable snapshot
+per process and answers from memory:
+
+    lookup(term)            ids whose English / Nepali name contains term
+    lookup(term, 'prefix')  ids whose name starts with term (bisect)
+    resolve(term)           (matched ids, their categories, every id in those
+                             categories) — what product search needs per word
+
+Writes (product creation adding keywords, the internal bulk update) call
+invalidate_farm_product_terms(), which bumps a version number in the Django
+cache; each process rebuilds its snapshot when the version it holds is
+stale, and at the latest after FARM_PRODUCT_TERMS_TTL seconds (covers
+per-process cache backends and writes made outside the app).
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.models import FarmProducts
+
+
+FARM_PRODUCT_TERMS_TTL = getattr(settings, 'FARM_PRODUCT_TERMS_TTL', 5 * 60)   # seconds a snapshot may live
+
+VERSION_CACHE_KEY = 'farm_product_terms:version'
+_SEPARATOR = '\x00'
+
+
+class FarmProductTerms:
+    """Immutable snapshot of the FarmProducts table built for term lookups"""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.category_of = {}
+        self.names = {}                 # id -> (primary_name, secondary_name)
+        self.ids_by_category = {}
+
+        names = []                      # (casefolded name, id)
+        for fp_id, primary, secondary, category in rows:
+            self.category_of[fp_id] = category
+            self.names[fp_id] = (primary, secondary)
+            if category:
+                self.ids_by_category.setdefault(category, []).append(fp_id)
+            for name in {primary, secondary}:
+                if name:
+                    names.append((name.casefold(), fp_id))
+        names.sort()
+
+        # Sorted names for prefix search; one separator-joined haystack
+        # (with each name's start offset) for substring search.
+        self._sorted_names = names
+        self._offsets = []
+        parts, offset = [], 0
+        for name, _ in names:
+            self._offsets.append(offset)
+            parts.append(name)
+            offset += len(name) + 1
+        self._haystack = _SEPARATOR.join(parts)
+
+        for ids in self.ids_by_category.values():
+            ids.sort()
+
+    def __len__(self):
+        return len(self.category_of)
+
+    def lookup(self, term, mode='contains'):
+        """Sorted ids of FarmProducts whose English or Nepali name contains / starts with term"""
+        term = (term or '').strip().casefold()
+        if not term or _SEPARATOR in term:
+            return []
+
+        found = set()
+        if mode == 'prefix':
+            i = bisect.bisect_left(self._sorted_names, (term,))
+            while i < len(self._sorted_names) and self._sorted_names[i][0].startswith(term):
+                found.add(self._sorted_names[i][1])
+                i += 1
+        else:
+            pos = self._haystack.find(term)
+            while pos != -1:
+                i = bisect.bisect_right(self._offsets, pos) - 1
+                found.add(self._sorted_names[i][1])
+                # Skip to the next name: one hit per name is enough
+                next_start = self._offsets[i + 1] if i + 1 < len(self._offsets) else len(self._haystack)
+                pos = self._haystack.find(term, next_start)
+        return sorted(found)
+
+    def categories_matching(self, term):
+        """Category slugs containing term"""
+        term = (term or '').strip().casefold()
+        if not term:
+            return []
+        return sorted(c for c in self.ids_by_category if term in c.casefold())
+
+    def resolve(self, term):
+        """
+        (matched_fp_ids, related_categories, all_fp_ids) for a search term:
+        FarmProducts whose name or category contains the term, the categories
+        of those, and every FarmProduct in those categories.
+        """
+        matched = set(self.lookup(term))
+        for category in self.categories_matching(term):
+            matched.update(self.ids_by_category[category])
+        return self.fan_out(matched)
+
+    def fan_out(self, fp_ids):
+        """(fp_ids, their categories, every id in those categories), ids unknown to the snapshot dropped"""
+        matched_fp_ids = sorted(i for i in set(fp_ids) if i in self.category_of)
+        related_categories = sorted({self.category_of[i] for i in matched_fp_ids if self.category_of[i]})
+        all_ids = set(matched_fp_ids)
+        for category in related_categories:
+            all_ids.update(self.ids_by_category[category])
+        return matched_fp_ids, related_categories, sorted(all_ids)
+
+    def in_category(self, category_term=None):
+        """Sorted ids of FarmProducts whose category contains category_term (all of them when None)"""
+        if category_term is None:
+            return sorted(self.category_of)
+        ids = set()
+        for category in self.categories_matching(category_term):
+            ids.update(self.ids_by_category[category])
+        return sorted(ids)
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _load(version):
+    rows = FarmProducts.objects.values_list('id', 'primary_name', 'secondary_name', 'category')
+    return FarmProductTerms(list(rows), version)
+
+
+def get_farm_product_terms():
+    """Current snapshot, rebuilt when the shared version moved or the TTL ran out"""
+    global _snapshot
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    snapshot = _snapshot
+    if (snapshot is not None and snapshot.version == version
+            and time.monotonic() - snapshot.loaded_at < FARM_PRODUCT_TERMS_TTL):
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if (snapshot is None or snapshot.version != version
+                or time.monotonic() - snapshot.loaded_at >= FARM_PRODUCT_TERMS_TTL):
+            snapshot = _snapshot = _load(version)
+        return snapshot
+
+
+def _bump_version():
+    global _snapshot
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+    _snapshot = None
+
+
+def invalidate_farm_product_terms():
+    """Call after writing FarmProducts: every process reloads on its next lookup (after commit)"""
+    transaction.on_commit(_bump_version)
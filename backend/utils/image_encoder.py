@@ -0,0 +1,121 @@
+"""
+Target-size image encoder.
+
+encode_to_target() replaces the 10-pass binary search over JPEG quality on
+the full-resolution photo:
+
+    1. inputs larger than IMAGE_MAX_DIMENSION on their long side are
+       downscaled first (INTER_AREA), which alone removes most of the cost;
+    2. one probe encode at IMAGE_PROBE_QUALITY; if it already fits the
+       budget it is kept;
+    3. otherwise the quality that should hit the budget is predicted from
+       the probe, assuming log(size) falls linearly with quality
+       (IMAGE_QUALITY_SLOPE per point), and encoded;
+    4. if that misses the window, a third and last encode uses the quality
+       interpolated between the two measured points.
+
+At most IMAGE_MAX_ENCODES (3) encodes per image. The result is the largest
+encode within budget, or the smallest one when none fits.
+"""
+import math
+
+import cv2
+from django.conf import settings
+
+
+IMAGE_MAX_DIMENSION    = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)    # px, long side
+IMAGE_TARGET_KB        = getattr(settings, 'IMAGE_TARGET_KB', 800)         # size budget per stored image
+IMAGE_TARGET_TOLERANCE = 0.15          # anything in [85%, 100%] of the budget is accepted
+IMAGE_PROBE_QUALITY    = 85
+IMAGE_QUALITY_MIN      = 10
+IMAGE_QUALITY_MAX      = 95
+IMAGE_QUALITY_SLOPE    = 0.035         # d ln(size) / d quality, typical for photos
+IMAGE_MAX_ENCODES      = 3
+
+FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def downscale(img, max_dimension=IMAGE_MAX_DIMENSION):
+    """Fit img inside max_dimension on its long side; never upscales"""
+    h, w = img.shape[:2]
+    if not max_dimension or max(h, w) <= max_dimension:
+        return img
+    scale = max_dimension / max(h, w)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def encode(img, quality, fmt='jpeg'):
+    ext, flag = FORMATS[fmt]
+    ok, buf = cv2.imencode(ext, img, [flag, int(quality)])
+    if not ok:
+        raise ValueError(f'Cannot encode image as {fmt}')
+    return buf.tobytes()
+
+
+def _clamp(quality):
+    return int(min(IMAGE_QUALITY_MAX, max(IMAGE_QUALITY_MIN, round(quality))))
+
+
+def _predict(target, points):
+    """
+    Quality expected to produce `target` bytes: from the assumed slope with
+    one measured (quality, size) point, interpolated in log space with two.
+    """
+    (q1, s1) = points[-1]
+    slope = IMAGE_QUALITY_SLOPE
+    if len(points) > 1:
+        (q0, s0) = points[-2]
+        if q0 != q1 and s0 != s1 and s0 > 0 and s1 > 0:
+            slope = max(1e-3, (math.log(s1) - math.log(s0)) / (q1 - q0))
+    return _clamp(q1 + (math.log(target) - math.log(s1)) / slope)
+
+
+def encode_to_target(img, target_bytes=IMAGE_TARGET_KB * 1024, fmt='jpeg', max_dimension=IMAGE_MAX_DIMENSION):
+    """
+    Encode img (BGR ndarray) as `fmt` in at most IMAGE_MAX_ENCODES passes,
+    aiming for [1 - IMAGE_TARGET_TOLERANCE, 1] x target_bytes.
+
+    Returns a dict: data (bytes), format, quality, width, height, encodes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format {fmt!r}, use one of {sorted(FORMATS)}')
+
+    img = downscale(img, max_dimension)
+    low_ok = target_bytes * (1 - IMAGE_TARGET_TOLERANCE)
+    aim = (low_ok + target_bytes) / 2       # predictions aim mid-window, away from the hard limit
+
+    tried = {}          # quality -> bytes
+    quality = IMAGE_PROBE_QUALITY
+    while len(tried) < IMAGE_MAX_ENCODES and quality not in tried:
+        data = encode(img, quality, fmt)
+        tried[quality] = data
+
+        if len(data) <= target_bytes and (len(tried) == 1 or len(data) >= low_ok or quality >= IMAGE_QUALITY_MAX):
+            break       # in the window, or the probe already fits (small / simple image)
+        if len(data) > target_bytes and quality <= IMAGE_QUALITY_MIN:
+            break       # can't go lower
+
+        # Anchor on the measurement closest to the target, slope from the other one
+        points = sorted(((q, len(d)) for q, d in tried.items()),
+                        key=lambda p: abs(math.log(p[1] / aim)), reverse=True)
+        quality = _predict(aim, points[-2:])
+
+    fitting = [(q, d) for q, d in tried.items() if len(d) <= target_bytes]
+    if fitting:
+        quality, data = max(fitting, key=lambda item: len(item[1]))
+    else:
+        quality, data = min(tried.items(), key=lambda item: len(item[1]))
+
+    h, w = img.shape[:2]
+    return {
+        'data'   : data,
+        'format' : fmt,
+        'quality': quality,
+        'width'  : w,
+        'height' : h,
+        'encodes': len(tried),
+    }
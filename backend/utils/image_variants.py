@@ -0,0 +1,98 @@
+"""
+Responsive variants of product images.
+
+FileManager._save_product_image decodes the upload once and, besides the
+stored image, writes one variant per PRODUCT_IMAGE_VARIANTS entry:
+
+    Uploaded_Files/<user_id>/product/variants/<image-stem>-<small|medium|large>.<jpg|webp>
+
+Each variant is fitted inside its max dimension and encoded to its own size
+budget (backend.utils.image_encoder). The Product.media_url entry records
+them under 'variants'; the feed and product endpoints then hand out the
+variant matching the requested image_size, and the download endpoints
+accept `variant` to send it instead of the full image.
+"""
+import os
+
+from django.conf import settings
+
+from backend.utils.image_encoder import encode_to_target, downscale, FORMATS
+
+
+# name -> (max dimension in px, size budget in KB), smallest first
+PRODUCT_IMAGE_VARIANTS = dict(getattr(settings, 'PRODUCT_IMAGE_VARIANTS', {
+    'small' : (320, 30),
+    'medium': (720, 90),
+    'large' : (1280, 250),
+}))
+
+DEFAULT_IMAGE_SIZE = 'small'
+
+
+def variant_path(image_path, name, fmt='jpeg'):
+    """Where a variant of an image lives; works on MEDIA_ROOT-relative and absolute paths alike"""
+    folder, file_name = os.path.split(image_path)
+    stem = os.path.splitext(file_name)[0]
+    return os.path.join(folder, 'variants', f'{stem}-{name}{FORMATS[fmt][0]}')
+
+
+def generate_image_variants(img, image_path, fmt='jpeg'):
+    """
+    Write every variant of the decoded image `img` stored at image_path.
+    Returns {name: variant file path}. Each variant is downscaled from the
+    previous (larger) one, so the full-size image is only resized once.
+    """
+    written = {}
+    source = img
+    for name, (max_dimension, budget_kb) in sorted(PRODUCT_IMAGE_VARIANTS.items(), key=lambda item: -item[1][0]):
+        source = downscale(source, max_dimension)
+        result = encode_to_target(source, budget_kb * 1024, fmt, max_dimension)
+
+        dest = variant_path(image_path, name, fmt)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f'{dest}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(result['data'])
+        os.replace(tmp, dest)
+        written[name] = dest
+    return written
+
+
+def delete_image_variants(image_path):
+    """Remove every variant of an image that is being deleted"""
+    for name in PRODUCT_IMAGE_VARIANTS:
+        for fmt in FORMATS:
+            try:
+                os.remove(variant_path(image_path, name, fmt))
+            except OSError:
+                pass
+
+
+def normalize_image_size(value, default=DEFAULT_IMAGE_SIZE):
+    """The requested image_size if it is a known variant (or 'original'), else default"""
+    value = str(value or '').lower().strip()
+    if value in PRODUCT_IMAGE_VARIANTS or value == 'original':
+        return value
+    return default
+
+
+def media_entry_url(entry, size=DEFAULT_IMAGE_SIZE):
+    """
+    URL of a Product.media_url entry for the requested size: the image
+    variant (nearest larger one when missing), the poster of a converted
+    video, else the entry's own media_url.
+    """
+    if not isinstance(entry, dict):
+        return entry or ''
+
+    if entry.get('media_type') == 'vid':
+        return entry.get('poster_url') or entry.get('media_url', '')
+
+    variants = entry.get('variants') or {}
+    if size != 'original' and variants:
+        names = sorted(PRODUCT_IMAGE_VARIANTS, key=lambda n: PRODUCT_IMAGE_VARIANTS[n][0])
+        start = names.index(size) if size in names else 0
+        for name in names[start:]:
+            if variants.get(name):
+                return variants[name]
+    return entry.get('media_url', '')
@@ -0,0 +1,311 @@
+"""
+Normalized location hierarchy and DB-side location tier.
+
+The Location table (province -> district -> municipality) is loaded from
+backend/static/json/provinces_with_districts_and_municipalities.json by
+migration 0097 / `manage.py load_locations`. UsersProfile keeps its free
+text province / district / municipal / ward and, resolved from them on
+every save (backend.signals), the integer columns
+
+    province_loc, district_loc, municipal_loc   FKs to Location
+    ward_no                                     ward number
+
+Resolution is forgiving: names are compared on a normalized key ("Province
+No. 1" / "Koshi" -> "1", "Aathrai Triveni Rural Municipality" ->
+"aathraitriveni"), the district decides the province, and near misses
+("Kathmandoo") are accepted above LOCATION_MATCH_CUTOFF.
+
+location_tier(a, b) and annotate_location_tier(qs, profile) compute the same
+0-4 proximity tier, in Python and in SQL:
+
+    4 = same ward + municipal
+    3 = same municipal
+    2 = same district
+    1 = same province
+    0 = nationwide
+
+Both compare the resolved ids and fall back to a case-insensitive text
+comparison for profiles whose location could not be resolved.
+"""
+import re
+import json
+import difflib
+import threading
+
+from django.conf import settings
+from django.db.models import Q, Case, When, Value, IntegerField
+
+
+LOCATIONS_JSON = settings.BASE_DIR / 'backend' / 'static' / 'json' / 'provinces_with_districts_and_municipalities.json'
+LOCATION_MATCH_CUTOFF = getattr(settings, 'LOCATION_MATCH_CUTOFF', 0.85)   # difflib ratio for near-miss names
+
+# Words that only describe the kind of unit ("Rural Municipality", "District", ...)
+_NOISE_WORDS = {
+    'province', 'pradesh', 'no', 'district', 'jilla', 'municipality', 'municipal', 'rural',
+    'metropolitan', 'sub', 'submetropolitan', 'city', 'gaunpalika', 'nagarpalika',
+    'mahanagarpalika', 'upamahanagarpalika', 'rm', 'mun',
+}
+_PROVINCE_ALIASES = {
+    'koshi': '1', 'kosi': '1', 'one': '1',
+    '2': 'madhesh', '3': 'bagmati', '4': 'gandaki', '5': 'lumbini', '6': 'karnali', '7': 'sudurpashchim',
+}
+
+
+def location_key(name):
+    """Normalized matching key of a location name, '' for blank names"""
+    words = re.split(r'[^0-9a-zऀ-ॿ]+', str(name or '').lower())
+    return ''.join(w for w in words if w and w not in _NOISE_WORDS)
+
+
+def ward_number(ward):
+    """Integer ward of a free-text ward ('3', 'Ward No. 3'), else None"""
+    match = re.search(r'\d+', str(ward or ''))
+    return int(match.group()) if match and int(match.group()) < 1000 else None
+
+
+##########################################################################################
+#                            Loading
+##########################################################################################
+
+def _json_locations():
+    """Yield (province, district, kind, municipality) names from the bundled JSON"""
+    with open(LOCATIONS_JSON, encoding='utf-8') as f:
+        data = json.load(f)
+    for province, districts in data.items():
+        yield province, None, None, None
+        for district, kinds in districts.items():
+            yield province, district, None, None
+            for kind, municipalities in kinds.items():
+                for municipality in municipalities:
+                    yield province, district, kind, municipality
+
+
+def sync_locations():
+    """
+    Insert the Location rows missing from the table (idempotent).
+    Returns the number of rows created.
+    """
+    from backend.models import Location
+
+    existing = {
+        (level, parent_id, key): pk
+        for pk, level, parent_id, key in Location.objects.values_list('pk', 'level', 'parent_id', 'key')
+    }
+    created = 0
+
+    def ensure(level, name, parent_id, kind=None):
+        nonlocal created
+        ident = (level, parent_id, location_key(name))
+        if ident not in existing:
+            existing[ident] = Location.objects.create(
+                level=level, name=name, key=ident[2], kind=kind, parent_id=parent_id,
+            ).pk
+            created += 1
+        return existing[ident]
+
+    for province, district, kind, municipality in _json_locations():
+        province_id = ensure('province', province, None)
+        if district:
+            district_id = ensure('district', district, province_id)
+            if municipality:
+                ensure('municipal', municipality, district_id, kind)
+
+    invalidate_location_index()
+    return created
+
+
+##########################################################################################
+#                            Resolution
+##########################################################################################
+
+class LocationIndex:
+    """In-memory lookup tables over the Location rows"""
+
+    def __init__(self, rows):
+        self.provinces = {}         # key -> id
+        self.districts = {}         # key -> (id, province id)
+        self.municipals = {}        # district id -> {key: id}
+        self.parent_of = {}
+        for pk, level, key, parent_id, name in rows:
+            self.parent_of[pk] = parent_id
+            if level == 'province':
+                self.provinces[key] = pk
+            elif level == 'district':
+                self.districts[key] = (pk, parent_id)
+        for pk, level, key, parent_id, name in rows:
+            if level == 'municipal':
+                names = self.municipals.setdefault(parent_id, {})
+                names[key] = pk
+                # "Taplejung(Phungling)" also answers to "Taplejung" and "Phungling"
+                for part in re.split(r'[()]', name):
+                    names.setdefault(location_key(part), pk)
+                names.pop('', None)
+
+    @staticmethod
+    def _match(key, table):
+        if not key:
+            return None
+        if key in table:
+            return table[key]
+        close = difflib.get_close_matches(key, table.keys(), n=1, cutoff=LOCATION_MATCH_CUTOFF)
+        return table[close[0]] if close else None
+
+    def resolve(self, province, district, municipal):
+        """(province id, district id, municipality id) for free-text names; None where unknown"""
+        province_key = location_key(province)
+        province_key = _PROVINCE_ALIASES.get(province_key, province_key)
+        province_id = self._match(province_key, self.provinces)
+
+        district_id = None
+        found = self._match(location_key(district), self.districts)
+        if found:
+            district_id, province_id = found
+
+        municipal_id = None
+        municipal_key = location_key(municipal)
+        if district_id:
+            municipal_id = self._match(municipal_key, self.municipals.get(district_id, {}))
+        elif municipal_key:
+            # No usable district: accept a municipality name unique within the province / country
+            hits = [
+                names[municipal_key] for d_id, names in self.municipals.items()
+                if municipal_key in names and (province_id is None or self.parent_of.get(d_id) == province_id)
+            ]
+            if len(hits) == 1:
+                municipal_id = hits[0]
+                district_id = self.parent_of[municipal_id]
+                province_id = self.parent_of[district_id]
+        return province_id, district_id, municipal_id
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_location_index():
+    """Process-wide LocationIndex; the table only changes through sync_locations()"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from backend.models import Location
+            _index = LocationIndex(list(Location.objects.values_list('pk', 'level', 'key', 'parent_id', 'name')))
+        return _index
+
+
+def invalidate_location_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def assign_profile_location(profile, index=None):
+    """Set profile.province_loc / district_loc / municipal_loc / ward_no from its text fields"""
+    index = index or get_location_index()
+    profile.province_loc_id, profile.district_loc_id, profile.municipal_loc_id = index.resolve(
+        profile.province, profile.district, profile.municipal,
+    )
+    profile.ward_no = ward_number(profile.ward)
+
+
+def backfill_profile_locations(batch_size=1000):
+    """Resolve the location columns of every profile; returns the number of profiles resolved"""
+    from backend.models import UsersProfile, Location
+
+    index = LocationIndex(list(Location.objects.values_list('pk', 'level', 'key', 'parent_id', 'name')))
+    fields = ['province_loc', 'district_loc', 'municipal_loc', 'ward_no']
+    batch, resolved = [], 0
+    for profile in UsersProfile.objects.only('pk', 'province', 'district', 'municipal', 'ward').iterator(chunk_size=batch_size):
+        assign_profile_location(profile, index)
+        resolved += profile.municipal_loc_id is not None
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            UsersProfile.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        UsersProfile.objects.bulk_update(batch, fields)
+    return resolved
+
+
+##########################################################################################
+#                            Tier
+##########################################################################################
+
+def _text_equal(a, b):
+    return bool(a) and bool(b) and str(a).strip().lower() == str(b).strip().lower()
+
+
+def _same(profile, user_profile, level):
+    """Python twin of _same_q"""
+    if level == 'ward':
+        row_id, user_id = profile.ward_no, user_profile.ward_no
+        row_text, user_text = profile.ward, user_profile.ward
+    else:
+        row_id, user_id = getattr(profile, f'{level}_loc_id'), getattr(user_profile, f'{level}_loc_id')
+        row_text, user_text = getattr(profile, level), getattr(user_profile, level)
+    if user_id is not None:
+        return row_id == user_id or (row_id is None and _text_equal(row_text, user_text))
+    return _text_equal(row_text, user_text)
+
+
+def location_tier(profile, user_profile):
+    """0-4 proximity tier of profile as seen from user_profile"""
+    if _same(profile, user_profile, 'municipal'):
+        return 4 if _same(profile, user_profile, 'ward') else 3
+    if _same(profile, user_profile, 'district'):
+        return 2
+    if _same(profile, user_profile, 'province'):
+        return 1
+    return 0
+
+
+def _same_q(user_profile, level, prefix=''):
+    """
+    Condition 'the profile at prefix shares user_profile's <level>'; None
+    when user_profile has no value for it. Matches on the resolved id, or
+    on the text when the row (or the user) has no resolved id.
+    """
+    if level == 'ward':
+        id_field, text_field = f'{prefix}ward_no', f'{prefix}ward'
+        user_id, user_text = user_profile.ward_no, user_profile.ward
+    else:
+        id_field, text_field = f'{prefix}{level}_loc', f'{prefix}{level}'
+        user_id, user_text = getattr(user_profile, f'{level}_loc_id'), getattr(user_profile, level)
+    user_text = str(user_text or '').strip()
+
+    if user_id is not None:
+        q = Q(**{id_field: user_id})
+        if user_text:
+            q |= Q(**{f'{id_field}__isnull': True, f'{text_field}__iexact': user_text})
+        return q
+    if user_text:
+        return Q(**{f'{text_field}__iexact': user_text})
+    return None
+
+
+def same_location_q(user_profile, level, prefix=''):
+    """Filter for rows in the same province / district / municipal as user_profile (matches nothing when unknown)"""
+    q = _same_q(user_profile, level, prefix)
+    return q if q is not None else Q(pk__in=[])
+
+
+def location_tier_expression(user_profile, prefix=''):
+    """Case() expression of location_tier() for the profile reached through prefix (e.g. 'user_id__profile_id__')"""
+    whens = []
+    municipal = _same_q(user_profile, 'municipal', prefix)
+    if municipal is not None:
+        ward = _same_q(user_profile, 'ward', prefix)
+        if ward is not None:
+            whens.append(When(municipal & ward, then=Value(4)))
+        whens.append(When(municipal, then=Value(3)))
+    for level, tier in (('district', 2), ('province', 1)):
+        q = _same_q(user_profile, level, prefix)
+        if q is not None:
+            whens.append(When(q, then=Value(tier)))
+    if not whens:
+        return Value(0, output_field=IntegerField())
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+def annotate_location_tier(qs, user_profile, prefix='', name='location_tier'):
+    """qs annotated with the 0-4 location tier (as `name`) relative to user_profile"""
+    return qs.annotate(**{name: location_tier_expression(user_profile, prefix)})
@@ -0,0 +1,310 @@
+"""
+Shared, bounded executor for background media work.
+
+Every background media task (thumbnails, upload clean-up, video
+transcoding) goes through one MediaExecutor per server process instead of
+starting its own thread:
+
+    kind='thread'   MEDIA_EXECUTOR_THREADS threads — I/O-bound or short cv2 work
+                    (cv2 releases the GIL while encoding)
+    kind='process'  MEDIA_EXECUTOR_PROCESSES spawn()ed processes, Django set up
+                    once per process — long CPU-bound work (transcoding)
+
+Each pool accepts at most MEDIA_EXECUTOR_MAX_QUEUE pending tasks; past that
+submit() raises MediaQueueFull so a burst of uploads is refused (503) or
+skipped instead of oversubscribing the cores. A task still waiting after its
+timeout is cancelled; one running past it is reported as overrun (a running
+thread or pool process can't be killed safely). metrics() returns counters,
+queue depth and wait / run latencies per pool. drain() — registered with
+atexit — stops intake and lets queued work finish before the process exits.
+
+MEDIA_EXECUTOR_INLINE = True runs every task in the caller (tests, scripts).
+"""
+import os
+import time
+import atexit
+import threading
+import traceback
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connection
+
+
+MEDIA_EXECUTOR_THREADS   = getattr(settings, 'MEDIA_EXECUTOR_THREADS', 4)
+MEDIA_EXECUTOR_PROCESSES = getattr(settings, 'MEDIA_EXECUTOR_PROCESSES', getattr(settings, 'TRANSCODE_MAX_WORKERS', 2))
+MEDIA_EXECUTOR_MAX_QUEUE = getattr(settings, 'MEDIA_EXECUTOR_MAX_QUEUE', 64)     # pending tasks per pool
+MEDIA_TASK_TIMEOUT       = getattr(settings, 'MEDIA_TASK_TIMEOUT', 5 * 60)       # seconds, default per task
+MEDIA_DRAIN_TIMEOUT      = getattr(settings, 'MEDIA_DRAIN_TIMEOUT', 30)          # seconds to wait on shutdown
+MEDIA_EXECUTOR_INLINE    = getattr(settings, 'MEDIA_EXECUTOR_INLINE', False)
+
+LATENCY_WINDOW = 200        # recent tasks kept per pool for percentiles
+WATCHDOG_INTERVAL = 1.0
+
+
+class MediaQueueFull(Exception):
+    """The pool already has MEDIA_EXECUTOR_MAX_QUEUE pending tasks"""
+
+
+class MediaExecutorClosed(Exception):
+    """The executor is draining / shut down and accepts no new work"""
+
+
+##########################################################################################
+#                            Task wrappers
+##########################################################################################
+
+def _init_process(settings_module):
+    # Fresh interpreter (spawn): set Django up once per worker process
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _timed_call(fn, args, kwargs):
+    """Runs in the worker; returns (start, end, result) so the parent can measure wait / run time"""
+    start = time.time()
+    try:
+        result = fn(*args, **kwargs)
+        return start, time.time(), result
+    finally:
+        # Pool threads / processes keep no DB connection between tasks
+        connection.close()
+
+
+class _Task:
+    __slots__ = ('name', 'kind', 'timeout', 'submitted', 'future', 'inner', 'overrun')
+
+    def __init__(self, name, kind, timeout):
+        self.name = name
+        self.kind = kind
+        self.timeout = timeout
+        self.submitted = time.time()
+        self.future = Future()
+        self.inner = None
+        self.overrun = False
+
+
+class _PoolStats:
+    def __init__(self):
+        self.submitted = self.completed = self.failed = 0
+        self.rejected = self.cancelled = self.overruns = 0
+        self.waits = deque(maxlen=LATENCY_WINDOW)
+        self.runs = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed'   : self.failed,
+            'rejected' : self.rejected,
+            'cancelled': self.cancelled,
+            'overruns' : self.overruns,
+            'wait_ms'  : _percentiles(self.waits),
+            'run_ms'   : _percentiles(self.runs),
+        }
+
+
+def _percentiles(samples):
+    if not samples:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(samples)
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'max': round(ordered[-1] * 1000, 1)}
+
+
+##########################################################################################
+#                            Executor
+##########################################################################################
+
+class MediaExecutor:
+    def __init__(self, threads=MEDIA_EXECUTOR_THREADS, processes=MEDIA_EXECUTOR_PROCESSES,
+                 max_queue=MEDIA_EXECUTOR_MAX_QUEUE, inline=MEDIA_EXECUTOR_INLINE):
+        self.sizes = {'thread': threads, 'process': processes}
+        self.max_queue = max_queue
+        self.inline = inline
+        self.accepting = True
+        self._pools = {}
+        self._pending = {'thread': set(), 'process': set()}
+        self._stats = {'thread': _PoolStats(), 'process': _PoolStats()}
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    # ── pools ─────────────────────────────────────────────────────────────────
+    def _pool(self, kind):
+        pool = self._pools.get(kind)
+        if pool is None:
+            if kind == 'thread':
+                pool = ThreadPoolExecutor(max_workers=self.sizes['thread'], thread_name_prefix='media')
+            else:
+                # spawn, not fork: a forked child would share the parent's DB sockets
+                pool = ProcessPoolExecutor(
+                    max_workers=self.sizes['process'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_process,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'Farmo.settings'),),
+                )
+            self._pools[kind] = pool
+        return pool
+
+    def _start_watchdog(self):
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._watchdog = threading.Thread(target=self._watch, name='media-watchdog', daemon=True)
+            self._watchdog.start()
+
+    # ── submit ────────────────────────────────────────────────────────────────
+    def submit(self, fn, *args, kind='thread', name=None, timeout=MEDIA_TASK_TIMEOUT, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on the thread or process pool and return a
+        Future of its result. Raises MediaQueueFull when the pool is at
+        capacity and MediaExecutorClosed while draining.
+        """
+        if kind not in self.sizes:
+            raise ValueError(f"kind must be 'thread' or 'process', not {kind!r}")
+        task = _Task(name or getattr(fn, '__name__', 'task'), kind, timeout)
+        stats = self._stats[kind]
+
+        if self.inline:
+            stats.submitted += 1
+            self._run_inline(task, fn, args, kwargs)
+            return task.future
+
+        with self._lock:
+            if not self.accepting:
+                raise MediaExecutorClosed('Media executor is shutting down')
+            if len(self._pending[kind]) >= self.max_queue:
+                stats.rejected += 1
+                raise MediaQueueFull(f'{len(self._pending[kind])} {kind} tasks already pending')
+            stats.submitted += 1
+            self._pending[kind].add(task)
+            try:
+                task.inner = self._pool(kind).submit(_timed_call, fn, args, kwargs)
+            except BrokenProcessPool:
+                self._pools.pop(kind, None)
+                task.inner = self._pool(kind).submit(_timed_call, fn, args, kwargs)
+            self._start_watchdog()
+
+        task.inner.add_done_callback(lambda inner: self._finish(task, inner))
+        return task.future
+
+    def _run_inline(self, task, fn, args, kwargs):
+        start = time.time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._stats[task.kind].failed += 1
+            print(f"[Media executor] {task.name} failed: {e}")
+            task.future.set_exception(e)
+            return
+        self._stats[task.kind].completed += 1
+        self._stats[task.kind].runs.append(time.time() - start)
+        task.future.set_result(result)
+
+    def _finish(self, task, inner):
+        stats = self._stats[task.kind]
+        with self._lock:
+            self._pending[task.kind].discard(task)
+
+        if inner.cancelled():
+            stats.cancelled += 1
+            task.future.cancel()
+            return
+
+        exc = inner.exception()
+        if exc is not None:
+            stats.failed += 1
+            print(f"[Media executor] {task.name} failed: {exc}")
+            if isinstance(exc, BrokenProcessPool):
+                with self._lock:
+                    self._pools.pop(task.kind, None)
+            else:
+                traceback.print_exception(type(exc), exc, exc.__traceback__)
+            task.future.set_exception(exc)
+            return
+
+        start, end, result = inner.result()
+        stats.completed += 1
+        stats.waits.append(max(0.0, start - task.submitted))
+        stats.runs.append(end - start)
+        task.future.set_result(result)
+
+    # ── timeouts ──────────────────────────────────────────────────────────────
+    def _watch(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            now = time.time()
+            with self._lock:
+                tasks = [t for pending in self._pending.values() for t in pending]
+                if not tasks and not self.accepting:
+                    return
+            for task in tasks:
+                if not task.timeout or now - task.submitted < task.timeout or task.overrun:
+                    continue
+                # Still queued: drop it. Running: can't be interrupted, report it once.
+                if task.inner.cancel():
+                    print(f"[Media executor] {task.name} cancelled after waiting {task.timeout}s")
+                else:
+                    task.overrun = True
+                    self._stats[task.kind].overruns += 1
+                    print(f"[Media executor] {task.name} is still running after {task.timeout}s")
+
+    # ── introspection / shutdown ──────────────────────────────────────────────
+    def queue_depth(self, kind='thread'):
+        with self._lock:
+            return len(self._pending[kind])
+
+    def has_capacity(self, kind='thread'):
+        return self.accepting and self.queue_depth(kind) < self.max_queue
+
+    def metrics(self):
+        with self._lock:
+            depth = {kind: len(pending) for kind, pending in self._pending.items()}
+        return {
+            kind: {'workers': self.sizes[kind], 'max_queue': self.max_queue, 'queue_depth': depth[kind], **stats.snapshot()}
+            for kind, stats in self._stats.items()
+        } | {'accepting': self.accepting}
+
+    def drain(self, timeout=MEDIA_DRAIN_TIMEOUT):
+        """
+        Stop accepting work, wait up to `timeout` seconds for pending tasks,
+        then shut the pools down (cancelling whatever is still queued).
+        Returns the number of tasks that did not finish.
+        """
+        with self._lock:
+            self.accepting = False
+        deadline = time.monotonic() + (timeout or 0)
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not any(self._pending.values()):
+                    break
+            time.sleep(0.05)
+
+        with self._lock:
+            left = sum(len(pending) for pending in self._pending.values())
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if left:
+            print(f"[Media executor] Shut down with {left} unfinished task(s)")
+        return left
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_media_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = MediaExecutor()
+            atexit.register(_executor.drain)
+        return _executor
+
+
+def submit_media_task(fn, *args, **kwargs):
+    """get_media_executor().submit(...)"""
+    return get_media_executor().submit(fn, *args, **kwargs)
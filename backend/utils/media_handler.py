@@ -1,10 +1,16 @@
 import os
+import shutil
 import tempfile
 import mimetypes
-import threading
 import cv2
 from datetime import datetime
 from django.conf import settings
+from django.core.files.move import file_move_safe
+
+from backend.utils.image_encoder import encode_to_target, FORMATS
+from backend.utils.image_variants import generate_image_variants, delete_image_variants
+from backend.utils.media_executor import submit_media_task, MediaQueueFull, MediaExecutorClosed
+from backend.utils.transcoder import convert_video, submit_transcode, rendition_dir, TranscodeQueueFull
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -18,13 +24,25 @@ VIDEO_TARGET_WIDTH  = 1280          # HD 720p output width
 VIDEO_TARGET_HEIGHT = 720           # HD 720p output height
 VIDEO_TARGET_FPS    = 30
 
-IMAGE_SAVE_FORMAT        = '.jpg'   # all images stored as JPEG
-IMAGE_TARGET_MIN_MB      = 2.0     # compressed floor — small images stay above this
-IMAGE_TARGET_MAX_MB      = 5.0     # compressed ceiling
-IMAGE_LARGE_PREFER_MB    = 5.0     # for inputs >10 MB, binary-search aims at this target
-IMAGE_LARGE_THRESHOLD_MB = 10.0    # input size above which we prefer the upper bound
-IMAGE_QUALITY_MAX        = 95      # JPEG quality upper bound
-IMAGE_QUALITY_MIN        = 10      # JPEG quality lower bound — stop trying below this
+PRODUCT_IMAGE_FORMAT     = getattr(settings, 'PRODUCT_IMAGE_FORMAT', 'jpeg')   # 'jpeg' or 'webp'
+IMAGE_SAVE_FORMAT        = FORMATS[PRODUCT_IMAGE_FORMAT][0]                  # '.jpg' / '.webp'
+
+
+def _on_disk_path(file):
+    """
+    Path of an upload that already sits on disk (Django's
+    TemporaryUploadedFile, an assembled chunked upload), else None.
+    Such files are read or moved in place instead of being copied to a
+    fresh temp file first.
+    """
+    getter = getattr(file, 'temporary_file_path', None)
+    if getter is None:
+        return None
+    try:
+        path = getter()
+    except Exception:
+        return None
+    return path if path and os.path.isfile(path) else None
 
 
 class FileManager:
@@ -69,12 +87,13 @@ class FileManager:
         Save product-related files (images / videos).
 
         Images  → accepted at ANY size/format, converted and stored as JPEG
-                  in the 2–4 MB range via adaptive quality search.
+                  (or WebP) within IMAGE_TARGET_KB, plus small / medium /
+                  large variants ('variants' in the result).
 
         Videos  → validated ≤30s and ≤FHD resolution before saving.
                   Saved as raw immediately so the API responds fast.
-                  Converted to 720p MP4 in a background daemon thread;
-                  raw file is replaced when done.
+                  Converted to 720p MP4 + rendition ladder by the
+                  transcoding queue; raw file is replaced when done.
 
         Response includes 'converting': True/False.
 
@@ -135,6 +154,11 @@ class FileManager:
 
         try:
             os.remove(file_path)
+            # A converted video keeps its rendition ladder in a folder of the same name
+            renditions = rendition_dir(file_path)
+            if file_path.endswith('.mp4') and os.path.isdir(renditions):
+                shutil.rmtree(renditions, ignore_errors=True)
+            delete_image_variants(file_path)
             return {'success': True, 'message': f'File {file_name} deleted successfully'}
         except Exception as e:
             return {'success': False, 'error': f'Failed to delete file: {str(e)}'}
@@ -143,7 +167,7 @@ class FileManager:
     def very_high_compresser(self, image_path, output_path, max_dimension=100):
         """
         Compress image to 70x70 to 100x100 pixels for profile search list.
-        Runs in background thread and saves to output_path.
+        Runs on the shared media executor and saves to output_path.
         
         Args:
             image_path: Path to source image
@@ -151,35 +175,33 @@ class FileManager:
             max_dimension: Maximum width/height (default 100)
         
         Returns:
-            dict: {'success': True, 'compressing': True} immediately
+            dict: {'success': True, 'compressing': True} immediately,
+                  success False when the media workers are saturated
         """
-        thread = threading.Thread(
-            target=self._compress_thumbnail_background,
-            args=(image_path, output_path, max_dimension),
-            daemon=True
-        )
-        thread.start()
+        try:
+            submit_media_task(
+                self._compress_thumbnail_background, image_path, output_path, max_dimension,
+                name='thumbnail',
+            )
+        except (MediaQueueFull, MediaExecutorClosed) as e:
+            return {'success': False, 'compressing': False, 'error': f'Media workers are busy: {e}'}
         return {'success': True, 'compressing': True, 'output_path': output_path}
 
 
     def _compress_thumbnail_background(self, image_path, output_path, max_dimension):
-        """Background thread: compress image to thumbnail size."""
-        try:
-            img = cv2.imread(image_path)
-            if img is None:
-                print(f"[Thumbnail] Cannot read {image_path}")
-                return
-            
-            h, w = img.shape[:2]
-            scale = min(max_dimension / w, max_dimension / h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            
-            resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-            cv2.imwrite(output_path, resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            print(f"[Thumbnail] Complete: {output_path}")
-        except Exception as e:
-            print(f"[Thumbnail] Error: {str(e)}")
+        """Media executor task: compress image to thumbnail size (errors are counted by the executor)."""
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"Cannot read {image_path}")
+
+        h, w = img.shape[:2]
+        scale = min(max_dimension / w, max_dimension / h)
+        new_w = int(w * scale)
+        new_h = int(h * scale)
+
+        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(output_path, resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        print(f"[Thumbnail] Complete: {output_path}")
 
 
     def list_files(self, category):
@@ -330,13 +352,16 @@ class FileManager:
         """
         tmp_path = None
         try:
-            ext = os.path.splitext(file.name)[1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext, dir=self.custom_temp_dir) as tmp:
-                for chunk in file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-
-            cap = cv2.VideoCapture(tmp_path)
+            source_path = _on_disk_path(file)
+            if source_path is None:
+                ext = os.path.splitext(file.name)[1].lower()
+                with tempfile.NamedTemporaryFile(delete=False, suffix=ext, dir=self.custom_temp_dir) as tmp:
+                    for chunk in file.chunks():
+                        tmp.write(chunk)
+                    tmp_path = tmp.name
+                source_path = tmp_path
+
+            cap = cv2.VideoCapture(source_path)
             if not cap.isOpened():
                 return {'success': False, 'error': 'Cannot open video file'}
 
@@ -381,43 +406,51 @@ class FileManager:
 
     def _save_video(self, file, category_dir, product_id, sequence, timestamp):
         """
-        Save raw video immediately (fast API response), then convert to
-        720p MP4 in a background daemon thread.
+        Save raw video immediately (fast API response), then queue the
+        conversion (backend.utils.transcoder).
 
         Input accepted  : any format, any size, up to FHD (1920×1080), ≤30s
-        Output stored   : 1280×720 MP4 (H.264 + AAC), aspect-ratio preserved
-                          with black letterbox/pillarbox padding if needed.
+        Output stored   : MP4 fitted inside 1280×720, aspect-ratio preserved,
+                          plus a 360p/480p/720p segmented rendition ladder with
+                          HLS playlists and a poster frame in a folder of the
+                          same name.
         """
         tmp_path = None
         try:
-            # 1. Save raw video to temp
             ext = os.path.splitext(file.name)[1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext, dir=self.custom_temp_dir) as tmp:
-                for chunk in file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
 
-            # 2. Determine sequence
+            # 1. Determine sequence
             if sequence is None:
                 sequence = self._get_next_sequence(category_dir, product_id)
 
-            # 3. Save raw immediately (so API responds fast)
             raw_name = f"{product_id}-vid-{sequence}-{timestamp}{ext}"
             raw_path = os.path.join(category_dir, raw_name)
 
-            import shutil
-            shutil.copy2(tmp_path, raw_path)
+            # 2. Save raw immediately (so API responds fast). A file that is
+            #    already on disk (assembled chunked upload) is moved, not copied.
+            source_path = _on_disk_path(file)
+            if source_path is not None:
+                file_move_safe(source_path, raw_path, allow_overwrite=True)
+                tmp_path = raw_path
+            else:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=ext, dir=self.custom_temp_dir) as tmp:
+                    for chunk in file.chunks():
+                        tmp.write(chunk)
+                    tmp_path = tmp.name
+
+                shutil.copy2(tmp_path, raw_path)
 
-            # 4. Background conversion
+            # 4. Queue the conversion (bounded worker processes, see backend.utils.transcoder)
             final_name = f"{product_id}-vid-{sequence}-{timestamp}.mp4"
             final_path = os.path.join(category_dir, final_name)
 
-            thread = threading.Thread(
-                target=self._convert_video_background,
-                args=(tmp_path, final_path, raw_path),
-                daemon=True
-            )
-            thread.start()
+            try:
+                job = submit_transcode(self.user_id, tmp_path, final_path, raw_path, product_id=product_id)
+            except TranscodeQueueFull as e:
+                for path in {tmp_path, raw_path}:
+                    if os.path.exists(path):
+                        os.unlink(path)
+                return {'success': False, 'error': str(e), 'status_code': 503}
 
             # 5. Return immediately
             return {
@@ -427,8 +460,9 @@ class FileManager:
                 'file_name'  : final_name,
                 'sequence'   : sequence,
                 'category'   : 'product',
-                'converting' : True,
-                'message'    : 'Video uploaded; converting to 720p MP4 in background',
+                'converting' : job.status in ('QUEUED', 'RUNNING'),
+                'job_id'     : job.pk,
+                'message'    : 'Video uploaded; converting to 720p MP4 and renditions in background',
             }
 
         except Exception as e:
@@ -439,63 +473,13 @@ class FileManager:
 
     def _convert_video_background(self, src_path, dest_path, raw_path):
         """
-        Background thread: convert video to 720p MP4 with aspect-ratio preserved.
-        Deletes raw file when done.
+        Convert video to 720p MP4 with aspect-ratio preserved in the calling
+        thread. Uploads go through the transcoding queue instead
+        (backend.utils.transcoder); kept for direct callers.
         """
         try:
-            cap = cv2.VideoCapture(src_path)
-            if not cap.isOpened():
-                print(f"[Video conversion] Cannot open {src_path}")
-                return
-
-            in_w  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            in_h  = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps   = cap.get(cv2.CAP_PROP_FPS) or VIDEO_TARGET_FPS
-
-            # Compute scale to fit inside 1280×720, preserving aspect ratio
-            scale = min(VIDEO_TARGET_WIDTH / in_w, VIDEO_TARGET_HEIGHT / in_h)
-            new_w = int(in_w * scale)
-            new_h = int(in_h * scale)
-
-            # Padding to center the scaled frame in 1280×720 canvas
-            pad_x = (VIDEO_TARGET_WIDTH  - new_w) // 2
-            pad_y = (VIDEO_TARGET_HEIGHT - new_h) // 2
-
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(dest_path, fourcc, fps, (VIDEO_TARGET_WIDTH, VIDEO_TARGET_HEIGHT))
-
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                # Resize frame
-                resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
-
-                # Create black canvas and place resized frame in center
-                canvas = cv2.copyMakeBorder(
-                    resized,
-                    top=pad_y,
-                    bottom=VIDEO_TARGET_HEIGHT - new_h - pad_y,
-                    left=pad_x,
-                    right=VIDEO_TARGET_WIDTH - new_w - pad_x,
-                    borderType=cv2.BORDER_CONSTANT,
-                    value=(0, 0, 0)
-                )
-
-                out.write(canvas)
-
-            cap.release()
-            out.release()
-
-            # Delete raw file
-            if os.path.exists(raw_path):
-                os.unlink(raw_path)
-            if os.path.exists(src_path):
-                os.unlink(src_path)
-
+            convert_video(src_path, dest_path, raw_path)
             print(f"[Video conversion] Complete: {dest_path}")
-
         except Exception as e:
             print(f"[Video conversion] Error: {str(e)}")
 
@@ -506,18 +490,22 @@ class FileManager:
 
     def _save_product_image(self, file, category_dir, product_id, sequence, timestamp):
         """
-        Convert product image to JPEG with adaptive compression.
-        Target: 2-5 MB for normal images, up to 5 MB for large inputs (>10 MB).
+        Convert product image to JPEG (or WebP, PRODUCT_IMAGE_FORMAT) within
+        the IMAGE_TARGET_KB budget, downscaled to IMAGE_MAX_DIMENSION first,
+        plus its small / medium / large variants (backend.utils.image_variants).
         """
         tmp_path = None
         try:
-            ext = os.path.splitext(file.name)[1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                for chunk in file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-
-            img = cv2.imread(tmp_path)
+            source_path = _on_disk_path(file)
+            if source_path is None:
+                ext = os.path.splitext(file.name)[1].lower()
+                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+                    for chunk in file.chunks():
+                        tmp.write(chunk)
+                    tmp_path = tmp.name
+                source_path = tmp_path
+
+            img = cv2.imread(source_path)
             if img is None:
                 return {'success': False, 'error': 'Cannot read image — corrupt or unsupported format'}
 
@@ -538,6 +526,9 @@ class FileManager:
 
             final_size_mb = os.path.getsize(file_path) / (1024 * 1024)
 
+            # Small / medium / large variants for cards and detail pages
+            variants = generate_image_variants(img, file_path, PRODUCT_IMAGE_FORMAT)
+
             return {
                 'success'   : True,
                 'file_path' : file_path,
@@ -546,6 +537,10 @@ class FileManager:
                 'sequence'  : sequence,
                 'category'  : 'product',
                 'size_mb'   : round(final_size_mb, 2),
+                'variants'  : {
+                    name: f"{self.base_url}/product/variants/{os.path.basename(path)}"
+                    for name, path in variants.items()
+                },
             }
 
         except Exception as e:
@@ -561,48 +556,10 @@ class FileManager:
 
     def _compress_image_to_target(self, img):
         """
-        Compress image to JPEG targeting 2-5 MB range using binary search.
-        For large inputs (>10 MB assumed), prefer upper bound (5 MB).
+        Encode image within the IMAGE_TARGET_KB budget in at most three
+        passes (see backend.utils.image_encoder).
         """
-        # Try max quality first
-        _, buf = cv2.imencode(IMAGE_SAVE_FORMAT, img, [cv2.IMWRITE_JPEG_QUALITY, IMAGE_QUALITY_MAX])
-        size_mb = len(buf) / (1024 * 1024)
-
-        # Already small enough? done
-        if IMAGE_TARGET_MIN_MB <= size_mb <= IMAGE_TARGET_MAX_MB:
-            return buf.tobytes()
-
-        # Too small at max quality? just return it
-        if size_mb < IMAGE_TARGET_MIN_MB:
-            return buf.tobytes()
-
-        # Large input? prefer upper bound (5 MB)
-        if size_mb > IMAGE_LARGE_THRESHOLD_MB:
-            target = IMAGE_LARGE_PREFER_MB
-        else:
-            target = (IMAGE_TARGET_MIN_MB + IMAGE_TARGET_MAX_MB) / 2
-
-        # Binary search for quality
-        low, high = IMAGE_QUALITY_MIN, IMAGE_QUALITY_MAX
-        best_buf = buf
-
-        for _ in range(10):  # max iterations
-            mid = (low + high) // 2
-            _, buf = cv2.imencode(IMAGE_SAVE_FORMAT, img, [cv2.IMWRITE_JPEG_QUALITY, mid])
-            size_mb = len(buf) / (1024 * 1024)
-
-            if abs(size_mb - target) < 0.1:  # close enough
-                best_buf = buf
-                break
-
-            if size_mb > target:
-                high = mid - 1
-            else:
-                low = mid + 1
-
-            best_buf = buf
-
-        return best_buf.tobytes()
+        return encode_to_target(img, fmt=PRODUCT_IMAGE_FORMAT)['data']
 
 
     # ─────────────────────────────────────────────────────────────────────────
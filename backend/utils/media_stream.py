@@ -0,0 +1,125 @@
+"""
+Raw-bytes file responses with HTTP caching and Range support.
+
+stream_file_response() serves a file from disk without loading it into
+memory: a full 200 (FileResponse, sendfile-capable via wsgi.file_wrapper),
+a 206 partial response for a single "Range: bytes=..." request (video
+seeking / resumable downloads), 304 for a matching If-None-Match /
+If-Modified-Since, and 416 for an unsatisfiable range.
+"""
+import os
+import re
+import mimetypes
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat_result):
+    """Strong validator from size + mtime (no need to hash the content)"""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range "bytes=start-end" header against a file of `size`
+    bytes. Returns (start, end) inclusive, None when the header should be
+    ignored (absent / malformed / multi-range), or 'unsatisfiable'.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+
+def _if_range_allows(request, etag, mtime):
+    """A Range is only honoured when If-Range (if sent) still matches the file"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = fh.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def stream_file_response(request, path, content_type=None, filename=None):
+    """
+    Stream `path` to the client honouring conditional GET and Range.
+    Raises FileNotFoundError when the file does not exist.
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    last_modified = http_date(stat_result.st_mtime)
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat_result.st_mtime))
+    if not_modified is not None:
+        not_modified.headers['Accept-Ranges'] = 'bytes'
+        return not_modified
+
+    byte_range = None
+    if _if_range_allows(request, etag, stat_result.st_mtime):
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+    elif byte_range is not None and request.method != 'HEAD':
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_range(path, start, end - start + 1), status=206, content_type=content_type,
+        )
+        response.headers['Content-Length'] = str(end - start + 1)
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response.headers['Content-Length'] = str(size)
+    else:
+        response = FileResponse(
+            open(path, 'rb'), content_type=content_type,
+            filename=filename or os.path.basename(path),
+        )
+        response.block_size = STREAM_BLOCK_SIZE
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = last_modified
+    response.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
@@ -0,0 +1,131 @@
+"""
+PostgreSQL full-text and trigram support for product search.
+
+On PostgreSQL (migration 0095 adds the pieces) product search is backed by
+
+    Product.search_vector   tsvector over name (weight A), description (B) and
+                            the names of its keywords (C), GIN indexed,
+                            refreshed by a post_save signal (backend.signals)
+    gin_trgm_ops indexes    on UPPER(p_id) / UPPER(name) and the FarmProducts
+                            names, so icontains and trigram lookups stop
+                            scanning the whole catalog
+
+Product search (product_feed._search_products) keeps its tiers (p_id,
+name, category, keywords) and on PostgreSQL adds a full-text /
+typo-tolerant tier after the keyword tier. A term that names no FarmProduct is resolved
+by trigram similarity ("tomatoe" -> tomato -> vegetable).
+
+On any other database (SQLite in tests / local runs) use_postgres_search()
+is False and search behaves exactly as before.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.functions import Upper
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchVector
+
+
+PRODUCT_SEARCH_BACKEND = getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'auto')     # 'auto' | 'postgres' | 'basic'
+PRODUCT_SEARCH_CONFIG  = getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'simple')    # text search config (names are English and Nepali)
+
+_TSQUERY_SPECIAL = str.maketrans({c: ' ' for c in "&|!():*<>'\\\""})
+
+
+def use_postgres_search():
+    """True when search should use the full-text / trigram indexes"""
+    if PRODUCT_SEARCH_BACKEND == 'basic':
+        return False
+    return connection.vendor == 'postgresql'
+
+
+##########################################################################################
+#                            Search vector
+##########################################################################################
+
+def keyword_search_text(keywords, names_by_id):
+    """
+    Text indexed for a product's keywords: the English and Nepali names of
+    the FarmProducts it references (IDs), or the keyword itself when it is
+    stored as a plain string.
+    """
+    if not isinstance(keywords, list):
+        return ''
+    parts = []
+    for kw in keywords:
+        names = names_by_id.get(kw) if isinstance(kw, int) else None
+        if names:
+            parts.extend(n for n in names if n)
+        elif isinstance(kw, str):
+            parts.append(kw)
+    return ' '.join(parts)
+
+
+def search_vector_expression(name, description, keyword_text):
+    return (
+        SearchVector(Value(name or ''), weight='A', config=PRODUCT_SEARCH_CONFIG)
+        + SearchVector(Value(description or ''), weight='B', config=PRODUCT_SEARCH_CONFIG)
+        + SearchVector(Value(keyword_text or ''), weight='C', config=PRODUCT_SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vectors(products):
+    """
+    Recompute search_vector for the given Product instances (one UPDATE each).
+    No-op off PostgreSQL, where the column stays NULL.
+    """
+    if connection.vendor != 'postgresql' or not products:
+        return 0
+    from backend.models import Product, FarmProducts
+
+    ids = {kw for p in products if isinstance(p.keywords, list) for kw in p.keywords if isinstance(kw, int)}
+    names_by_id = {
+        fp_id: (primary, secondary)
+        for fp_id, primary, secondary in FarmProducts.objects
+        .filter(id__in=ids)
+        .values_list('id', 'primary_name', 'secondary_name')
+    } if ids else {}
+
+    for p in products:
+        Product.objects.filter(pk=p.pk).update(
+            search_vector=search_vector_expression(p.name, p.description, keyword_search_text(p.keywords, names_by_id))
+        )
+    return len(products)
+
+
+##########################################################################################
+#                            Queries
+##########################################################################################
+
+def prefix_tsquery(term):
+    """
+    Raw tsquery text matching every word of term as a prefix:
+    "fresh toma" -> 'fresh':* & 'toma':*  (None when nothing is left)
+    """
+    words = term.translate(_TSQUERY_SPECIAL).lower().split()
+    if not words:
+        return None
+    return ' & '.join(f"'{w}':*" for w in words)
+
+
+def fulltext_q(term):
+    """
+    Condition for the full-text / typo-tolerant tier: the term matches the
+    search vector (name, description, keyword names) or is trigram-similar
+    to a word of the product name. None when the term has no searchable words.
+    """
+    raw = prefix_tsquery(term)
+    if raw is None:
+        return None
+    query = SearchQuery(raw, search_type='raw', config=PRODUCT_SEARCH_CONFIG)
+    # UPPER() so the lookup hits the same gin_trgm_ops index as name__icontains
+    return Q(search_vector=query) | Q(TrigramWordSimilar(Upper('name'), term))
+
+
+def similar_farm_products(qs, term):
+    """FarmProducts in qs whose English or Nepali name is trigram-similar to term"""
+    return (
+        qs.alias(search_primary=Upper('primary_name'), search_secondary=Upper('secondary_name'))
+        .filter(Q(search_primary__trigram_word_similar=term) | Q(search_secondary__trigram_word_similar=term))
+    )
@@ -0,0 +1,402 @@
+"""
+Columnar in-memory snapshot of the product catalog for feed ranking.
+
+When the feed is ranked in process (FEED_RANKING_MODE = "python") scoring
+one product at a time costs a handful of attribute / dict lookups per row.
+The snapshot keeps what ranking needs as NumPy columns instead, so a
+candidate list is scored with a few array operations:
+
+    products    price, expiry (date ordinal), product_type code, avg rating,
+                delivered count, farmer row, keyword ids (CSR: indptr / ids)
+    farmers     user_id, resolved Location ids and normalized location text
+                per level (province / district / municipal / ward)
+
+One snapshot lives per process. Changes are applied incrementally:
+signals (backend.signals) call mark_products_changed() /
+mark_farmers_changed(); the process that made the change reloads those
+rows before its next ranking, and after commit the change is appended to a
+log in the Django cache (a sequence number plus one entry per change) that
+other processes replay. A snapshot is rebuilt from scratch when it is
+older than PRODUCT_SNAPSHOT_TTL or more than PRODUCT_SNAPSHOT_MAX_CHANGES
+log entries behind.
+
+The change log must live in a cache every worker shares (Redis, Memcached,
+database cache). With a process-local cache such as LocMemCache a worker
+never sees the changes made by the others and keeps ranking on stale rows
+until PRODUCT_SNAPSHOT_TTL; check_snapshot_cache() reports that setup.
+
+Only 'Available' products are loaded up front; any other product asked
+for is loaded on demand.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.models import Product, Users
+
+
+PRODUCT_SNAPSHOT_TTL = getattr(settings, 'PRODUCT_SNAPSHOT_TTL', 15 * 60)                  # seconds before a full rebuild
+PRODUCT_SNAPSHOT_MAX_CHANGES = getattr(settings, 'PRODUCT_SNAPSHOT_MAX_CHANGES', 1000)    # log entries replayed before a rebuild wins
+
+SEQ_CACHE_KEY = 'product_snapshot:seq'
+CHANGE_CACHE_KEY = 'product_snapshot:change:{}'
+
+# Cache backends whose entries other worker processes cannot see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+NO_EXPIRY = np.iinfo(np.int64).max
+LEVELS = ('province', 'district', 'municipal', 'ward')
+
+PRODUCT_FIELDS = (
+    'p_id', 'user_id__profile_id', 'product_type', 'keywords', 'cost_per_unit', 'expiry_Date',
+    'stats__avg_score', 'stats__rating_count', 'stats__delivered_count',
+)
+FARMER_FIELDS = (
+    'profile_id', 'user_id',
+    'profile_id__province_loc', 'profile_id__district_loc', 'profile_id__municipal_loc', 'profile_id__ward_no',
+    'profile_id__province', 'profile_id__district', 'profile_id__municipal', 'profile_id__ward',
+)
+
+
+def _text(value):
+    """Location text as location_tier() compares it"""
+    return str(value or '').strip().lower()
+
+
+class ProductSnapshot:
+    """Product and farmer columns; mutated only by apply() under the module lock"""
+
+    def __init__(self, product_rows=(), farmer_rows=(), seq=0):
+        self.seq = seq
+        self.loaded_at = time.monotonic()
+        self._types = {}                # product_type -> code
+        self._texts = {}                # normalized location text -> code
+
+        self.farmer_of = {}             # profile_id -> farmer row
+        self.farmer_by_user = {}        # user_id -> farmer row
+        self.farmer_loc = np.empty((0, len(LEVELS)), dtype=np.int64)     # Location id / ward_no, -1 unknown
+        self.farmer_text = np.empty((0, len(LEVELS)), dtype=np.int64)    # text code, -1 blank
+
+        self.row_of = {}                # p_id -> product row
+        self.p_ids = []
+        self.farmer = np.empty(0, dtype=np.int64)
+        self.price = np.empty(0, dtype=np.float64)
+        self.expiry = np.empty(0, dtype=np.int64)
+        self.type_code = np.empty(0, dtype=np.int64)
+        self.rating = np.empty(0, dtype=np.float64)   # 0 when unrated
+        self.rated = np.empty(0, dtype=bool)
+        self.sold = np.empty(0, dtype=np.int64)
+        self._keywords = []             # per row: tuple of FarmProducts ids
+        self._indptr = None
+        self._kw_ids = None
+
+        self._set_farmers(farmer_rows)
+        self._set_products(product_rows)
+
+    def __len__(self):
+        return len(self.row_of)
+
+    @staticmethod
+    def _code(vocab, value):
+        return vocab.setdefault(value, len(vocab)) if value else -1
+
+    # ── loading ──────────────────────────────────────────────────────────────
+
+    def _set_farmers(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        loc = np.array([[-1 if v is None else v for v in row[2:6]] for row in rows], dtype=np.int64)
+        text = np.array([[self._code(self._texts, _text(v)) for v in row[6:10]] for row in rows], dtype=np.int64)
+
+        target = []
+        for profile_id, user_id, *_ in rows:
+            index = self.farmer_of.get(profile_id)
+            if index is None:
+                index = self.farmer_of[profile_id] = len(self.farmer_of)
+            self.farmer_by_user[user_id] = index
+            target.append(index)
+        target = np.array(target, dtype=np.int64)
+
+        grow = len(self.farmer_of) - len(self.farmer_loc)
+        if grow:
+            self.farmer_loc = np.vstack([self.farmer_loc, np.full((grow, len(LEVELS)), -1, dtype=np.int64)])
+            self.farmer_text = np.vstack([self.farmer_text, np.full((grow, len(LEVELS)), -1, dtype=np.int64)])
+        self.farmer_loc[target] = loc
+        self.farmer_text[target] = text
+
+    def _set_products(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        target = []
+        for row in rows:
+            index = self.row_of.get(row[0])
+            if index is None:
+                index = self.row_of[row[0]] = len(self.p_ids)
+                self.p_ids.append(row[0])
+                self._keywords.append(())
+            target.append(index)
+
+        grow = len(self.p_ids) - len(self.price)
+        if grow:
+            self.farmer = np.concatenate([self.farmer, np.full(grow, -1, dtype=np.int64)])
+            self.price = np.concatenate([self.price, np.zeros(grow)])
+            self.expiry = np.concatenate([self.expiry, np.full(grow, NO_EXPIRY, dtype=np.int64)])
+            self.type_code = np.concatenate([self.type_code, np.full(grow, -1, dtype=np.int64)])
+            self.rating = np.concatenate([self.rating, np.zeros(grow)])
+            self.rated = np.concatenate([self.rated, np.zeros(grow, dtype=bool)])
+            self.sold = np.concatenate([self.sold, np.zeros(grow, dtype=np.int64)])
+
+        target = np.array(target, dtype=np.int64)
+        self.farmer[target] = [self.farmer_of.get(row[1], -1) for row in rows]
+        self.price[target] = [float(row[4] or 0) for row in rows]
+        self.expiry[target] = [row[5].toordinal() if row[5] else NO_EXPIRY for row in rows]
+        self.type_code[target] = [self._code(self._types, row[2]) for row in rows]
+        self.rating[target] = [float(row[6]) if row[7] else 0.0 for row in rows]
+        self.rated[target] = [bool(row[7]) for row in rows]
+        self.sold[target] = [row[8] or 0 for row in rows]
+        for index, row in zip(target.tolist(), rows):
+            keywords = row[3] if isinstance(row[3], list) else []
+            self._keywords[index] = tuple(k for k in keywords if isinstance(k, int) and not isinstance(k, bool))
+        self._indptr = self._kw_ids = None
+
+    def _csr(self):
+        if self._indptr is None:
+            lengths = np.fromiter((len(k) for k in self._keywords), dtype=np.int64, count=len(self._keywords))
+            self._indptr = np.concatenate([[0], np.cumsum(lengths)])
+            self._kw_ids = np.fromiter(
+                (kw for keywords in self._keywords for kw in keywords), dtype=np.int64, count=int(self._indptr[-1]),
+            )
+        return self._indptr, self._kw_ids
+
+    def apply(self, product_ids=(), profile_ids=()):
+        """Reload the given products and farmers from the database (deleted products are dropped)"""
+        product_rows = list(Product.objects.filter(p_id__in=list(product_ids)).values_list(*PRODUCT_FIELDS)) if product_ids else []
+        for p_id in set(product_ids) - {row[0] for row in product_rows}:
+            self.row_of.pop(p_id, None)
+
+        profile_ids = set(profile_ids) | {row[1] for row in product_rows if row[1] not in self.farmer_of}
+        if profile_ids:
+            self._set_farmers(Users.objects.filter(profile_id__in=list(profile_ids)).values_list(*FARMER_FIELDS))
+        self._set_products(product_rows)
+
+    # ── columns for a candidate list ─────────────────────────────────────────
+
+    def rows(self, p_ids):
+        """Row index of every p_id (all must be loaded)"""
+        return np.fromiter((self.row_of[p_id] for p_id in p_ids), dtype=np.int64, count=len(p_ids))
+
+    def missing(self, p_ids):
+        return [p_id for p_id in p_ids if p_id not in self.row_of]
+
+    def farmer_tiers(self, user_profile):
+        """location_tier() of every farmer as seen from user_profile, plus a trailing 0 for unknown farmers"""
+        same = {}
+        for column, level in enumerate(LEVELS):
+            if level == 'ward':
+                user_id, user_text = user_profile.ward_no, user_profile.ward
+            else:
+                user_id, user_text = getattr(user_profile, f'{level}_loc_id'), getattr(user_profile, level)
+            user_text = _text(user_text)
+            text_code = self._texts.get(user_text, -2) if user_text else None
+            loc, text = self.farmer_loc[:, column], self.farmer_text[:, column]
+
+            if user_id is not None:
+                match = loc == user_id
+                if text_code is not None:
+                    match |= (loc == -1) & (text == text_code)
+            elif text_code is not None:
+                match = text == text_code
+            else:
+                match = np.zeros(len(loc), dtype=bool)
+            same[level] = match
+
+        tiers = np.select(
+            [same['municipal'] & same['ward'], same['municipal'], same['district'], same['province']],
+            [4, 3, 2, 1], 0,
+        )
+        return np.append(tiers, 0)
+
+    def tiers(self, rows, user_profile):
+        return self.farmer_tiers(user_profile)[self.farmer[rows]]
+
+    def keyword_weights(self, rows, weight_by_id):
+        """Per row: sum of weight_by_id over its keyword ids (a repeated keyword counts each time)"""
+        result = np.zeros(len(rows))
+        if not weight_by_id or not len(rows):
+            return result
+        indptr, kw_ids = self._csr()
+        starts = indptr[rows]
+        lengths = indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return result
+
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        ids = kw_ids[positions]
+
+        keys = np.array(sorted(weight_by_id), dtype=np.int64)
+        values = np.array([weight_by_id[k] for k in keys.tolist()], dtype=np.float64)
+        found = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+        weights = np.where(keys[found] == ids, values[found], 0.0)
+        return np.bincount(owner, weights=weights, minlength=len(rows))
+
+    def category_weights(self, rows, weight_by_type):
+        """Per row: weight_by_type[product_type] (0 for other / blank types)"""
+        weights = np.zeros(len(self._types) + 1)
+        for product_type, weight in weight_by_type.items():
+            code = self._types.get(product_type)
+            if code is not None:
+                weights[code] = weight
+        return weights[self.type_code[rows]]
+
+    def connection_mask(self, rows, user_ids):
+        """Per row: True when the product's farmer is one of user_ids"""
+        connected = np.zeros(len(self.farmer_of) + 1, dtype=bool)
+        for user_id in user_ids or ():
+            index = self.farmer_by_user.get(user_id)
+            if index is not None:
+                connected[index] = True
+        return connected[self.farmer[rows]]
+
+    def stats_maps(self, p_ids):
+        """(ratings_map, sold_map) like product_feed._batch_fetch_stats, from the snapshot"""
+        rows = self.rows(p_ids)
+        ratings_map = {
+            p_id: rating for p_id, rating, rated in zip(p_ids, self.rating[rows].tolist(), self.rated[rows].tolist()) if rated
+        }
+        sold_map = {p_id: sold for p_id, sold in zip(p_ids, self.sold[rows].tolist()) if sold}
+        return ratings_map, sold_map
+
+
+##########################################################################################
+#                            Process snapshot
+##########################################################################################
+
+_snapshot = None
+_pending = set()                    # (kind, key) changed by this process, not yet applied
+_lock = threading.RLock()
+
+
+def _load(seq):
+    product_rows = list(Product.objects.filter(product_status='Available').values_list(*PRODUCT_FIELDS))
+    farmer_rows = list(
+        Users.objects
+        .filter(user_id__in=Product.objects.filter(product_status='Available').values('user_id'))
+        .values_list(*FARMER_FIELDS)
+    )
+    return ProductSnapshot(product_rows, farmer_rows, seq)
+
+
+def _replay(snapshot, seq):
+    """Changes logged since snapshot.seq, or None when the log cannot be replayed"""
+    behind = seq - snapshot.seq
+    if behind < 0 or behind > PRODUCT_SNAPSHOT_MAX_CHANGES:
+        return None
+    if not behind:
+        return set()
+    keys = [CHANGE_CACHE_KEY.format(i) for i in range(snapshot.seq + 1, seq + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) < len(keys):
+        return None
+    return {tuple(change) for entry in entries.values() for change in entry}
+
+
+@contextmanager
+def product_snapshot(ensure=()):
+    """
+    Current snapshot, with every p_id in `ensure` loaded. Hold it only for
+    the duration of the block: other threads apply changes under the same lock.
+    """
+    global _snapshot
+    with _lock:
+        seq = cache.get(SEQ_CACHE_KEY, 0)
+        snapshot = _snapshot
+        changes = None
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < PRODUCT_SNAPSHOT_TTL:
+            changes = _replay(snapshot, seq)
+        if changes is not None:
+            changes |= _pending
+        if changes is None or ('all', None) in changes:
+            snapshot = _snapshot = _load(seq)
+            changes = set()
+        _pending.clear()
+
+        product_ids = {key for kind, key in changes if kind == 'product'}
+        product_ids.update(snapshot.missing(ensure))
+        profile_ids = {key for kind, key in changes if kind == 'farmer'}
+        if product_ids or profile_ids:
+            snapshot.apply(product_ids, profile_ids)
+        snapshot.seq = seq
+        yield snapshot
+
+
+def _publish(changes):
+    with _lock:
+        _pending.update(changes)    # again: a reload inside the transaction may have read old rows
+    cache.add(SEQ_CACHE_KEY, 0, None)
+    try:
+        seq = cache.incr(SEQ_CACHE_KEY)
+    except ValueError:
+        return
+    cache.set(CHANGE_CACHE_KEY.format(seq), list(changes), PRODUCT_SNAPSHOT_TTL)
+
+
+def _record(changes):
+    with _lock:
+        _pending.update(changes)
+    transaction.on_commit(lambda: _publish(changes))
+
+
+def mark_products_changed(p_ids):
+    """Product / ProductStats rows were written: reload them before the next ranking (here now, elsewhere after commit)"""
+    _record({('product', p_id) for p_id in p_ids if p_id})
+
+
+def mark_farmers_changed(profile_ids):
+    """A farmer's location was written"""
+    _record({('farmer', profile_id) for profile_id in profile_ids if profile_id})
+
+
+def invalidate_product_snapshot():
+    """Bulk writes that bypass signals: every process rebuilds its snapshot"""
+    _record({('all', None)})
+
+
+def _reset():
+    global _snapshot
+    with _lock:
+        _snapshot = None
+        _pending.clear()
+
+
+def check_snapshot_cache(app_configs=None, **kwargs):
+    """
+    System check: FEED_RANKING_MODE = "python" needs a shared cache for the
+    change log. An error outside DEBUG (several workers), a warning under
+    runserver.
+    """
+    if getattr(settings, 'FEED_RANKING_MODE', 'sql') != 'python':
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+
+    level = checks.Warning if settings.DEBUG else checks.Error
+    return [level(
+        f'FEED_RANKING_MODE = "python" with the process-local cache {backend}.',
+        hint='Product snapshot changes are published through the default cache; '
+             'configure a cache shared by all workers or use FEED_RANKING_MODE = "sql".',
+        id='backend.E001' if level is checks.Error else 'backend.W001',
+    )]
@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from backend.models import Product, ProductRating, ProductStats, OrderRequest
+from backend.utils.product_snapshot import invalidate_product_snapshot, mark_products_changed
+
+
+def get_product_stats(product):
+    """
+    Return the ProductStats row of a product (already joined via
+    select_related('stats') where possible), or an unsaved all-zero row
+    when the product has no stats yet.
+    """
+    try:
+        return product.stats
+    except ProductStats.DoesNotExist:
+        return ProductStats(product_id=product.pk)
+
+
+def apply_rating_change(product_id, score_delta, count_delta):
+    """
+    Incrementally update the rating part of a product's stats.
+
+    score_delta – change of the rating score sum (Decimal)
+    count_delta – change of the number of ratings (+1 / 0 / -1)
+    """
+    if not product_id:
+        return
+
+    with transaction.atomic():
+        stats, _ = ProductStats.objects.select_for_update().get_or_create(product_id=product_id)
+        stats.rating_sum = Decimal(stats.rating_sum) + Decimal(score_delta)
+        stats.rating_count = max(0, stats.rating_count + count_delta)
+        stats.recompute_average()
+        stats.updated_at = timezone.now()
+        stats.save(update_fields=['rating_sum', 'rating_count', 'avg_score', 'updated_at'])
+
+
+def apply_order_change(product_id, delivered_delta, sales_delta):
+    """
+    Incrementally update the order part of a product's stats.
+
+    delivered_delta – change of the DELIVERED order count (+1 / 0 / -1)
+    sales_delta     – change of the total_cost sum over all orders (Decimal)
+    """
+    if not product_id or (not delivered_delta and not sales_delta):
+        return
+
+    with transaction.atomic():
+        stats, _ = ProductStats.objects.select_for_update().get_or_create(product_id=product_id)
+        stats.delivered_count = max(0, stats.delivered_count + delivered_delta)
+        stats.total_sales = Decimal(stats.total_sales) + Decimal(sales_delta)
+        stats.updated_at = timezone.now()
+        stats.save(update_fields=['delivered_count', 'total_sales', 'updated_at'])
+
+
+def rebuild_product_stats(product_ids=None, batch_size=1000):
+    """
+    Recompute ProductStats from ProductRating / OrderRequest.
+
+    product_ids – optional list of p_ids; all products when None.
+    Returns the number of stats rows written.
+    """
+    products = Product.objects.order_by('p_id').values_list('p_id', flat=True)
+    if product_ids is not None:
+        products = products.filter(p_id__in=product_ids)
+
+    written = 0
+    batch = []
+    for p_id in products.iterator(chunk_size=batch_size):
+        batch.append(p_id)
+        if len(batch) >= batch_size:
+            written += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        written += _rebuild_batch(batch)
+
+    # bulk_create sends no signals
+    if product_ids is None:
+        invalidate_product_snapshot()
+    else:
+        mark_products_changed(product_ids)
+    return written
+
+
+def _rebuild_batch(product_ids):
+    ratings = {
+        r['p_id']: r
+        for r in ProductRating.objects
+        .filter(p_id__in=product_ids)
+        .values('p_id')
+        .annotate(total=Sum('score'), count=Count('ProductRating_id'))
+    }
+    orders = {
+        o['product']: o
+        for o in OrderRequest.objects
+        .filter(product__in=product_ids)
+        .values('product')
+        .annotate(
+            delivered=Count('order_id', filter=Q(order_status='DELIVERED')),
+            sales=Sum('total_cost'),
+        )
+    }
+
+    now = timezone.now()
+    rows = []
+    for p_id in product_ids:
+        rating = ratings.get(p_id, {})
+        order = orders.get(p_id, {})
+        stats = ProductStats(
+            product_id=p_id,
+            rating_sum=rating.get('total') or 0,
+            rating_count=rating.get('count') or 0,
+            delivered_count=order.get('delivered') or 0,
+            total_sales=order.get('sales') or 0,
+            updated_at=now,
+        )
+        stats.recompute_average()
+        rows.append(stats)
+
+    ProductStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['rating_sum', 'rating_count', 'avg_score', 'delivered_count', 'total_sales', 'updated_at'],
+    )
+    return len(rows)
@@ -0,0 +1,162 @@
+"""
+Pre-built profile picture thumbnails for user lists.
+
+generate_profile_thumbnails() is called once when a profile picture is
+uploaded and writes every configured size / format next to the picture:
+
+    Uploaded_Files/<user_id>/profile/thumbs/<picture-stem>-<size>.<jpg|webp>
+
+List endpoints then call get_profile_thumbnail_b64(), which only reads the
+small pre-built file. Default avatars are resized once per process and kept
+in memory. Pictures uploaded before the store existed are thumbnailed on
+first read (or in bulk by `manage.py build_profile_thumbnails`).
+"""
+import os
+import base64
+import threading
+
+import cv2
+from django.conf import settings
+
+
+PROFILE_THUMBNAIL_SIZES   = tuple(getattr(settings, 'PROFILE_THUMBNAIL_SIZES', (100,)))
+PROFILE_THUMBNAIL_FORMATS = tuple(getattr(settings, 'PROFILE_THUMBNAIL_FORMATS', ('jpeg', 'webp')))
+PROFILE_THUMBNAIL_QUALITY = getattr(settings, 'PROFILE_THUMBNAIL_QUALITY', 70)
+
+DEFAULT_PROFILE_PICTURE_DIR = 'backend/static/DefaultProfilePicture'
+DEFAULT_PROFILE_PICTURES = {
+    'verifiedfarmer'  : 'pp-farmer.png',
+    'farmer'          : 'pp-farmer.png',
+    'verifiedconsumer': 'pp-consumer.png',
+    'consumer'        : 'pp-consumer.png',
+    'admin'           : 'pp-admin.png',
+    'superadmin'      : 'pp-superadmin.png',
+}
+GUEST_PROFILE_PICTURE = 'pp-guest.png'
+
+_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp'}
+MIME_TYPES  = {'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def default_profile_picture_path(user_type):
+    filename = DEFAULT_PROFILE_PICTURES.get((user_type or '').lower(), GUEST_PROFILE_PICTURE)
+    return f'{DEFAULT_PROFILE_PICTURE_DIR}/{filename}'
+
+
+def thumbnail_relative_path(profile_url, size, fmt='jpeg'):
+    """Where the thumbnail of an uploaded picture (relative to MEDIA_ROOT) lives"""
+    folder, name = os.path.split(profile_url)
+    stem = os.path.splitext(name)[0]
+    return os.path.join(folder, 'thumbs', f'{stem}-{size}{_EXTENSIONS[fmt]}')
+
+
+def _encode(img, size, fmt):
+    """Fit img inside size x size (same scaling as the old per-request resize) and encode it"""
+    h, w = img.shape[:2]
+    scale = min(size / w, size / h)
+    resized = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    if fmt == 'webp':
+        ok, buffer = cv2.imencode('.webp', resized, [cv2.IMWRITE_WEBP_QUALITY, PROFILE_THUMBNAIL_QUALITY])
+    else:
+        ok, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, PROFILE_THUMBNAIL_QUALITY])
+    return buffer.tobytes() if ok else None
+
+
+def generate_profile_thumbnails(profile_url):
+    """
+    Decode the uploaded picture once and write every configured thumbnail.
+    Returns the number of files written (0 when the picture can't be read).
+    """
+    img = cv2.imread(os.path.join(settings.MEDIA_ROOT, profile_url))
+    if img is None:
+        print(f"[Thumbnail] Cannot read {profile_url}")
+        return 0
+
+    written = 0
+    for size in PROFILE_THUMBNAIL_SIZES:
+        for fmt in PROFILE_THUMBNAIL_FORMATS:
+            data = _encode(img, size, fmt)
+            if data is None:
+                continue
+            dest = os.path.join(settings.MEDIA_ROOT, thumbnail_relative_path(profile_url, size, fmt))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f'{dest}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, dest)
+            written += 1
+    return written
+
+
+def delete_profile_thumbnails(profile_url):
+    """Remove every thumbnail of a picture that is being replaced"""
+    if not profile_url:
+        return
+    for size in PROFILE_THUMBNAIL_SIZES:
+        for fmt in _EXTENSIONS:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, thumbnail_relative_path(profile_url, size, fmt)))
+            except OSError:
+                pass
+
+
+##########################################################################################
+#                            Default avatars (in memory)
+##########################################################################################
+
+_default_cache = {}          # (path, size, fmt) -> bytes or None
+_default_lock = threading.Lock()
+
+
+def _default_thumbnail(path, size, fmt):
+    key = (path, size, fmt)
+    if key not in _default_cache:
+        img = cv2.imread(path)
+        data = _encode(img, size, fmt) if img is not None else None
+        with _default_lock:
+            _default_cache[key] = data
+    return _default_cache[key]
+
+
+##########################################################################################
+#                            Read API for list endpoints
+##########################################################################################
+
+def get_profile_thumbnail(profile, size=100, fmt='jpeg'):
+    """
+    Thumbnail bytes for a UsersProfile: the pre-built file of the uploaded
+    picture, else the (memory cached) default avatar of the user type, else
+    the guest avatar. Returns None only when even the guest avatar is missing.
+    """
+    if profile.profile_url:
+        thumb_path = os.path.join(settings.MEDIA_ROOT, thumbnail_relative_path(profile.profile_url, size, fmt))
+        try:
+            with open(thumb_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        # Picture uploaded before thumbnails existed: build them once
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, profile.profile_url)) \
+                and size in PROFILE_THUMBNAIL_SIZES and fmt in PROFILE_THUMBNAIL_FORMATS \
+                and generate_profile_thumbnails(profile.profile_url):
+            try:
+                with open(thumb_path, 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+        else:
+            # Unreadable or non-standard size: encode on the fly, nothing is stored
+            img = cv2.imread(os.path.join(settings.MEDIA_ROOT, profile.profile_url))
+            if img is not None:
+                return _encode(img, size, fmt)
+
+    data = _default_thumbnail(default_profile_picture_path(profile.user_type), size, fmt)
+    if data is None:
+        data = _default_thumbnail(f'{DEFAULT_PROFILE_PICTURE_DIR}/{GUEST_PROFILE_PICTURE}', size, fmt)
+    return data
+
+
+def get_profile_thumbnail_b64(profile, size=100, fmt='jpeg'):
+    data = get_profile_thumbnail(profile, size, fmt)
+    return base64.b64encode(data).decode('utf-8') if data else None
@@ -0,0 +1,124 @@
+"""
+Signed, expiring media URLs served by the front proxy.
+
+sign_media_url() turns a file the download resolvers picked (product
+media, profile picture, ID verification image) into
+
+    /api/file/signed/<root>/<relative path>?exp=<unix time>&sig=<hmac>
+
+where <root> is 'm' (MEDIA_ROOT) or 'd' (default avatars) and sig is an
+HMAC (salted with SECRET_KEY) over root, path and expiry. The URL carries
+its own authorization, so it can be handed to an image loader or video
+player for MEDIA_SIGNED_URL_TTL seconds without any header.
+
+serve_media() answers such a request according to MEDIA_SENDFILE_BACKEND:
+
+    'django' (default) stream the file from the worker (Range / ETag / 304,
+             backend.utils.media_stream) — local runs, no proxy needed
+    'nginx'  empty response with X-Accel-Redirect: <MEDIA_ACCEL_REDIRECT_PREFIX><root>/<path>;
+             nginx sends the bytes. Expects internal locations such as
+
+                 location /protected/m/ { internal; alias <MEDIA_ROOT>/; }
+                 location /protected/d/ { internal; alias <BASE_DIR>/backend/static/DefaultProfilePicture/; }
+
+    'apache' empty response with X-Sendfile: <absolute path> (mod_xsendfile)
+"""
+import os
+import time
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from backend.utils.media_stream import stream_file_response
+from backend.utils.profile_thumbnails import DEFAULT_PROFILE_PICTURE_DIR
+
+
+MEDIA_SIGNED_URL_TTL       = getattr(settings, 'MEDIA_SIGNED_URL_TTL', 5 * 60)        # seconds
+MEDIA_SENDFILE_BACKEND     = getattr(settings, 'MEDIA_SENDFILE_BACKEND', 'django')    # 'django' | 'nginx' | 'apache'
+MEDIA_ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected/')
+
+SIGNED_MEDIA_URL_PREFIX = '/api/file/signed/'
+_SALT = 'backend.signed_media'
+
+
+def _roots():
+    return {
+        'm': os.path.realpath(settings.MEDIA_ROOT),
+        'd': os.path.realpath(DEFAULT_PROFILE_PICTURE_DIR),
+    }
+
+
+def _split(file_path):
+    """(root key, '/'-separated path relative to it) of a servable file, else None"""
+    real = os.path.realpath(file_path)
+    for key, root in _roots().items():
+        if real.startswith(root + os.sep):
+            return key, os.path.relpath(real, root).replace(os.sep, '/')
+    return None
+
+
+def _signature(root, path, expires):
+    return salted_hmac(_SALT, f'{root}:{path}:{expires}', algorithm='sha256').hexdigest()
+
+
+def sign_media_url(file_path, ttl=MEDIA_SIGNED_URL_TTL):
+    """
+    Signed URL for file_path valid for ttl seconds, and its expiry time.
+    Raises ValueError for a file outside the servable roots.
+    """
+    split = _split(file_path)
+    if split is None:
+        raise ValueError('File is outside the media roots')
+    root, path = split
+    expires = int(time.time()) + int(ttl)
+    url = f'{SIGNED_MEDIA_URL_PREFIX}{root}/{quote(path)}?exp={expires}&sig={_signature(root, path, expires)}'
+    return url, expires
+
+
+def verify_media_signature(root, path, expires, signature):
+    """
+    Absolute path of the file a signed URL points to, or None when the
+    signature is wrong, the URL has expired or the path escapes its root.
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return None
+    if expires < time.time() or root not in _roots():
+        return None
+    if not signature or not constant_time_compare(_signature(root, path, expires), str(signature)):
+        return None
+
+    base = _roots()[root]
+    file_path = os.path.realpath(os.path.join(base, path))
+    if not file_path.startswith(base + os.sep):
+        return None
+    return file_path
+
+
+def serve_media(request, file_path, content_type=None):
+    """
+    Response that delivers file_path through MEDIA_SENDFILE_BACKEND.
+    Raises FileNotFoundError when the file does not exist.
+    """
+    if MEDIA_SENDFILE_BACKEND == 'django':
+        return stream_file_response(request, file_path, content_type=content_type)
+
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(file_path)
+    split = _split(file_path)
+    if split is None:
+        raise FileNotFoundError(file_path)
+
+    response = HttpResponse(content_type=content_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream')
+    if MEDIA_SENDFILE_BACKEND == 'nginx':
+        root, path = split
+        response.headers['X-Accel-Redirect'] = f'{MEDIA_ACCEL_REDIRECT_PREFIX}{root}/{quote(path)}'
+    elif MEDIA_SENDFILE_BACKEND == 'apache':
+        response.headers['X-Sendfile'] = file_path
+    else:
+        raise ValueError(f"Unknown MEDIA_SENDFILE_BACKEND {MEDIA_SENDFILE_BACKEND!r}, use 'django', 'nginx' or 'apache'")
+    return response
@@ -0,0 +1,415 @@
+"""
+Video transcoding queue.
+
+FileManager._save_video no longer starts a thread per upload; it calls
+submit_transcode(), which records a TranscodeJob (QUEUED -> RUNNING ->
+DONE / FAILED, with progress %) and hands it to a bounded pool of worker
+*processes*, so encoding never competes with request handling for the GIL.
+
+TRANSCODE_EXECUTOR selects where jobs run:
+    'process'  (default) process pool of the shared media executor
+               (backend.utils.media_executor, MEDIA_EXECUTOR_PROCESSES per web worker)
+    'external' jobs are only queued; `manage.py run_transcode_jobs` runs them
+    'inline'   run in the calling thread (tests, single-process dev setups)
+
+Each job produces a rendition ladder (TRANSCODE_RENDITIONS, default
+360p / 480p / 720p) of segmented MP4 with HLS playlists and a poster frame,
+recorded on the job and on the product's media_url entry (see
+convert_video / attach_renditions).
+
+Backpressure: when TRANSCODE_MAX_PENDING jobs are already queued or running
+(across all workers, counted in the job table) submit_transcode() raises
+TranscodeQueueFull and the upload is rejected with 503.
+"""
+import os
+import math
+import shutil
+
+import cv2
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from backend.utils.media_executor import get_media_executor, MediaQueueFull, MediaExecutorClosed
+
+
+TRANSCODE_EXECUTOR    = getattr(settings, 'TRANSCODE_EXECUTOR', 'process')
+TRANSCODE_MAX_PENDING = getattr(settings, 'TRANSCODE_MAX_PENDING', 8)
+TRANSCODE_JOB_TIMEOUT = getattr(settings, 'TRANSCODE_JOB_TIMEOUT', 30 * 60)   # seconds before RUNNING is stale
+
+TRANSCODE_RENDITIONS      = tuple(getattr(settings, 'TRANSCODE_RENDITIONS', (360, 480, 720)))   # ladder rungs (short side)
+TRANSCODE_SEGMENT_SECONDS = getattr(settings, 'TRANSCODE_SEGMENT_SECONDS', 4)
+TRANSCODE_POSTER_AT       = getattr(settings, 'TRANSCODE_POSTER_AT', 1.0)      # seconds into the video
+TRANSCODE_POSTER_QUALITY  = getattr(settings, 'TRANSCODE_POSTER_QUALITY', 80)
+
+PROGRESS_STEP = 5   # percent between progress writes
+
+
+class TranscodeQueueFull(Exception):
+    """Too many conversions pending; the caller should retry later"""
+
+
+##########################################################################################
+#                            Conversion (runs in the worker)
+##########################################################################################
+
+def rendition_dir(dest_path):
+    """Directory holding the ladder of a converted video: the video's path without .mp4"""
+    return os.path.splitext(dest_path)[0]
+
+
+def _even(value):
+    return max(2, round(value) // 2 * 2)
+
+
+def plan_renditions(in_w, in_h):
+    """
+    (label, width, height) for every TRANSCODE_RENDITIONS rung that fits the
+    source: each rung is a 16:9 box (9:16 for portrait) the frame is scaled
+    into, aspect ratio preserved, never upscaled. The smallest rung is always
+    kept so every video has at least one rendition.
+    """
+    short_side = min(in_w, in_h)
+    heights = sorted(TRANSCODE_RENDITIONS)
+    ladder = []
+    for height in heights:
+        if height > short_side and ladder:
+            break
+        box_w, box_h = math.ceil(height * 16 / 9 / 2) * 2, height     # 640, 854, 1280
+        if in_h > in_w:
+            box_w, box_h = box_h, box_w
+        scale = min(1.0, box_w / in_w, box_h / in_h)
+        ladder.append((f'{height}p', _even(in_w * scale), _even(in_h * scale)))
+    return ladder
+
+
+class _SegmentedRendition:
+    """One rung of the ladder: fixed-length MP4 segments plus an index.m3u8"""
+
+    def __init__(self, root, label, width, height, fps, segment_frames):
+        self.dir = os.path.join(root, label)
+        os.makedirs(self.dir, exist_ok=True)
+        self.label = label
+        self.size = (width, height)
+        self.fps = fps
+        self.segment_frames = segment_frames
+        self.segments = []          # (file name, frames)
+        self._writer = None
+
+    def write(self, frame):
+        if self._writer is None or self.segments[-1][1] >= self.segment_frames:
+            self._roll()
+        self._writer.write(frame)
+        name, count = self.segments[-1]
+        self.segments[-1] = (name, count + 1)
+
+    def _roll(self):
+        if self._writer is not None:
+            self._writer.release()
+        name = f'seg-{len(self.segments):03d}.mp4'
+        # Every segment is its own file, so it starts on a key frame
+        self._writer = cv2.VideoWriter(os.path.join(self.dir, name), cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self.size)
+        self.segments.append((name, 0))
+
+    def close(self):
+        """Finish the last segment, write index.m3u8 and return the rung's summary"""
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+        durations = [count / self.fps for _, count in self.segments]
+        sizes = [os.path.getsize(os.path.join(self.dir, name)) for name, _ in self.segments]
+
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{math.ceil(max(durations, default=0))}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:VOD',
+        ]
+        for (name, _), duration in zip(self.segments, durations):
+            lines += [f'#EXTINF:{duration:.3f},', name]
+        lines.append('#EXT-X-ENDLIST')
+        with open(os.path.join(self.dir, 'index.m3u8'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        # mp4v has no rate control: the bitrate is whatever the resolution yields
+        peak = max((size * 8 / d for size, d in zip(sizes, durations) if d), default=0)
+        total = sum(durations)
+        return {
+            'label'            : self.label,
+            'width'            : self.size[0],
+            'height'           : self.size[1],
+            'bandwidth'        : int(peak),
+            'average_bandwidth': int(sum(sizes) * 8 / total) if total else 0,
+            'segments'         : len(self.segments),
+            'playlist'         : f'{self.label}/index.m3u8',
+        }
+
+
+def _write_master_playlist(root, renditions):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for r in renditions:
+        lines += [
+            f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']},AVERAGE-BANDWIDTH={r['average_bandwidth']},"
+            f"RESOLUTION={r['width']}x{r['height']}",
+            r['playlist'],
+        ]
+    with open(os.path.join(root, 'master.m3u8'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def convert_video(src_path, dest_path, raw_path=None, progress=None):
+    """
+    Convert a video into
+      - dest_path: a progressive MP4 at the top rendition (at most 1280×720,
+        aspect ratio preserved, no padding), what the download endpoints serve;
+      - rendition_dir(dest_path)/: the ladder — <label>/seg-NNN.mp4 segments of
+        TRANSCODE_SEGMENT_SECONDS with <label>/index.m3u8, a master.m3u8 and a
+        poster.jpg taken TRANSCODE_POSTER_AT seconds in;
+    then delete the raw / source files. Every frame is decoded once; each rung
+    is resized from it. progress(percent) is called as frames are written.
+    Returns the outputs dict stored on the TranscodeJob.
+    """
+    from backend.utils.media_handler import VIDEO_TARGET_FPS
+
+    cap = cv2.VideoCapture(src_path)
+    if not cap.isOpened():
+        raise ValueError(f'Cannot open {src_path}')
+
+    # Encode next to the destination and swap it in when done: for an
+    # .mp4 upload the raw file already sits at dest_path and is still
+    # being read (and served) while we convert.
+    work_path = os.path.splitext(dest_path)[0] + '.converting.mp4'
+    work_dir  = rendition_dir(dest_path) + '.converting'
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    try:
+        in_w   = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        in_h   = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps    = cap.get(cv2.CAP_PROP_FPS) or VIDEO_TARGET_FPS
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+        if not (in_w and in_h):
+            raise ValueError(f'Cannot read the frame size of {src_path}')
+
+        ladder = plan_renditions(in_w, in_h)
+        top_w, top_h = ladder[-1][1:]
+        segment_frames = max(1, round(TRANSCODE_SEGMENT_SECONDS * fps))
+        poster_frame = min(int(TRANSCODE_POSTER_AT * fps), max(frames - 1, 0))
+
+        renditions = [
+            _SegmentedRendition(work_dir, label, w, h, fps, segment_frames)
+            for label, w, h in ladder
+        ]
+        out = cv2.VideoWriter(work_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (top_w, top_h))
+
+        written = 0
+        poster = None
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                for rendition in renditions:
+                    if (in_w, in_h) == rendition.size:
+                        scaled = frame
+                    else:
+                        scaled = cv2.resize(frame, rendition.size, interpolation=cv2.INTER_AREA)
+                    rendition.write(scaled)
+                out.write(scaled)       # the last rung is the top one
+
+                if written == poster_frame or poster is None:
+                    poster = scaled
+                written += 1
+                if progress and frames:
+                    progress(min(99, written * 100 // frames))
+        finally:
+            out.release()
+            summaries = [rendition.close() for rendition in renditions]
+
+        if not written:
+            raise ValueError(f'No frames decoded from {src_path}')
+
+        cv2.imwrite(os.path.join(work_dir, 'poster.jpg'), poster, [cv2.IMWRITE_JPEG_QUALITY, TRANSCODE_POSTER_QUALITY])
+        _write_master_playlist(work_dir, summaries)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(work_path):
+            os.unlink(work_path)
+        raise
+    finally:
+        cap.release()
+
+    shutil.rmtree(rendition_dir(dest_path), ignore_errors=True)
+    os.replace(work_dir, rendition_dir(dest_path))
+    os.replace(work_path, dest_path)
+
+    # Delete raw file (unless the converted file just replaced it)
+    for path in {raw_path, src_path} - {dest_path, None}:
+        if os.path.exists(path):
+            os.unlink(path)
+
+    return {
+        'width'     : top_w,
+        'height'    : top_h,
+        'playlist'  : 'master.m3u8',
+        'poster'    : 'poster.jpg',
+        'renditions': summaries,
+    }
+
+
+def attach_renditions(job):
+    """
+    Record a finished job's ladder on its Product.media_url entry (matched by
+    file name). No-op when the entry isn't saved yet; the upload handler calls
+    this again once it is, so whichever side finishes last fills it in.
+    """
+    from django.db import transaction
+    from backend.models import Product
+
+    if not (job.product_id and job.outputs):
+        return False
+
+    file_name = os.path.basename(job.dest_path)
+    with transaction.atomic():
+        product = Product.objects.select_for_update().filter(p_id=job.product_id).first()
+        media = product.media_url if product and isinstance(product.media_url, list) else []
+        entry = next((m for m in media if str(m.get('media_url', '')).endswith('/' + file_name)), None)
+        if entry is None:
+            return False
+
+        base = os.path.splitext(entry['media_url'])[0]
+        entry['poster_url'] = f"{base}/{job.outputs['poster']}"
+        entry['playlist_url'] = f"{base}/{job.outputs['playlist']}"
+        entry['renditions'] = [
+            {
+                'label'    : r['label'],
+                'width'    : r['width'],
+                'height'   : r['height'],
+                'bandwidth': r['bandwidth'],
+                'playlist_url': f"{base}/{r['playlist']}",
+            }
+            for r in job.outputs['renditions']
+        ]
+        product.save(update_fields=['media_url'])
+    return True
+
+
+def run_transcode_job(job_id):
+    """
+    Claim a QUEUED job and run it. Returns the final status, or None when
+    another worker already claimed the job.
+    """
+    from backend.models import TranscodeJob
+
+    claimed = TranscodeJob.objects.filter(pk=job_id, status='QUEUED').update(
+        status='RUNNING', started_at=timezone.now(), progress=0,
+    )
+    if not claimed:
+        return None
+
+    job = TranscodeJob.objects.get(pk=job_id)
+    last = [0]
+
+    def report(percent):
+        if percent - last[0] >= PROGRESS_STEP:
+            last[0] = percent
+            TranscodeJob.objects.filter(pk=job_id).update(progress=percent)
+
+    try:
+        outputs = convert_video(job.src_path, job.dest_path, job.raw_path, progress=report)
+    except Exception as e:
+        print(f"[Video conversion] Job {job_id} failed: {e}")
+        TranscodeJob.objects.filter(pk=job_id).update(
+            status='FAILED', error=str(e)[:1000], finished_at=timezone.now(),
+        )
+        return 'FAILED'
+
+    print(f"[Video conversion] Complete: {job.dest_path}")
+    TranscodeJob.objects.filter(pk=job_id).update(
+        status='DONE', progress=100, outputs=outputs, finished_at=timezone.now(),
+    )
+    job.outputs = outputs
+    attach_renditions(job)
+    return 'DONE'
+
+
+##########################################################################################
+#                            Queue (web side)
+##########################################################################################
+
+def _on_job_done(job_id):
+    def callback(future):
+        if future.cancelled():
+            exc = 'Cancelled before a worker picked it up'
+        else:
+            exc = future.exception()
+        if exc is not None:
+            print(f"[Video conversion] Worker crashed on job {job_id}: {exc}")
+            from backend.models import TranscodeJob
+            TranscodeJob.objects.filter(pk=job_id, status__in=['QUEUED', 'RUNNING']).update(
+                status='FAILED', error=str(exc)[:1000], finished_at=timezone.now(),
+            )
+            connection.close()   # callbacks run on the pool's management thread
+    return callback
+
+
+def pending_jobs():
+    from backend.models import TranscodeJob
+    return TranscodeJob.objects.filter(status__in=['QUEUED', 'RUNNING']).count()
+
+
+def has_capacity():
+    """True while fewer than TRANSCODE_MAX_PENDING jobs are pending (stale ones are failed first)"""
+    if pending_jobs() < TRANSCODE_MAX_PENDING:
+        return True
+    return fail_stale_jobs() > 0 and pending_jobs() < TRANSCODE_MAX_PENDING
+
+
+def submit_transcode(user_id, src_path, dest_path, raw_path=None, product_id=None):
+    """
+    Queue a conversion and return its TranscodeJob.
+    Raises TranscodeQueueFull when TRANSCODE_MAX_PENDING jobs are pending.
+    """
+    from backend.models import TranscodeJob
+
+    if not has_capacity():
+        raise TranscodeQueueFull('Video processing queue is full, please retry in a few minutes')
+
+    job = TranscodeJob.objects.create(
+        user_id=user_id, product_id=product_id,
+        src_path=src_path, dest_path=dest_path, raw_path=raw_path,
+    )
+
+    if TRANSCODE_EXECUTOR == 'inline':
+        run_transcode_job(job.pk)
+        job.refresh_from_db()
+    elif TRANSCODE_EXECUTOR == 'process':
+        try:
+            future = get_media_executor().submit(
+                run_transcode_job, job.pk,
+                kind='process', name=f'transcode-{job.pk}', timeout=TRANSCODE_JOB_TIMEOUT,
+            )
+        except (MediaQueueFull, MediaExecutorClosed) as e:
+            job.delete()
+            raise TranscodeQueueFull('Video processing queue is full, please retry in a few minutes') from e
+        future.add_done_callback(_on_job_done(job.pk))
+    # 'external': a `run_transcode_jobs` worker picks it up
+
+    return job
+
+
+def fail_stale_jobs():
+    """
+    Mark jobs RUNNING (or still QUEUED) for longer than TRANSCODE_JOB_TIMEOUT
+    as FAILED: the process that owned them is gone.
+    """
+    from backend.models import TranscodeJob
+    from django.db.models import Q
+    cutoff = timezone.now() - timezone.timedelta(seconds=TRANSCODE_JOB_TIMEOUT)
+    return TranscodeJob.objects.filter(
+        Q(status='RUNNING', started_at__lt=cutoff) | Q(status='QUEUED', created_at__lt=cutoff)
+    ).update(
+        status='FAILED', error='Worker stopped before the job finished', finished_at=timezone.now(),
+    )
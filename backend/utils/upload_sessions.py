@@ -0,0 +1,305 @@
+"""
+Chunked upload session store shared by every worker.
+
+A session is a plain dict (userid, subject, file_name, file_size,
+total_chunks, chunks_dir, product_id, ...) plus 'received', a ChunkBitmap of
+the chunks already stored. The backend is chosen by UPLOAD_SESSION_BACKEND:
+
+    'file'  (default) session.json + one marker file per received chunk inside
+            MEDIA_ROOT/temp_uploads/<upload_id>/ — works for every worker
+            sharing that disk, no extra infrastructure.
+    'cache' Django cache (point CACHES at Redis / Memcached for several hosts).
+    'db'    UploadSession table.
+
+Every backend marks chunks atomically, so concurrent chunk POSTs for the same
+upload are safe. Sessions expire UPLOAD_SESSION_TTL seconds after their last
+activity; gc_upload_sessions() (run by `manage.py gc_upload_sessions` and
+opportunistically on init) removes them together with their temp directories.
+"""
+import os
+import re
+import json
+import time
+import base64
+import shutil
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+UPLOAD_SESSION_BACKEND     = getattr(settings, 'UPLOAD_SESSION_BACKEND', 'file')
+UPLOAD_SESSION_TTL         = getattr(settings, 'UPLOAD_SESSION_TTL', 6 * 60 * 60)   # seconds since last activity
+UPLOAD_SESSION_GC_INTERVAL = getattr(settings, 'UPLOAD_SESSION_GC_INTERVAL', 15 * 60)
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def temp_uploads_root():
+    return os.path.join(settings.MEDIA_ROOT, 'temp_uploads')
+
+
+def session_dir(upload_id):
+    return os.path.join(temp_uploads_root(), upload_id)
+
+
+def is_valid_upload_id(upload_id):
+    return bool(upload_id) and bool(_UPLOAD_ID_RE.match(str(upload_id)))
+
+
+class ChunkBitmap:
+    """Fixed-size bitmap of received chunk indexes"""
+
+    def __init__(self, total, data=None):
+        self.total = total
+        self.bits = bytearray(data) if data else bytearray((total + 7) // 8)
+
+    def add(self, index):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, index):
+        return 0 <= index < self.total and bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def __len__(self):
+        return sum(bin(b).count('1') for b in self.bits)
+
+    def missing(self):
+        return [i for i in range(self.total) if i not in self]
+
+    def is_complete(self):
+        return len(self) >= self.total
+
+    def encode(self):
+        return base64.b64encode(bytes(self.bits)).decode('ascii')
+
+
+##########################################################################################
+#                            Backends
+##########################################################################################
+
+class FileSessionStore:
+    """session.json + received/<index> marker files in the session's temp directory"""
+
+    def _meta_path(self, upload_id):
+        return os.path.join(session_dir(upload_id), 'session.json')
+
+    def _marker_dir(self, upload_id):
+        return os.path.join(session_dir(upload_id), 'received')
+
+    def _last_activity(self, upload_id):
+        paths = (self._meta_path(upload_id), self._marker_dir(upload_id))
+        return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0)
+
+    def create(self, upload_id, session):
+        os.makedirs(self._marker_dir(upload_id), exist_ok=True)
+        tmp = self._meta_path(upload_id) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        os.replace(tmp, self._meta_path(upload_id))
+
+    def get(self, upload_id):
+        try:
+            with open(self._meta_path(upload_id), encoding='utf-8') as f:
+                session = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if self._last_activity(upload_id) + UPLOAD_SESSION_TTL < time.time():
+            return None
+
+        received = ChunkBitmap(session['total_chunks'])
+        for name in os.listdir(self._marker_dir(upload_id)):
+            if name.isdigit() and int(name) < received.total:
+                received.add(int(name))
+        session['received'] = received
+        return session
+
+    def mark_received(self, upload_id, chunk_index):
+        # O_CREAT on a marker file is atomic, whichever worker gets the chunk
+        fd = os.open(os.path.join(self._marker_dir(upload_id), str(chunk_index)), os.O_CREAT | os.O_WRONLY, 0o644)
+        os.close(fd)
+        os.utime(self._marker_dir(upload_id))
+
+    def delete(self, upload_id):
+        try:
+            os.remove(self._meta_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        return []   # expiry is read off the temp directory itself, see gc_upload_sessions
+
+
+class CacheSessionStore:
+    """Session metadata under one cache key, one key per received chunk (cache.add is atomic)"""
+
+    def _key(self, upload_id):
+        return f'upload-session:{upload_id}'
+
+    def _chunk_key(self, upload_id, chunk_index):
+        return f'upload-session:{upload_id}:chunk:{chunk_index}'
+
+    def create(self, upload_id, session):
+        cache.set(self._key(upload_id), session, timeout=UPLOAD_SESSION_TTL)
+
+    def get(self, upload_id):
+        session = cache.get(self._key(upload_id))
+        if session is None:
+            return None
+        total = session['total_chunks']
+        stored = cache.get_many([self._chunk_key(upload_id, i) for i in range(total)])
+        received = ChunkBitmap(total)
+        for i in range(total):
+            if self._chunk_key(upload_id, i) in stored:
+                received.add(i)
+        session['received'] = received
+        return session
+
+    def mark_received(self, upload_id, chunk_index):
+        cache.add(self._chunk_key(upload_id, chunk_index), 1, timeout=UPLOAD_SESSION_TTL)
+        cache.touch(self._key(upload_id), timeout=UPLOAD_SESSION_TTL)
+
+    def delete(self, upload_id):
+        session = cache.get(self._key(upload_id))
+        keys = [self._key(upload_id)]
+        if session:
+            keys += [self._chunk_key(upload_id, i) for i in range(session['total_chunks'])]
+        cache.delete_many(keys)
+
+    def purge_expired(self):
+        return []   # the cache expires entries itself
+
+
+class DatabaseSessionStore:
+    """UploadSession rows; chunk bits are set under SELECT ... FOR UPDATE"""
+
+    def _expiry(self):
+        return timezone.now() + datetime.timedelta(seconds=UPLOAD_SESSION_TTL)
+
+    def create(self, upload_id, session):
+        from backend.models import UploadSession
+        meta = dict(session)
+        UploadSession.objects.create(
+            upload_id=upload_id,
+            user_id=meta.pop('userid'),
+            total_chunks=meta.pop('total_chunks'),
+            received=bytes((session['total_chunks'] + 7) // 8),
+            meta=meta,
+            expires_at=self._expiry(),
+        )
+
+    def get(self, upload_id):
+        from backend.models import UploadSession
+        row = UploadSession.objects.filter(upload_id=upload_id, expires_at__gt=timezone.now()).first()
+        if row is None:
+            return None
+        return {
+            **row.meta,
+            'userid': row.user_id,
+            'total_chunks': row.total_chunks,
+            'received': ChunkBitmap(row.total_chunks, bytes(row.received)),
+        }
+
+    def mark_received(self, upload_id, chunk_index):
+        from backend.models import UploadSession
+        with transaction.atomic():
+            row = UploadSession.objects.select_for_update().filter(upload_id=upload_id).first()
+            if row is None:
+                return
+            received = ChunkBitmap(row.total_chunks, bytes(row.received))
+            received.add(chunk_index)
+            row.received = bytes(received.bits)
+            row.expires_at = self._expiry()
+            row.save(update_fields=['received', 'expires_at'])
+
+    def delete(self, upload_id):
+        from backend.models import UploadSession
+        UploadSession.objects.filter(upload_id=upload_id).delete()
+
+    def purge_expired(self):
+        from backend.models import UploadSession
+        expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+        upload_ids = list(expired.values_list('upload_id', flat=True))
+        expired.filter(upload_id__in=upload_ids).delete()
+        return upload_ids
+
+
+_BACKENDS = {
+    'file' : FileSessionStore,
+    'cache': CacheSessionStore,
+    'db'   : DatabaseSessionStore,
+}
+
+_store = None
+
+
+def get_session_store():
+    global _store
+    if _store is None:
+        try:
+            _store = _BACKENDS[UPLOAD_SESSION_BACKEND]()
+        except KeyError:
+            raise ValueError(f"Unknown UPLOAD_SESSION_BACKEND {UPLOAD_SESSION_BACKEND!r}, use one of {sorted(_BACKENDS)}")
+    return _store
+
+
+##########################################################################################
+#                            Garbage collection
+##########################################################################################
+
+_last_gc = None
+
+
+def _idle_seconds(path, now):
+    latest = os.path.getmtime(path)
+    for entry in os.scandir(path):
+        latest = max(latest, entry.stat().st_mtime)
+    return now - latest
+
+
+def gc_upload_sessions():
+    """
+    Drop expired sessions and delete abandoned temp_uploads/<upload_id>
+    directories (no live session and idle for longer than UPLOAD_SESSION_TTL).
+    Returns the number of directories removed.
+    """
+    store = get_session_store()
+    now = time.time()
+    removed = 0
+
+    for upload_id in store.purge_expired():
+        if os.path.isdir(session_dir(upload_id)):
+            shutil.rmtree(session_dir(upload_id), ignore_errors=True)
+            removed += 1
+
+    root = temp_uploads_root()
+    if not os.path.isdir(root):
+        return removed
+
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not is_valid_upload_id(entry.name):
+            continue
+        try:
+            idle = _idle_seconds(entry.path, now)
+        except FileNotFoundError:
+            continue
+        if idle > UPLOAD_SESSION_TTL and store.get(entry.name) is None:
+            store.delete(entry.name)
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def maybe_gc_upload_sessions():
+    """Run gc_upload_sessions() at most once per UPLOAD_SESSION_GC_INTERVAL in this process"""
+    global _last_gc
+    now = time.monotonic()
+    if _last_gc is not None and now - _last_gc < UPLOAD_SESSION_GC_INTERVAL:
+        return 0
+    _last_gc = now
+    try:
+        return gc_upload_sessions()
+    except Exception as e:
+        print(f"[Upload GC] Error: {e}")
+        return 0
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from backend.models import Users, Rating, UserReputation
+
+
+def get_user_reputation(user):
+    """
+    Return the UserReputation row of a user (or user_id), or an unsaved
+    all-zero row when the user has not been rated yet.
+    """
+    if isinstance(user, Users):
+        try:
+            return user.reputation
+        except UserReputation.DoesNotExist:
+            return UserReputation(user_id=user.pk)
+
+    reputation = UserReputation.objects.filter(user_id=user).first()
+    return reputation or UserReputation(user_id=user)
+
+
+def apply_rating_changes(changes):
+    """
+    Incrementally apply rating changes to the reputation rollup.
+
+    changes – iterable of (user_id, rated_for, score, sign) where sign is
+              +1 for an added rating and -1 for a removed one. An edit is
+              passed as one removal plus one addition.
+    """
+    changes = [c for c in changes if c[0]]
+    if not changes:
+        return
+
+    with transaction.atomic():
+        rows = {}
+        for user_id, rated_for, score, sign in changes:
+            if user_id not in rows:
+                rows[user_id], _ = UserReputation.objects.select_for_update().get_or_create(user_id=user_id)
+            rows[user_id].add_score(Decimal(score), rated_for, sign)
+
+        now = timezone.now()
+        for reputation in rows.values():
+            reputation.updated_at = now
+            reputation.save()
+
+
+def rebuild_user_reputation(user_ids=None):
+    """
+    Recompute UserReputation from the Rating table.
+
+    user_ids – optional list of user_ids; every rated user when None.
+    Returns the number of reputation rows written.
+    """
+    ratings = Rating.objects.order_by('rated_to_id').values_list('rated_to_id', 'rated_for', 'score')
+    if user_ids is not None:
+        ratings = ratings.filter(rated_to_id__in=user_ids)
+
+    rows = {}
+    for user_id, rated_for, score in ratings.iterator(chunk_size=2000):
+        if user_id not in rows:
+            rows[user_id] = UserReputation(user_id=user_id)
+        rows[user_id].add_score(Decimal(score), rated_for)
+
+    with transaction.atomic():
+        stale = UserReputation.objects.exclude(user_id__in=list(rows))
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+
+        now = timezone.now()
+        for reputation in rows.values():
+            reputation.updated_at = now
+        UserReputation.objects.bulk_create(
+            rows.values(),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                f.name for f in UserReputation._meta.concrete_fields if not f.primary_key
+            ],
+        )
+    return len(rows)